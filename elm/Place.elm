@@ -1,11 +1,14 @@
 port module Place exposing (main)
 
 import String exposing (left, dropLeft)
+import Dict exposing (Dict)
 import Html exposing (Html)
 import Html.Events
 import Html.Attributes
 import Json.Decode
 import Json.Encode
+import Svg
+import Svg.Attributes
 import WebSocket
 import Helpers exposing (..)
 
@@ -16,6 +19,7 @@ type alias Experiment =
     , updates : Int
     , comments : String
     , plotData : Html Msg
+    , livePlots : Dict String LivePlot
     , showJson : Bool
     , showData : Bool
     , connected : Bool
@@ -36,6 +40,7 @@ view experiment =
         :: buttonsView experiment
         :: jsonView experiment
         ++ dataTable experiment
+        ++ livePlotsView experiment
 
 
 startExperimentView : Experiment -> Html Msg
@@ -269,6 +274,91 @@ jsonView experiment =
         [ Html.text "" ]
 
 
+type alias LivePlot =
+    { source : String
+    , name : String
+    , update : Int
+    , dropped : Int
+    , data : List (List Float)
+    }
+
+
+livePlotDecoder : Json.Decode.Decoder LivePlot
+livePlotDecoder =
+    Json.Decode.map5
+        LivePlot
+        (Json.Decode.field "source" Json.Decode.string)
+        (Json.Decode.field "name" Json.Decode.string)
+        (Json.Decode.field "update" Json.Decode.int)
+        (Json.Decode.field "dropped" Json.Decode.int)
+        (Json.Decode.field "data" (Json.Decode.list (Json.Decode.list Json.Decode.float)))
+
+
+livePlotsView : Experiment -> List (Html Msg)
+livePlotsView experiment =
+    if Dict.isEmpty experiment.livePlots then
+        [ Html.text "" ]
+    else
+        Html.h2 [] [ Html.text "Live plots" ]
+            :: List.map livePlotView (Dict.values experiment.livePlots)
+
+
+livePlotView : LivePlot -> Html Msg
+livePlotView plot =
+    let
+        values =
+            List.concat plot.data
+
+        low =
+            Maybe.withDefault 0 (List.minimum values)
+
+        high =
+            Maybe.withDefault 1 (List.maximum values)
+    in
+        Html.div [ Html.Attributes.class "live-plot" ]
+            [ Html.h3 []
+                [ Html.text <|
+                    plot.source
+                        ++ " "
+                        ++ plot.name
+                        ++ " (update "
+                        ++ toString plot.update
+                        ++ ")"
+                ]
+            , Svg.svg
+                [ Svg.Attributes.width "600"
+                , Svg.Attributes.height "200"
+                , Svg.Attributes.viewBox "0 0 600 200"
+                ]
+                (List.map (livePlotLine low high) plot.data)
+            ]
+
+
+livePlotLine : Float -> Float -> List Float -> Svg.Svg Msg
+livePlotLine low high row =
+    let
+        xScale =
+            600 / toFloat (max 1 (List.length row - 1))
+
+        yScale =
+            if high > low then
+                200 / (high - low)
+            else
+                1
+
+        point =
+            \index value ->
+                toString (toFloat index * xScale) ++ "," ++ toString (200 - (value - low) * yScale)
+    in
+        Svg.polyline
+            [ Svg.Attributes.fill "none"
+            , Svg.Attributes.stroke "black"
+            , Svg.Attributes.strokeWidth "1"
+            , Svg.Attributes.points <| String.join " " <| List.indexedMap point row
+            ]
+            []
+
+
 type Msg
     = ChangeDirectory String
     | ChangeUpdates String
@@ -313,7 +403,9 @@ update msg experiment =
                     )
 
         StartExperiment ->
-            ( experiment, WebSocket.send socket <| encodeExperiment 0 experiment )
+            ( { experiment | livePlots = Dict.empty }
+            , WebSocket.send socket <| encodeExperiment 0 experiment
+            )
 
         ServerData data ->
             let
@@ -326,7 +418,9 @@ update msg experiment =
                 case tag of
                     "<VERS>" ->
                         if experiment.version == msg then
-                            ( { experiment | connected = True, updateNeeded = False }, Cmd.none )
+                            ( { experiment | connected = True, updateNeeded = False }
+                            , WebSocket.send socket "<LIVE>"
+                            )
                         else
                             ( { experiment | connected = False, updateNeeded = True }, Cmd.none )
 
@@ -345,6 +439,21 @@ update msg experiment =
                         , Cmd.none
                         )
 
+                    "<FRAM>" ->
+                        case Json.Decode.decodeString livePlotDecoder msg of
+                            Err err ->
+                                ( experiment, Cmd.none )
+
+                            Ok plot ->
+                                ( { experiment
+                                    | livePlots =
+                                        Dict.insert (plot.source ++ " " ++ plot.name)
+                                            plot
+                                            experiment.livePlots
+                                  }
+                                , Cmd.none
+                                )
+
                     otherwise ->
                         let
                             newState =
@@ -395,6 +504,7 @@ singleEncoder module_ =
         [ ( "module_name", Json.Encode.string module_.module_name )
         , ( "class_name", Json.Encode.string module_.className )
         , ( "priority", Json.Encode.int module_.priority )
+        , ( "data_register", Json.Encode.list <| List.map Json.Encode.string module_.dataRegister )
         , ( "config", module_.config )
         ]
 
@@ -461,6 +571,7 @@ experimentDefaultState =
     , updates = 1
     , comments = ""
     , plotData = Html.text ""
+    , livePlots = Dict.empty
     , showJson = False
     , showData = False
     , connected = False
@@ -476,6 +587,7 @@ experimentErrorState err =
     , updates = 0
     , comments = err
     , plotData = Html.strong [] [ Html.text "There was an error!" ]
+    , livePlots = Dict.empty
     , showJson = False
     , showData = False
     , connected = False
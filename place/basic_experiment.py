@@ -1,7 +1,12 @@
 """Run an experiment"""
 import os
 import json
-from operator import attrgetter
+from asyncio import (new_event_loop, ensure_future, gather, get_event_loop,
+                     run_coroutine_threadsafe)
+from functools import partial
+from heapq import heapify, heappop, heappush
+from queue import Queue
+from threading import Event, Thread
 from importlib import import_module
 import pkg_resources
 import numpy as np
@@ -9,37 +14,121 @@ from numpy.lib import recfunctions as rfn
 from .plugins.instrument import Instrument
 from .plugins.postprocessing import PostProcessing
 from .plugins.export import Export
-from .utilities import build_single_file
+from .storage import make_writer, completed_updates
+from .timing import PhaseTimer
+
+SCHEDULERS = ('serial', 'asyncio')
 
 class BasicExperiment:
-    """Basic experiment class"""
-    def __init__(self, config):
+    """Basic experiment class
+
+    The modules of an experiment form a dependency graph. A module entry in
+    the experiment configuration may list the modules it depends on, by class
+    name or by the name of a field the module produces::
+
+        "depends_on": ["LongStage", "ATS9440-trace"]
+
+    Fields are looked up in the ``data_register`` of each module entry (the
+    fields the module produces). Modules without a ``data_register`` are
+    assumed to produce fields named after their class, such as
+    ``ATS9440-trace``. When an experiment uses several modules of the same
+    class, a module must depend on one of them by a field it produces.
+
+    A module that does not declare its dependencies depends on every module
+    with a lower priority (except modules that depend on it), so modules
+    sharing a priority are independent of each other.
+
+    By default, modules are configured, updated and cleaned up one at a time,
+    in an order respecting these dependencies (and priority). If the
+    experiment configuration contains ``"scheduler": "asyncio"``, the modules
+    are driven by an asyncio event loop instead. Each module starts as soon as
+    the modules it depends on have finished, so independent modules run
+    concurrently, using the coroutine methods of
+    :class:`place.plugins.instrument.Instrument`. Post-processing modules are
+    always updated one at a time, after the instruments, and see the data of
+    all the modules before them.
+
+    Concurrency is opt-in because the existing plugins were written to be
+    called one at a time. Many of them draw matplotlib plots during
+    ``update``, which is only safe on the main thread, while the asyncio
+    scheduler runs synchronous methods in executor threads. An experiment
+    should select ``"scheduler": "asyncio"`` once its modules are known to
+    tolerate this (for example, with plotting disabled or handled by
+    :mod:`place.plot_process`).
+    """
+    def __init__(self, config, resume=False, progress=None):
         """Experiment constructor
 
         :param config: a decoded JSON dictionary
         :type config: dict
+
+        :param resume: ``True`` if this is an interrupted experiment (loaded
+                       from its ``config.json``) that should continue from
+                       the last update completely written into its directory
+        :type resume: bool
+
+        :param progress: a function called with the update number and the
+                         total number of updates after each row is saved
+        :type progress: function
+
+        :raises ValueError: if the requested scheduler is not recognized, or
+                            an experiment being resumed is already complete
         """
         version = pkg_resources.require("place")[0].version
         self.config = config
         self.modules = []
         self.metadata = {'PLACE_version': version}
-        self._create_experiment_directory()
+        self._dependencies = {}
+        self._row = _RowBuffer()
+        scheduler = self.config.get('scheduler', 'serial')
+        if scheduler not in SCHEDULERS:
+            raise ValueError("unrecognized scheduler '{}' - must be one of: {}".format(
+                scheduler, ', '.join(SCHEDULERS)))
+        self._progress = progress
+        self._stop = Event()
+        self._resume = resume
+        self._first_update = 0
+        if resume:
+            self._resume_experiment_directory()
+        else:
+            self._create_experiment_directory()
+        self._writer = make_writer(self.config)
+        if resume:
+            self._writer.resume(self._first_update)
+        self._async = _AsyncRunner() if scheduler == 'asyncio' else None
+        self._timer = PhaseTimer(self.config['updates'])
         self.init_phase()
 
     def run(self):
-        """Run the experiment."""
+        """Run the experiment.
+
+        If :meth:`stop` is called while the experiment runs, the experiment
+        is cleaned up as an aborted experiment.
+        """
         self.config_phase()
         self.update_phase()
-        self.cleanup_phase(abort=False)
+        self.cleanup_phase(abort=self._stop.is_set())
+
+    def stop(self):
+        """Ask the experiment to stop after the current update.
+
+        This may be called from any thread.
+        """
+        self._stop.set()
 
     def init_phase(self):
         """Initialize the modules.
 
         During this phase, all modules receive their configuration data and
         should store it. The list of modules being used by the experiment is
-        created and sorted by their priority level. No physical configuration
-        should occur during this phase.
+        created and sorted by their priority level and dependencies. No
+        physical configuration should occur during this phase.
+
+        :raises ValueError: if a dependency cannot be found, could refer to
+                            several modules, or the dependencies form a cycle
         """
+        declared = []
+        fields = []
         for module in self.config['modules']:
             module_name = module['module_name']
             class_string = module['class_name']
@@ -49,9 +138,30 @@ class BasicExperiment:
             postprocessor = _programmatic_import(module_name, class_string, config)
             postprocessor.priority = priority
             self.modules.append(postprocessor)
+            declared.append(module.get('depends_on'))
+            fields.append(module.get('data_register'))
+
+        # sort modules based on dependencies and priority
+        self.modules, self._dependencies = _order_modules(self.modules, declared, fields)
+
+    def _timing_name(self, module):
+        """Get the name a module is timed under.
+
+        This is the class name of the module. When an experiment uses several
+        modules of the same class, the later ones are numbered (for example,
+        ``Counter``, ``Counter_2``).
+
+        :param module: the module
+        :type module: Instrument, PostProcessing, or Export object
 
-        # sort modules based on priority
-        self.modules.sort(key=attrgetter('priority'))
+        :returns: the name of the module in the timing data
+        :rtype: str
+        """
+        name = module.__class__.__name__
+        same_class = [other for other in self.modules if other.__class__ is module.__class__]
+        if same_class[0] is module:
+            return name
+        return '{}_{}'.format(name, same_class.index(module) + 1)
 
     def config_phase(self):
         """Configure the instruments and post-processing modules.
@@ -59,14 +169,31 @@ class BasicExperiment:
         During the configuration phase, instruments and post-processing modules
         are provided with their configuration data. Metadata is collected from
         all modules and written to disk.
+
+        When resuming an experiment, each instrument is then told which update
+        the experiment will resume from (see
+        :meth:`place.plugins.instrument.Instrument.resume`).
         """
-        for module in self.modules:
-            try:
-                config_func = module.config
-            except AttributeError:
-                continue
-            print("...configuring {}...".format(module.__class__.__name__))
-            config_func(self.metadata, self.config['updates'])
+        if self._async is not None:
+            self._async.run(self._config_phase_async())
+        else:
+            for module in self.modules:
+                try:
+                    config_func = module.config
+                except AttributeError:
+                    continue
+                name = module.__class__.__name__
+                print("...configuring {}...".format(name))
+                with self._timer.measure(self._timing_name(module), 'config'):
+                    config_func(self.metadata, self.config['updates'])
+        if self._resume:
+            for module in self.modules:
+                if issubclass(module.__class__, Instrument):
+                    print("...resuming {} at update {}...".format(module.__class__.__name__,
+                                                                  self._first_update))
+                    module.resume(self._first_update)
+            self._write_config()
+            return
         self.config['metadata'] = self.metadata
         with open(self.config['directory'] + '/config.json', 'x') as config_file:
             json.dump(self.config, config_file, indent=2, sort_keys=True)
@@ -79,30 +206,333 @@ class BasicExperiment:
         post-processing modules (based on their priority) and calls their
         update method.
 
-        One file will be written for each update.
+        If the experiment configuration contains ``"pipeline": true``, the
+        updates are performed by :meth:`pipelined_update_phase` instead.
+
+        Each row is saved by the writer selected with the ``storage`` key of
+        the experiment configuration (see :mod:`place.storage`).
         """
-        for update_number in range(self.config['updates']):
-            current_data = np.array([(np.datetime64('now'),)], dtype=[('time', 'datetime64[us]')])
+        if self.config.get('pipeline', False):
+            self.pipelined_update_phase()
+            return
+        for update_number in range(self._first_update, self.config['updates']):
+            if self._stop.is_set():
+                break
+            current_data = self._acquire_row(update_number)
+            self._write_row(update_number, current_data)
 
-            for module in self.modules:
-                class_ = module.__class__
-                print("...{}: updating {}...".format(update_number,
-                                                     module.__class__.__name__))
-                if issubclass(class_, Instrument):
-                    try:
-                        module_data = module.update(update_number)
-                    except RuntimeError:
-                        self.cleanup_phase(abort=True)
-                        raise
-                    if module_data is not None:
-                        current_data = rfn.merge_arrays([current_data, module_data],
-                                                        flatten=True)
-                elif issubclass(class_, PostProcessing):
-                    current_data = module.update(update_number, current_data.copy())
-            filename = '{}/scan_data_{:03d}.npy'.format(self.config['directory'], update_number)
-            with open(filename, 'xb') as data_file:
-                np.save(data_file, current_data.copy(), allow_pickle=False)
+    def pipelined_update_phase(self):
+        """Perform all the updates, overlapping acquisition, post-processing
+        and saving.
+
+        Instruments are updated on the calling thread. Each completed row is
+        placed into a bounded queue and handed to a post-processing thread,
+        which in turn hands its results to a writer thread. Rows pass through
+        each stage in update order. When a stage falls behind, the queue in
+        front of it fills up and the stages before it wait, so no more than
+        ``pipeline_depth`` rows (default 2) are ever waiting between two
+        stages.
+
+        Only the post-processing modules that come after every instrument
+        are updated on the post-processing thread. Post-processing modules
+        placed between instruments are updated with the instruments, so every
+        module sees the same data as it would without the pipeline.
+        """
+        depth = self.config.get('pipeline_depth', 2)
+        postprocess = partial(self._postprocess_row, start=self._postprocessing_stage_start())
+        processing_queue = Queue(maxsize=depth)
+        writing_queue = Queue(maxsize=depth)
+        failed = Event()
+        errors = []
+        stages = [
+            Thread(target=self._pipeline_stage,
+                   args=(postprocess, processing_queue, writing_queue,
+                         failed, errors),
+                   name='PLACE-postprocessing'),
+            Thread(target=self._pipeline_stage,
+                   args=(self._write_row, writing_queue, None, failed, errors),
+                   name='PLACE-writer'),
+        ]
+        for stage in stages:
+            stage.start()
+        try:
+            try:
+                for update_number in range(self._first_update, self.config['updates']):
+                    if failed.is_set() or self._stop.is_set():
+                        break
+                    row = self._acquire_row(update_number, pipelined=True)
+                    processing_queue.put((update_number, row.copy()))
+            finally:
+                # the stages must always be stopped, or they would wait forever
+                processing_queue.put(None)
+                for stage in stages:
+                    stage.join()
+        except BaseException:
+            self.cleanup_phase(abort=True)
+            raise
+        if errors:
+            self.cleanup_phase(abort=True)
+            raise errors[0]
+
+    def _acquire_row(self, update_number, pipelined=False):
+        """Update the modules and collect one row of data.
+
+        :param update_number: the count of the current update (0-indexed)
+        :type update_number: int
+
+        :param pipelined: ``True`` if the row is collected for the pipelined
+                          update phase, in which case the post-processing
+                          modules after the last instrument are left to the
+                          post-processing stage, and errors are left to the
+                          pipeline to clean up
+        :type pipelined: bool
+
+        :returns: the row of data for this update, which may be overwritten
+                  by the next update
+        :rtype: numpy.array, structured array of shape (1,)
+        """
+        if pipelined:
+            stop = self._postprocessing_stage_start()
+        else:
+            stop = len(self.modules)
+        self._row.start()
+        try:
+            instrument_data = self._update_instruments(update_number)
+        except RuntimeError:
+            if not pipelined:
+                self.cleanup_phase(abort=True)
+            raise
+        for module, module_data in zip(self.modules[:stop], instrument_data):
+            class_ = module.__class__
+            if issubclass(class_, Instrument):
+                if module_data is not None:
+                    self._row.add(module_data)
+            elif issubclass(class_, PostProcessing):
+                print("...{}: updating {}...".format(update_number, class_.__name__))
+                timing_name = self._timing_name(module)
+                with self._timer.measure(timing_name, 'postprocess', update_number):
+                    row = module.update(update_number, self._row.data.copy())
+                self._row.replace(row)
+        return self._row.finish()
+
+    def _postprocessing_stage_start(self):
+        """Find the first module updated by the post-processing stage.
+
+        :returns: the index of the first module after the last instrument
+        :rtype: int
+        """
+        start = 0
+        for index, module in enumerate(self.modules):
+            if issubclass(module.__class__, Instrument):
+                start = index + 1
+        return start
+
+    def _update_instruments(self, update_number):
+        """Update all the instruments.
+
+        :param update_number: the count of the current update (0-indexed)
+        :type update_number: int
+
+        :returns: the data returned by each module, in module order (``None``
+                  for modules that are not instruments)
+        :rtype: list
+        """
+        if self._async is not None:
+            return self._async.run(self._update_instruments_async(update_number))
+        instrument_data = []
+        for module in self.modules:
+            module_data = None
+            if issubclass(module.__class__, Instrument):
+                name = module.__class__.__name__
+                print("...{}: updating {}...".format(update_number, name))
+                with self._timer.measure(self._timing_name(module), 'update', update_number):
+                    module_data = module.update(update_number)
+            instrument_data.append(module_data)
+        return instrument_data
+
+    async def _config_phase_async(self):
+        """Configure the modules, each one as soon as its dependencies are configured."""
+        calls = {}
+        for index, module in enumerate(self.modules):
+            if hasattr(module, 'config'):
+                name = module.__class__.__name__
+                print("...configuring {}...".format(name))
+                call = partial(_call_async, module, 'config',
+                               self.metadata, self.config['updates'])
+                calls[index] = partial(_timed, self._timer, self._timing_name(module),
+                                       'config', None, call)
+        await self._run_graph(calls)
+
+    async def _update_instruments_async(self, update_number):
+        """Update the instruments, each one as soon as its dependencies are updated.
+
+        :param update_number: the count of the current update (0-indexed)
+        :type update_number: int
+
+        :returns: the data returned by each module, in module order (``None``
+                  for modules that are not instruments)
+        :rtype: list
+        """
+        calls = {}
+        for index, module in enumerate(self.modules):
+            if issubclass(module.__class__, Instrument):
+                name = module.__class__.__name__
+                print("...{}: updating {}...".format(update_number, name))
+                calls[index] = partial(_timed, self._timer, self._timing_name(module),
+                                       'update', update_number,
+                                       partial(module.update_async, update_number))
+        results = await self._run_graph(calls)
+        return [results.get(index) for index in range(len(self.modules))]
+
+    async def _cleanup_phase_async(self, abort):
+        """Clean up the modules, each one as soon as its dependencies are cleaned up.
+
+        :param abort: signals that the experiment is being aborted
+        :type abort: bool
+        """
+        calls = {}
+        for index, module in enumerate(self.modules):
+            name = module.__class__.__name__
+            if abort:
+                if not hasattr(module, 'cleanup'):
+                    continue
+                print("...aborting {}...".format(name))
+                phase, call = 'cleanup', partial(_call_async, module, 'cleanup', True)
+            elif issubclass(module.__class__, Export):
+                print("...exporting with {}...".format(name))
+                phase, call = 'export', partial(_call_async, module, 'export',
+                                                self.config['directory'])
+            else:
+                print("...cleaning up {}...".format(name))
+                phase, call = 'cleanup', partial(_call_async, module, 'cleanup', False)
+            calls[index] = partial(_timed, self._timer, self._timing_name(module),
+                                   phase, None, call)
+        await self._run_graph(calls)
+
+    async def _run_graph(self, calls):
+        """Run calls on the modules, following the dependency graph.
+
+        Each call starts once the calls on all the modules it depends on have
+        completed. Modules without a call are skipped, but the modules they
+        depend on must still complete first.
+
+        :param calls: functions returning a coroutine, keyed by module index
+        :type calls: dict
+
+        :returns: the result of each call, keyed by module index
+        :rtype: dict
+        """
+        tasks = {}
+        for index in sorted(calls):
+            waits = [tasks[dependency]
+                     for dependency in self._effective_dependencies(index, calls)]
+            tasks[index] = ensure_future(_call_after(waits, calls[index]))
+        results = await _gather_all(list(tasks.values()))
+        return dict(zip(tasks, results))
+
+    def _effective_dependencies(self, index, calls):
+        """Get the modules with calls that a module must wait for.
+
+        Dependencies on modules without a call are replaced by the
+        dependencies of those modules.
+
+        :param index: the index of the module
+        :type index: int
+
+        :param calls: the modules with calls, keyed by module index
+        :type calls: dict
+
+        :returns: the indices of the modules to wait for
+        :rtype: set
+        """
+        dependencies = set()
+        for dependency in self._dependencies[index]:
+            if dependency in calls:
+                dependencies.add(dependency)
+            else:
+                dependencies |= self._effective_dependencies(dependency, calls)
+        return dependencies
+
+    def _postprocess_row(self, update_number, data, start=0):
+        """Run the post-processing modules on a row of instrument data.
+
+        :param update_number: the count of the current update (0-indexed)
+        :type update_number: int
+
+        :param data: the row of data collected from the instruments
+        :type data: numpy.array, structured array of shape (1,)
+
+        :param start: the index of the first module to consider
+        :type start: int
+
+        :returns: the post-processed row
+        :rtype: numpy.array, structured array of shape (1,)
+        """
+        for module in self.modules[start:]:
+            class_ = module.__class__
+            if issubclass(class_, PostProcessing):
+                print("...{}: updating {}...".format(update_number, class_.__name__))
+                timing_name = self._timing_name(module)
+                with self._timer.measure(timing_name, 'postprocess', update_number):
+                    data = module.update(update_number, data.copy())
+        return data
+
+    def _write_row(self, update_number, data):
+        """Save one row of data to disk.
+
+        :param update_number: the count of the current update (0-indexed)
+        :type update_number: int
+
+        :param data: the row of data to save
+        :type data: numpy.array, structured array of shape (1,)
+        """
+        with self._timer.measure(self._writer.__class__.__name__, 'save', update_number):
+            self._writer.write(update_number, data)
+        if self._progress is not None:
+            self._progress(update_number, self.config['updates'])
+
+    @staticmethod
+    def _pipeline_stage(work, inbox, outbox, failed, errors):
+        """Thread target for one stage of the pipelined update phase.
+
+        Items are taken from the inbox and passed to the work function, in
+        order, until ``None`` is received. The results are put into the outbox,
+        if there is one. If any stage fails, the exception is recorded and the
+        remaining items are discarded, so that earlier stages never wait on a
+        stage that has stopped working.
+
+        :param work: function accepting an update number and a row of data
+        :type work: function
+
+        :param inbox: the queue supplying ``(update_number, row)`` items
+        :type inbox: queue.Queue
+
+        :param outbox: the queue receiving the results, or ``None``
+        :type outbox: queue.Queue
+
+        :param failed: set when any stage of the pipeline has failed
+        :type failed: threading.Event
 
+        :param errors: list collecting the exceptions raised by the stages
+        :type errors: list
+        """
+        while True:
+            item = inbox.get()
+            if item is None:
+                if outbox is not None:
+                    outbox.put(None)
+                return
+            if failed.is_set():
+                continue
+            update_number, data = item
+            try:
+                result = work(update_number, data)
+            except Exception as err: # pylint: disable=broad-except
+                errors.append(err)
+                failed.set()
+                continue
+            if outbox is not None:
+                outbox.put((update_number, result))
 
     def cleanup_phase(self, abort=False):
         """Cleanup the moduless.
@@ -111,23 +541,75 @@ class BasicExperiment:
         abort flag has not been set in the cleanup call, this will be passed to
         the module.
 
+        Finally, the time spent by each module in each phase is saved (see
+        :mod:`place.timing`).
+
         :param abort: signals that the experiment is being aborted
         :type abort: bool
         """
-        if abort:
+        writer_name = self._writer.__class__.__name__
+        if self._async is not None:
+            if not abort:
+                with self._timer.measure(writer_name, 'close'):
+                    self._writer.close(abort=False)
+            try:
+                self._async.run(self._cleanup_phase_async(abort))
+            finally:
+                self._async.close()
+            if abort:
+                self._writer.close(abort=True)
+        elif abort:
             for module in self.modules:
                 print("...aborting {}...".format(module.__class__.__name__))
-                module.cleanup(abort=True)
+                with self._timer.measure(self._timing_name(module), 'cleanup'):
+                    module.cleanup(abort=True)
+            self._writer.close(abort=True)
         else:
-            build_single_file(self.config['directory'])
+            with self._timer.measure(writer_name, 'close'):
+                self._writer.close(abort=False)
             for module in self.modules:
                 class_ = module.__class__
                 if issubclass(class_, Export):
                     print("...exporting with {}...".format(module.__class__.__name__))
-                    module.export(self.config['directory'])
+                    with self._timer.measure(self._timing_name(module), 'export'):
+                        module.export(self.config['directory'])
                 else:
                     print("...cleaning up {}...".format(module.__class__.__name__))
-                    module.cleanup(abort=False)
+                    with self._timer.measure(self._timing_name(module), 'cleanup'):
+                        module.cleanup(abort=False)
+        self._save_timing()
+
+    def _save_timing(self):
+        """Save the timing data into the metadata and the experiment directory.
+
+        The ``config.json`` file is rewritten to include the summary.
+        """
+        self.metadata['timing'] = self._timer.summary()
+        self._timer.save(self.config['directory'])
+        self._write_config()
+
+    def _write_config(self):
+        """Replace ``config.json`` with the current configuration and metadata."""
+        self.config['metadata'] = self.metadata
+        filename = self.config['directory'] + '/config.json'
+        with open(filename + '.tmp', 'w') as config_file:
+            json.dump(self.config, config_file, indent=2, sort_keys=True)
+        os.replace(filename + '.tmp', filename)
+
+    def _resume_experiment_directory(self):
+        """Find where an interrupted experiment should continue from.
+
+        :raises ValueError: if the experiment is already complete
+        """
+        self.config['directory'] = os.path.normpath(self.config['directory'])
+        self._first_update = completed_updates(self.config['directory'])
+        if self._first_update >= self.config['updates']:
+            raise ValueError('the experiment in {} is already complete'.format(
+                self.config['directory']))
+        previous = self.config.get('metadata', {})
+        self.metadata['resumed_from'] = previous.get('resumed_from', []) + [self._first_update]
+        print('Resuming experiment in {} at update {}'.format(self.config['directory'],
+                                                             self._first_update))
 
     def _create_experiment_directory(self):
         self.config['directory'] = os.path.normpath(self.config['directory'])
@@ -141,13 +623,322 @@ class BasicExperiment:
             print('Experiment path exists - saving to ' + self.config['directory'])
             os.makedirs(self.config['directory'])
 
+class _RowBuffer:
+    """Reusable storage for assembling one row of experiment data.
+
+    The first row is assembled by merging the data from each module, exactly
+    as NumPy would. The layout of that row is then frozen and arrays are
+    allocated to hold it. Every later row is written, field by field, into
+    these same arrays, so instrument data is copied once rather than once for
+    every module that follows it.
+
+    Post-processing modules return a new row, which may add or remove fields.
+    Each post-processing module therefore starts a new *segment* of the row,
+    with its own buffer if any instrument data is added after it.
+    """
+    def __init__(self):
+        self._buffers = None
+        self._layouts = []
+        self._grown = []
+        self._segment = 0
+        self.data = None
+
+    def start(self):
+        """Begin a new row, stamped with the current time."""
+        self._segment = 0
+        if self._buffers is None:
+            self.data = np.array([(np.datetime64('now'),)], dtype=[('time', 'datetime64[us]')])
+            self._grown = [True]
+        else:
+            self.data = self._buffers[0]
+            self.data['time'] = np.datetime64('now')
+
+    def add(self, module_data):
+        """Add the data from one instrument to the row.
+
+        :param module_data: the data returned by the instrument
+        :type module_data: numpy.array, structured array of shape (1,)
+
+        :raises ValueError: if the fields do not match the first update
+        """
+        if self._buffers is None:
+            self.data = rfn.merge_arrays([self.data, module_data], flatten=True)
+            self._grown[-1] = True
+            return
+        for name in module_data.dtype.names:
+            if name not in self.data.dtype.names:
+                raise ValueError("field '{}' was not returned during the ".format(name) +
+                                 "first update - modules must return the same fields " +
+                                 "during every update")
+            self.data[name] = module_data[name]
+
+    def replace(self, row):
+        """Replace the row with the row returned by a post-processing module.
+
+        :param row: the post-processed row
+        :type row: numpy.array, structured array of shape (1,)
+        """
+        if self._buffers is None:
+            self._layouts.append(self.data.dtype)
+            self._grown.append(False)
+            self.data = row
+            return
+        self._segment += 1
+        buffer = self._buffers[self._segment]
+        if buffer is None:
+            self.data = row
+            return
+        for name in row.dtype.names:
+            buffer[name] = row[name]
+        self.data = buffer
+
+    def finish(self):
+        """Complete the row.
+
+        After the first row, the layout of the row is frozen.
+
+        :returns: the completed row
+        :rtype: numpy.array, structured array of shape (1,)
+        """
+        if self._buffers is None:
+            self._layouts.append(self.data.dtype)
+            self._buffers = [np.zeros((1,), dtype=layout) if grown else None
+                             for layout, grown in zip(self._layouts, self._grown)]
+        return self.data
+
+class _AsyncRunner:
+    """An asyncio event loop running on its own thread.
+
+    Experiments may be started from code that is already running an event
+    loop (such as the PLACE server), so the scheduler cannot use the loop of
+    the calling thread. Instead, coroutines are submitted to this private loop
+    and the caller waits for their results.
+    """
+    def __init__(self):
+        self._loop = new_event_loop()
+        self._thread = Thread(target=self._loop.run_forever, name='PLACE-asyncio', daemon=True)
+        self._thread.start()
+
+    def run(self, coroutine):
+        """Run a coroutine on the loop and wait for its result.
+
+        :param coroutine: the coroutine to run
+        :type coroutine: coroutine
+
+        :returns: the result of the coroutine
+        """
+        return run_coroutine_threadsafe(coroutine, self._loop).result()
+
+    def close(self):
+        """Stop the loop and release its resources."""
+        if self._loop.is_closed():
+            return
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+        self._loop.close()
+
+async def _call_async(module, method_name, *args):
+    """Call a module method, preferring its coroutine version.
+
+    Modules that do not provide a ``<method_name>_async`` coroutine have the
+    synchronous method run in an executor thread.
+
+    :param module: the PLACE module
+    :type module: Instrument, PostProcessing, or Export object
+
+    :param method_name: the name of the synchronous method
+    :type method_name: str
+
+    :returns: the value returned by the method
+    """
+    coroutine_function = getattr(module, method_name + '_async', None)
+    if coroutine_function is not None:
+        return await coroutine_function(*args)
+    return await get_event_loop().run_in_executor(None, getattr(module, method_name), *args)
+
+async def _timed(timer, module_name, phase, update_number, call):
+    """Make a call, recording how long it takes.
+
+    :param timer: the timer recording the duration
+    :type timer: place.timing.PhaseTimer
+
+    :param module_name: the name of the module being timed
+    :type module_name: str
+
+    :param phase: the phase being timed
+    :type phase: str
+
+    :param update_number: the count of the current update, or ``None``
+    :type update_number: int
+
+    :param call: function returning the coroutine to run
+    :type call: function
+
+    :returns: the result of the call
+    """
+    with timer.measure(module_name, phase, update_number):
+        return await call()
+
+async def _call_after(waits, call):
+    """Wait for other tasks to complete, then make a call.
+
+    If any of the tasks failed, its exception is raised instead.
+
+    :param waits: the tasks to wait for
+    :type waits: list
+
+    :param call: function returning the coroutine to run
+    :type call: function
+
+    :returns: the result of the call
+    """
+    for wait in waits:
+        await wait
+    return await call()
+
+async def _gather_all(calls):
+    """Wait for all the calls to complete, then raise the first error, if any.
+
+    Unlike a plain ``gather``, no call is left running when an error is
+    raised, so modules are never cleaned up while still being updated.
+
+    :param calls: the coroutines to run concurrently
+    :type calls: list
+
+    :returns: the results of the calls, in order
+    :rtype: list
+    """
+    results = await gather(*calls, return_exceptions=True)
+    for result in results:
+        if isinstance(result, BaseException):
+            raise result
+    return results
+
+def _order_modules(modules, declared, fields=None):
+    """Build the dependency graph of the modules and sort them to match it.
+
+    Modules are sorted so that every module comes after the modules it
+    depends on, with ties broken by priority.
+
+    :param modules: the modules of the experiment
+    :type modules: list
+
+    :param declared: the ``depends_on`` entry of each module, or ``None`` if
+                     it was not given
+    :type declared: list
+
+    :param fields: the ``data_register`` entry of each module, or ``None`` if
+                   it was not given
+    :type fields: list
+
+    :returns: the sorted modules, and the dependencies of each one (a set of
+              indices into the sorted modules, keyed by module index)
+    :rtype: list, dict
+
+    :raises ValueError: if a dependency cannot be found, could refer to
+                        several modules, or the dependencies form a cycle
+    """
+    names = [module.__class__.__name__ for module in modules]
+    if fields is None:
+        fields = [None] * len(modules)
+    dependencies = [set() for _ in modules]
+    for index, module_dependencies in enumerate(declared):
+        for dependency in module_dependencies or []:
+            dependencies[index].add(_find_dependency(dependency, names, fields, names[index]))
+    # undeclared modules depend on lower priority modules, unless that module
+    # already depends on them
+    for index in sorted(range(len(modules)), key=lambda index: modules[index].priority):
+        if declared[index] is not None:
+            continue
+        for other, other_module in enumerate(modules):
+            if (other_module.priority < modules[index].priority
+                    and index not in _ancestors(other, dependencies)):
+                dependencies[index].add(other)
+    waiting = [len(found) for found in dependencies]
+    ready = [(module.priority, index) for index, module in enumerate(modules)
+             if not waiting[index]]
+    heapify(ready)
+    order = []
+    while ready:
+        _, index = heappop(ready)
+        order.append(index)
+        for other, found in enumerate(dependencies):
+            if index in found:
+                waiting[other] -= 1
+                if not waiting[other]:
+                    heappush(ready, (modules[other].priority, other))
+    if len(order) < len(modules):
+        cycle = ', '.join(names[index] for index in range(len(modules)) if waiting[index])
+        raise ValueError("the dependencies of these modules form a cycle: " + cycle)
+    new_index = {old: new for new, old in enumerate(order)}
+    return ([modules[index] for index in order],
+            {new_index[index]: {new_index[dependency] for dependency in dependencies[index]}
+             for index in order})
+
+def _find_dependency(dependency, names, fields, dependent):
+    """Find the module a dependency refers to.
+
+    :param dependency: a class name, or the name of a field
+    :type dependency: str
+
+    :param names: the class name of each module
+    :type names: list
+
+    :param fields: the ``data_register`` entry of each module, or ``None``
+    :type fields: list
+
+    :param dependent: the class name of the module with the dependency
+    :type dependent: str
+
+    :returns: the index of the module
+    :rtype: int
+
+    :raises ValueError: if no module, or more than one module, matches
+    """
+    found = [index for index, name in enumerate(names) if name == dependency]
+    if not found:
+        found = [index for index, produced in enumerate(fields)
+                 if produced and dependency in produced]
+    if not found:
+        found = [index for index, name in enumerate(names)
+                 if not fields[index] and dependency.startswith(name + '-')]
+    if not found:
+        raise ValueError("{} depends on '{}', which is not a module ".format(
+            dependent, dependency) + "in this experiment")
+    if len(found) > 1:
+        raise ValueError("{} depends on '{}', which matches {} modules ".format(
+            dependent, dependency, len(found)) + "- depend on a field one of them produces")
+    return found[0]
+
+def _ancestors(index, dependencies):
+    """Get every module that a module depends on, directly or indirectly.
+
+    :param index: the index of the module
+    :type index: int
+
+    :param dependencies: the direct dependencies of each module
+    :type dependencies: list
+
+    :returns: the indices of the modules
+    :rtype: set
+    """
+    found = set()
+    pending = [index]
+    while pending:
+        for dependency in dependencies[pending.pop()]:
+            if dependency not in found:
+                found.add(dependency)
+                pending.append(dependency)
+    return found
+
 def _programmatic_import(module_name, class_name, config):
     """Import a module based on string input.
 
     This function takes a string for a module and a string for a class and
     imports that class from the given module programmatically.
 
-    :param module_name: the name of the module to import from
+    :param module_name: the name of the module to import from, relative to
+                        ``place.plugins`` unless it starts with ``place.``
     :type module_name: str
 
     :param class_name: the string of the class to import
@@ -161,7 +952,9 @@ def _programmatic_import(module_name, class_name, config):
 
     :raises TypeError: if requested module has not been subclassed correctly
     """
-    module = import_module('place.plugins.' + module_name)
+    if not module_name.startswith('place.'):
+        module_name = 'place.plugins.' + module_name
+    module = import_module(module_name)
     class_ = getattr(module, class_name)
     if (not issubclass(class_, Instrument) and
             not issubclass(class_, PostProcessing) and
@@ -0,0 +1,11 @@
+"""Hardware-free benchmarks for the PLACE experiment runner.
+
+Synthetic instruments and post-processing modules are used to drive a complete
+experiment through :class:`place.basic_experiment.BasicExperiment`. The
+throughput, the amount of data written, the peak memory use and the time spent
+in each phase are reported, and can be appended to a JSON file so runs can be
+compared::
+
+    place_bench --updates 200 --records 64 --latency 0.01 --output bench.json
+"""
+from .harness import run_benchmark, save_result, main
@@ -0,0 +1,190 @@
+"""Benchmark harness driving a complete PLACE experiment."""
+import json
+import os
+import resource
+from argparse import ArgumentParser
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import redirect_stdout
+from datetime import datetime
+from multiprocessing import get_context
+from shutil import rmtree
+from tempfile import mkdtemp
+from time import perf_counter
+from place.basic_experiment import BasicExperiment
+
+def build_config(options, directory):
+    """Build the experiment configuration for a benchmark.
+
+    :param options: the benchmark options (see :func:`main` for the keys)
+    :type options: dict
+
+    :param directory: the directory for the experiment data
+    :type directory: str
+
+    :returns: the experiment configuration
+    :rtype: dict
+
+    :raises ValueError: if the numbers of modules are not valid
+    """
+    if options['instruments'] < 0 or options['postprocessors'] < 0:
+        raise ValueError("the numbers of instruments and postprocessors cannot be negative")
+    if options['postprocessors'] and not options['instruments']:
+        raise ValueError("postprocessors need at least one instrument to process")
+    modules = []
+    for num in range(options['instruments']):
+        modules.append({
+            'module_name': 'place.bench.synthetic',
+            'class_name': 'SyntheticInstrument',
+            'priority': 100,
+            'config': {
+                'name': 'Synthetic{}'.format(num),
+                'channels': options['channels'],
+                'records': options['records'],
+                'samples': options['samples'],
+                'latency': options['latency'],
+                },
+            })
+    for num in range(options['postprocessors']):
+        modules.append({
+            'module_name': 'place.bench.synthetic',
+            'class_name': 'SyntheticPostProcessing',
+            'priority': 1000 + num,
+            'config': {
+                'name': 'Average{}'.format(num),
+                'trace_field': 'Synthetic{}-trace'.format(num % options['instruments']),
+                'latency': options['postprocessing_latency'],
+                'remove_trace_data': False,
+                },
+            })
+    return {
+        'updates': options['updates'],
+        'directory': directory,
+        'comments': 'PLACE benchmark',
+        'scheduler': options['scheduler'],
+        'pipeline': options['pipeline'],
+        'storage': options['storage'],
+        'modules': modules,
+        }
+
+def run_benchmark(options):
+    """Run a benchmark experiment and measure its performance.
+
+    Every benchmark runs in a new process, so the peak resident memory
+    reported belongs to that benchmark alone (including the memory of a
+    Python process that has imported PLACE), even when several benchmarks
+    are run from one program.
+
+    :param options: the benchmark options (see :func:`main` for the keys)
+    :type options: dict
+
+    :returns: the options and the results of the benchmark
+    :rtype: dict
+
+    :raises ValueError: if the numbers of modules are not valid
+    """
+    with ProcessPoolExecutor(max_workers=1, mp_context=get_context('spawn')) as pool:
+        return pool.submit(_run_benchmark, options).result()
+
+def _run_benchmark(options):
+    """Run a benchmark experiment in the current process.
+
+    :param options: the benchmark options (see :func:`main` for the keys)
+    :type options: dict
+
+    :returns: the options and the results of the benchmark
+    :rtype: dict
+    """
+    root = mkdtemp(prefix='place_bench_', dir=options.get('directory'))
+    try:
+        config = build_config(options, root + '/experiment')
+        with open(os.devnull, 'w') as devnull, redirect_stdout(devnull):
+            experiment = BasicExperiment(config)
+            start = perf_counter()
+            experiment.run()
+            elapsed = perf_counter() - start
+        written = _data_size(config['directory'])
+        with open(config['directory'] + '/config.json', 'r') as file_p:
+            timing = json.load(file_p)['metadata']['timing']
+    finally:
+        rmtree(root)
+    return {
+        'date': datetime.now().isoformat(),
+        'label': options.get('label', ''),
+        'options': options,
+        'seconds': elapsed,
+        'updates_per_second': options['updates'] / elapsed,
+        'megabytes_written': written / 2**20,
+        'megabytes_per_second': written / 2**20 / elapsed,
+        'peak_rss_megabytes': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 2**10,
+        'timing': timing,
+        }
+
+def _data_size(directory):
+    """Count the bytes of experiment data (including shards) in a directory."""
+    size = 0
+    for root, _, files in os.walk(directory):
+        for name in files:
+            if root != directory or name.startswith('scan_data'):
+                size += os.path.getsize(os.path.join(root, name))
+    return size
+
+def save_result(result, filename):
+    """Append a benchmark result to a JSON file.
+
+    The file holds a list of results, so runs can be compared over time.
+
+    :param result: the benchmark result
+    :type result: dict
+
+    :param filename: the JSON file
+    :type filename: str
+    """
+    try:
+        with open(filename, 'r') as file_p:
+            results = json.load(file_p)
+    except FileNotFoundError:
+        results = []
+    results.append(result)
+    with open(filename, 'w') as file_p:
+        json.dump(results, file_p, indent=2, sort_keys=True)
+
+def main():
+    """Command-line entry point for benchmarking PLACE."""
+    parser = ArgumentParser(
+        description='Benchmark the PLACE experiment runner with synthetic modules.')
+    parser.add_argument('--updates', type=int, default=100)
+    parser.add_argument('--instruments', type=int, default=1,
+                        help='number of synthetic instruments')
+    parser.add_argument('--postprocessors', type=int, default=0,
+                        help='number of synthetic post-processing modules')
+    parser.add_argument('--channels', type=int, default=2)
+    parser.add_argument('--records', type=int, default=16)
+    parser.add_argument('--samples', type=int, default=4096, help='samples per record')
+    parser.add_argument('--latency', type=float, default=0.0,
+                        help='simulated instrument latency per update (seconds)')
+    parser.add_argument('--postprocessing-latency', type=float, default=0.0,
+                        help='additional post-processing time per update (seconds)')
+    parser.add_argument('--scheduler', default='serial', choices=['serial', 'asyncio'])
+    parser.add_argument('--pipeline', action='store_true')
+    parser.add_argument('--storage', default='files')
+    parser.add_argument('--directory', default=None,
+                        help='where to write the experiment data (default: system temp)')
+    parser.add_argument('--label', default='', help='a label stored with the result')
+    parser.add_argument('--output', default=None,
+                        help='JSON file to append the result to')
+    options = vars(parser.parse_args())
+    output = options.pop('output')
+    try:
+        result = run_benchmark(options)
+    except ValueError as err:
+        parser.error(str(err))
+    print('{:.2f} updates/s, {:.2f} MB/s, peak RSS {:.1f} MB'.format(
+        result['updates_per_second'],
+        result['megabytes_per_second'],
+        result['peak_rss_megabytes']))
+    for module_name, phases in sorted(result['timing'].items()):
+        for phase, stats in sorted(phases.items()):
+            print('  {:<28} {:<12} mean {:9.6f} s  p95 {:9.6f} s'.format(
+                module_name, phase, stats['mean'], stats['p95']))
+    if output is not None:
+        save_result(result, output)
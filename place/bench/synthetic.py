@@ -0,0 +1,162 @@
+"""Synthetic PLACE modules for benchmarking.
+
+These modules produce and process data shaped like real instrument data, but
+need no hardware. The time an instrument spends waiting on its hardware is
+simulated with a configurable latency.
+"""
+from time import sleep
+from asyncio import sleep as async_sleep
+import numpy as np
+from numpy.lib import recfunctions as rfn
+from place.plugins.instrument import Instrument
+from place.plugins.postprocessing import PostProcessing
+
+class SyntheticInstrument(Instrument):
+    """Instrument producing random trace data.
+
+    The trace is shaped like the trace of an AlazarTech card.
+
+    SyntheticInstrument requires the following configuration data (accessible
+    as self._config['*key*']):
+
+    ========================= ============== ================================================
+    Key                       Type           Meaning
+    ========================= ============== ================================================
+    name                      string         the prefix of the field name
+    channels                  int            number of channels in the trace
+    records                   int            number of records per channel
+    samples                   int            number of samples per record
+    latency                   float          seconds spent waiting on the "hardware" during
+                                             each update
+    ========================= ============== ================================================
+
+    SyntheticInstrument will produce the following experimental data:
+
+    +---------------+-------------------------+-------------------------+
+    | Heading       | Type                    | Meaning                 |
+    +===============+=========================+=========================+
+    | *name*-trace  | (channel,record,sample) | random trace data       |
+    |               | array of uint16         |                         |
+    +---------------+-------------------------+-------------------------+
+    """
+    def __init__(self, config):
+        """Constructor
+
+        :param config: configuration data (from JSON)
+        :type config: dict
+        """
+        Instrument.__init__(self, config)
+        self._trace = None
+        self._dtype = None
+
+    def config(self, metadata, total_updates):
+        """Generate the trace returned during each update.
+
+        :param metadata: metadata for the experiment
+        :type metadata: dict
+
+        :param total_updates: the number of update steps that will be in this experiment
+        :type total_updates: int
+        """
+        shape = (self._config['channels'], self._config['records'], self._config['samples'])
+        self._trace = np.random.randint(0, 2**14, size=shape, dtype='uint16')
+        field = '{}-trace'.format(self._config['name'])
+        self._dtype = [(field, 'uint16', shape)]
+        metadata['{}-samples_per_record'.format(self._config['name'])] = shape[2]
+
+    def update(self, update_number):
+        """Wait for the simulated hardware, then return the trace.
+
+        :param update_number: the current update count
+        :type update_number: int
+
+        :returns: the trace data
+        :rtype: numpy.array dtype='(*channels*,*records*,*samples*)uint16'
+        """
+        sleep(self._config['latency'])
+        return np.array([(self._trace,)], dtype=self._dtype)
+
+    async def update_async(self, update_number):
+        """Wait for the simulated hardware, without blocking the event loop.
+
+        :param update_number: the current update count
+        :type update_number: int
+
+        :returns: the trace data
+        :rtype: numpy.array dtype='(*channels*,*records*,*samples*)uint16'
+        """
+        await async_sleep(self._config['latency'])
+        return np.array([(self._trace,)], dtype=self._dtype)
+
+    def cleanup(self, abort=False):
+        """Release the trace.
+
+        :param abort: indicates the experiment is being aborted
+        :type abort: bool
+        """
+        self._trace = None
+
+class SyntheticPostProcessing(PostProcessing):
+    """Post-processing averaging the records of a trace.
+
+    SyntheticPostProcessing requires the following configuration data
+    (accessible as self._config['*key*']):
+
+    ========================= ============== ================================================
+    Key                       Type           Meaning
+    ========================= ============== ================================================
+    name                      string         the prefix of the new field name
+    trace_field               string         the field containing the trace to average
+    latency                   float          additional seconds spent during each update
+    remove_trace_data         bool           true if the original trace should be removed
+    ========================= ============== ================================================
+
+    SyntheticPostProcessing will produce the following experimental data:
+
+    +----------------+-------------------------+-------------------------+
+    | Heading        | Type                    | Meaning                 |
+    +================+=========================+=========================+
+    | *name*-average | (channel,sample)        | the average record of   |
+    |                | array of float64        | each channel            |
+    +----------------+-------------------------+-------------------------+
+    """
+    def config(self, metadata, total_updates):
+        """Nothing to configure.
+
+        :param metadata: metadata for the experiment
+        :type metadata: dict
+
+        :param total_updates: the number of update steps that will be in this experiment
+        :type total_updates: int
+        """
+        pass
+
+    def update(self, update_number, data):
+        """Average the records of the trace.
+
+        :param update_number: the current update count
+        :type update_number: int
+
+        :param data: row data collected so far from other instruments
+        :type data: numpy.array, structured array of shape (1,)
+
+        :returns: the row with the averaged trace added
+        :rtype: numpy.array, structured array of shape (1,)
+        """
+        field = self._config['trace_field']
+        average = data[field][0].mean(axis=1)
+        if self._config['remove_trace_data']:
+            data = rfn.drop_fields(data, field, usemask=False)
+        processed_data = np.array(
+            [(average,)],
+            dtype=[('{}-average'.format(self._config['name']), 'float64', average.shape)])
+        sleep(self._config['latency'])
+        return rfn.merge_arrays([data, processed_data], flatten=True, usemask=False)
+
+    def cleanup(self, abort=False):
+        """Nothing to clean up.
+
+        :param abort: indicates the experiment is being aborted
+        :type abort: bool
+        """
+        pass
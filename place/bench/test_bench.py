@@ -0,0 +1,48 @@
+"""Basic testing for the benchmark harness"""
+from unittest import TestCase
+import unittest
+from place.bench import run_benchmark
+from place.bench.harness import build_config
+
+TEST_OPTIONS = {
+    'updates': 5,
+    'instruments': 2,
+    'postprocessors': 1,
+    'channels': 2,
+    'records': 4,
+    'samples': 64,
+    'latency': 0.0,
+    'postprocessing_latency': 0.0,
+    'scheduler': 'asyncio',
+    'pipeline': True,
+    'storage': 'memmap',
+    }
+
+class TestBench(TestCase):
+    """Test class"""
+    def test0001_run_benchmark(self):
+        """Test that a small benchmark runs and reports its results"""
+        result = run_benchmark(dict(TEST_OPTIONS))
+        self.assertGreater(result['updates_per_second'], 0)
+        self.assertGreater(result['megabytes_written'], 0)
+        self.assertEqual(result['timing']['SyntheticInstrument']['update']['count'], 5)
+        self.assertIn('SyntheticPostProcessing', result['timing'])
+
+    def test0002_peak_rss(self):
+        """Test that the peak memory use is measured for each benchmark"""
+        large = run_benchmark(dict(TEST_OPTIONS, records=64, samples=2**16))
+        small = run_benchmark(dict(TEST_OPTIONS))
+        # each trace of the large benchmark takes 16 MiB
+        self.assertGreater(large['peak_rss_megabytes'], small['peak_rss_megabytes'] + 32)
+        with self.assertRaises(ValueError):
+            run_benchmark(dict(TEST_OPTIONS, instruments=0))
+
+    def test0003_invalid_options(self):
+        """Test that impossible numbers of modules are rejected"""
+        for instruments, postprocessors in ((0, 1), (-1, 0), (1, -1)):
+            options = dict(TEST_OPTIONS, instruments=instruments, postprocessors=postprocessors)
+            with self.assertRaises(ValueError):
+                build_config(options, '')
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2, buffer=True)
@@ -0,0 +1,330 @@
+"""A searchable index of PLACE experiments, stored in SQLite.
+
+The catalog records, for each experiment directory:
+
+* the ``comments``, number of ``updates`` and number of ``completed`` updates,
+  the total ``size`` of the data files (in bytes) and the PLACE ``version``
+* the other top-level configuration values (such as ``storage``)
+* each module, with its configuration
+* each metadata value
+* the name, type and shape of each data field
+
+Indexing a directory tree finds every ``config.json`` below it. Experiments
+that have not been modified since they were last indexed are skipped, so
+re-indexing a large archive only reads new or changed experiments, and
+experiments that have been deleted are removed from the catalog.
+
+Experiments are found with conditions of the form ``KEY OP VALUE``, where
+``OP`` is one of ``=``, ``!=``, ``<``, ``<=``, ``>``, ``>=`` or ``~``
+(contains). ``KEY`` may be:
+
+================== ==============================================================
+Key                Meaning
+================== ==============================================================
+comments, updates, the experiment values listed above
+completed, size,
+version, directory
+module             the class name of any module in the experiment
+field              the name of any data field
+*Class.key*        the configuration value *key* of a module of class *Class*
+*metadata.key*     the metadata value *key*
+*config.key*       the top-level configuration value *key*
+*key*              any metadata or configuration value *key*
+================== ==============================================================
+
+Values are compared as numbers when both are numbers. For example, from the
+command line::
+
+    place_catalog index ~/experiments
+    place_catalog find module=ATS9440 ATS9440.sample_rate=SAMPLE_RATE_10MSPS dd_300=true
+"""
+import json
+import os
+import re
+import sqlite3
+from argparse import ArgumentParser
+from os.path import expanduser, getmtime, isfile
+import numpy as np
+from .storage import completed_updates, data_files
+
+DEFAULT_CATALOG = '~/.place_catalog.sqlite'
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS experiments (
+    id INTEGER PRIMARY KEY,
+    directory TEXT UNIQUE NOT NULL,
+    mtime REAL NOT NULL,
+    comments TEXT,
+    updates INTEGER,
+    completed INTEGER,
+    size INTEGER,
+    version TEXT
+);
+CREATE TABLE IF NOT EXISTS modules (
+    experiment_id INTEGER NOT NULL REFERENCES experiments(id) ON DELETE CASCADE,
+    module_name TEXT,
+    class_name TEXT,
+    priority INTEGER,
+    config TEXT
+);
+CREATE TABLE IF NOT EXISTS settings (
+    experiment_id INTEGER NOT NULL REFERENCES experiments(id) ON DELETE CASCADE,
+    scope TEXT NOT NULL,
+    key TEXT NOT NULL,
+    value TEXT,
+    number REAL
+);
+CREATE TABLE IF NOT EXISTS fields (
+    experiment_id INTEGER NOT NULL REFERENCES experiments(id) ON DELETE CASCADE,
+    name TEXT NOT NULL,
+    dtype TEXT,
+    shape TEXT
+);
+CREATE INDEX IF NOT EXISTS settings_key ON settings (key, scope);
+CREATE INDEX IF NOT EXISTS modules_class ON modules (class_name);
+CREATE INDEX IF NOT EXISTS fields_name ON fields (name);
+"""
+
+_EXPERIMENT_COLUMNS = ('directory', 'comments', 'updates', 'completed', 'size', 'version')
+
+_NUMERIC_COLUMNS = ('updates', 'completed', 'size')
+
+_OPERATORS = {'=': '=', '!=': '!=', '<': '<', '<=': '<=', '>': '>', '>=': '>=', '~': 'LIKE'}
+
+_CONDITION = re.compile(r'^([^=<>!~]+)(!=|<=|>=|=|<|>|~)(.*)$')
+
+class Catalog:
+    """An index of PLACE experiments."""
+    def __init__(self, filename=DEFAULT_CATALOG):
+        """Constructor
+
+        :param filename: the SQLite database, which is created if necessary
+        :type filename: str
+        """
+        self._db = sqlite3.connect(expanduser(filename))
+        self._db.execute('PRAGMA foreign_keys = ON')
+        self._db.executescript(_SCHEMA)
+
+    def close(self):
+        """Close the database."""
+        self._db.close()
+
+    def index(self, root):
+        """Add or refresh every experiment below a directory.
+
+        :param root: the directory to search
+        :type root: str
+
+        :returns: the number of experiments added or refreshed, the number
+                  skipped because they are unchanged, and the number removed
+                  because they no longer exist
+        :rtype: (int, int, int)
+        """
+        root = os.path.abspath(root)
+        known = dict(self._db.execute(
+            "SELECT directory, mtime FROM experiments "
+            "WHERE directory = ? OR directory LIKE ? ESCAPE '\\'",
+            (root, _escape_like(root + os.sep) + '%')))
+        refreshed = skipped = 0
+        for directory, subdirectories, files in os.walk(root):
+            if 'config.json' not in files:
+                continue
+            if 'scan_data' in subdirectories:
+                subdirectories.remove('scan_data')
+            mtime = _modified(directory)
+            if known.pop(directory, None) == mtime:
+                skipped += 1
+                continue
+            try:
+                self.add(directory, mtime)
+            except (ValueError, KeyError, OSError) as err:
+                print('Skipping {}: {}'.format(directory, err))
+                continue
+            refreshed += 1
+        with self._db:
+            for directory in known:
+                self._db.execute("DELETE FROM experiments WHERE directory = ?", (directory,))
+        return refreshed, skipped, len(known)
+
+    def add(self, directory, mtime=None):
+        """Add or replace one experiment.
+
+        :param directory: the experiment directory
+        :type directory: str
+
+        :param mtime: the modification time of the experiment, if known
+        :type mtime: float
+
+        :raises ValueError: if ``config.json`` cannot be decoded
+        """
+        directory = os.path.abspath(directory)
+        if mtime is None:
+            mtime = _modified(directory)
+        with open(directory + '/config.json', 'r') as file_p:
+            config = json.load(file_p)
+        files = data_files(directory)
+        fields = []
+        if files:
+            try:
+                fields = _describe_fields(files[0])
+            except ValueError:
+                fields = []
+        with self._db:
+            self._db.execute("DELETE FROM experiments WHERE directory = ?", (directory,))
+            experiment_id = self._db.execute(
+                "INSERT INTO experiments (directory, mtime, comments, updates, completed, "
+                "size, version) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (directory, mtime, config.get('comments'), config.get('updates'),
+                 completed_updates(directory) if files else 0,
+                 sum(os.path.getsize(filename) for filename in files),
+                 config.get('metadata', {}).get('PLACE_version'))).lastrowid
+            for module in config.get('modules', []):
+                self._db.execute(
+                    "INSERT INTO modules VALUES (?, ?, ?, ?, ?)",
+                    (experiment_id, module.get('module_name'), module.get('class_name'),
+                     module.get('priority'), json.dumps(module.get('config', {}),
+                                                        sort_keys=True)))
+                for key, value in module.get('config', {}).items():
+                    self._add_setting(experiment_id, module.get('class_name'), key, value)
+            for key, value in config.get('metadata', {}).items():
+                self._add_setting(experiment_id, 'metadata', key, value)
+            for key, value in config.items():
+                if key not in ('modules', 'metadata') + _EXPERIMENT_COLUMNS:
+                    self._add_setting(experiment_id, 'config', key, value)
+            self._db.executemany("INSERT INTO fields VALUES (?, ?, ?, ?)",
+                                 [(experiment_id,) + field for field in fields])
+
+    def find(self, conditions):
+        """Find the experiments matching every condition.
+
+        :param conditions: conditions such as ``'module=ATS9440'`` (see the
+                           module documentation)
+        :type conditions: list
+
+        :returns: the ``directory``, ``comments``, ``updates``,
+                  ``completed``, ``size`` and ``version`` of each experiment,
+                  ordered by directory
+        :rtype: list
+
+        :raises ValueError: if a condition cannot be understood
+        """
+        clauses = []
+        parameters = []
+        for condition in conditions:
+            clause, values = _parse_condition(condition)
+            clauses.append(clause)
+            parameters.extend(values)
+        query = "SELECT {} FROM experiments".format(', '.join(_EXPERIMENT_COLUMNS))
+        if clauses:
+            query += " WHERE " + " AND ".join(clauses)
+        query += " ORDER BY directory"
+        return [dict(zip(_EXPERIMENT_COLUMNS, row))
+                for row in self._db.execute(query, parameters)]
+
+    def _add_setting(self, experiment_id, scope, key, value):
+        text = value if isinstance(value, str) else json.dumps(value, sort_keys=True)
+        self._db.execute("INSERT INTO settings VALUES (?, ?, ?, ?, ?)",
+                         (experiment_id, scope, key, text, _number(value)))
+
+def _parse_condition(condition):
+    """Convert a condition into an SQL clause and its parameters."""
+    match = _CONDITION.match(condition)
+    if match is None:
+        raise ValueError("cannot understand condition '{}'".format(condition))
+    key, operator, value = match.group(1).strip(), match.group(2), match.group(3).strip()
+    sql_operator = _OPERATORS[operator]
+    if operator == '~':
+        value = '%' + _escape_like(value) + '%'
+    number = None if operator == '~' else _number(value)
+    if key in _EXPERIMENT_COLUMNS:
+        if key in _NUMERIC_COLUMNS and number is not None:
+            value = number
+        return "{} {} ?{}".format(key, sql_operator, _escape(operator)), [value]
+    if key == 'module':
+        return ("id IN (SELECT experiment_id FROM modules WHERE class_name {} ?{})".format(
+            sql_operator, _escape(operator)), [value])
+    if key == 'field':
+        return ("id IN (SELECT experiment_id FROM fields WHERE name {} ?{})".format(
+            sql_operator, _escape(operator)), [value])
+    scope, _, name = key.rpartition('.')
+    compare = "(number {0} ? OR number IS NULL AND value {0} ?)".format(sql_operator)
+    values = [number, value]
+    if number is None:
+        compare = "value {} ?{}".format(sql_operator, _escape(operator))
+        values = [value]
+    if scope:
+        return ("id IN (SELECT experiment_id FROM settings WHERE scope = ? AND key = ? "
+                "AND {})".format(compare), [scope, name] + values)
+    return ("id IN (SELECT experiment_id FROM settings WHERE key = ? AND {})".format(compare),
+            [name] + values)
+
+def _describe_fields(filename):
+    """Describe the data fields of an experiment."""
+    dtype = np.load(filename, mmap_mode='r').dtype
+    return [(name, dtype[name].base.str, json.dumps(dtype[name].shape))
+            for name in dtype.names or ()]
+
+def _modified(directory):
+    """Get the latest modification time of an experiment."""
+    times = [getmtime(directory)]
+    for name in ('config.json', 'scan_data.npy', 'scan_data'):
+        if os.path.exists(os.path.join(directory, name)):
+            times.append(getmtime(os.path.join(directory, name)))
+    index = os.path.join(directory, 'scan_data', 'index.json')
+    if isfile(index):
+        times.append(getmtime(index))
+    return max(times)
+
+def _number(value):
+    """Get a value as a number, or ``None`` if it is not a number."""
+    if isinstance(value, bool):
+        return None
+    if isinstance(value, (int, float)):
+        return float(value)
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+def _escape(operator):
+    return " ESCAPE '\\'" if operator == '~' else ''
+
+def _escape_like(text):
+    return text.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+
+def main():
+    """Command-line entry point for the PLACE catalog."""
+    parser = ArgumentParser(description='Index and search PLACE experiments.')
+    parser.add_argument('--catalog', default=DEFAULT_CATALOG,
+                        help='the catalog database (default: {})'.format(DEFAULT_CATALOG))
+    commands = parser.add_subparsers(dest='command')
+    index_parser = commands.add_parser('index', help='add or refresh experiments')
+    index_parser.add_argument('roots', nargs='+', metavar='DIRECTORY')
+    find_parser = commands.add_parser('find', help='find experiments')
+    find_parser.add_argument('conditions', nargs='*', metavar='CONDITION',
+                             help='for example: module=ATS9440 updates>100')
+    find_parser.add_argument('--json', action='store_true', help='print JSON')
+    args = parser.parse_args()
+    if args.command is None:
+        parser.print_help()
+        return
+    catalog = Catalog(args.catalog)
+    try:
+        if args.command == 'index':
+            for root in args.roots:
+                refreshed, skipped, removed = catalog.index(root)
+                print('{}: {} indexed, {} unchanged, {} removed'.format(
+                    root, refreshed, skipped, removed))
+        else:
+            try:
+                results = catalog.find(args.conditions)
+            except ValueError as err:
+                parser.error(str(err))
+            if args.json:
+                print(json.dumps(results, indent=2))
+            else:
+                for result in results:
+                    print('{directory}  {completed}/{updates} updates  {comments}'.format(
+                        **result))
+    finally:
+        catalog.close()
@@ -0,0 +1,151 @@
+"""Lazy access to the data saved by PLACE experiments.
+
+:func:`open` gives a :class:`Dataset` for an experiment directory, without
+reading the data into memory. When the data has been packed into
+``scan_data.npy``, the file is memory-mapped and selecting a field or a range
+of rows returns a view of the file, so only the bytes that are actually used
+are read from disk. For example, this reads only the position column of a
+scan:
+
+.. code-block:: python
+
+    import place.data
+
+    scan = place.data.open('/data/scan_1')
+    positions = scan['LongStage-position']
+    sampling_rate = scan.metadata['sampling_rate']
+
+When the data is in shard files, or still in one ``scan_data_NNN.npy`` file
+per update (because the experiment is running, was interrupted, or has been
+unpacked), each file is memory-mapped instead. Selecting a field then gathers
+that field from each file into a new array, still without reading the other
+fields.
+
+Only complete updates are included: the progress recorded by an experiment in
+progress is honoured (see :mod:`place.storage`).
+"""
+import builtins
+import json
+from os.path import isfile
+import numpy as np
+from .storage import completed_updates, read_progress, row_filename, shard_files
+
+def open(directory): #pylint: disable=redefined-builtin
+    """Open the data of a PLACE experiment.
+
+    :param directory: the experiment directory
+    :type directory: str
+
+    :returns: the dataset
+    :rtype: Dataset
+
+    :raises FileNotFoundError: if the directory contains no PLACE data
+    """
+    return Dataset(directory)
+
+class Dataset:
+    """The data and metadata of a PLACE experiment.
+
+    Indexing a dataset with a field name returns that field for every update.
+    Indexing with an integer or a slice returns those rows, as a structured
+    array.
+
+    Internally, the data is a list of memory-mapped *chunks* of consecutive
+    rows: the packed file, each shard, or each row file.
+    """
+    def __init__(self, directory):
+        """Constructor
+
+        :param directory: the experiment directory
+        :type directory: str
+
+        :raises FileNotFoundError: if the directory contains no PLACE data
+        """
+        self.directory = directory
+        try:
+            with builtins.open(directory + '/config.json', 'r') as file_p:
+                self.config = json.load(file_p)
+        except FileNotFoundError:
+            self.config = {}
+        filename = directory + '/scan_data.npy'
+        shards = shard_files(directory)
+        if isfile(filename):
+            data = np.load(filename, mmap_mode='r')
+            progress = read_progress(directory)
+            self._chunks = [data if progress is None else data[:progress]]
+        elif shards is not None:
+            self._chunks = [np.load(shard, mmap_mode='r')[:rows] for shard, rows in shards]
+        else:
+            self._chunks = [np.load(row_filename(directory, number), mmap_mode='r')
+                            for number in range(completed_updates(directory))]
+        if not self._chunks:
+            raise FileNotFoundError('no PLACE data found in {}'.format(directory))
+        self._starts = np.cumsum([0] + [len(chunk) for chunk in self._chunks])
+
+    @property
+    def metadata(self):
+        """The metadata recorded by the experiment.
+
+        :rtype: dict
+        """
+        return self.config.get('metadata', {})
+
+    @property
+    def dtype(self):
+        """The data type of one row.
+
+        :rtype: numpy.dtype
+        """
+        return self._chunks[0].dtype
+
+    @property
+    def fields(self):
+        """The names of the fields in each row.
+
+        :rtype: tuple
+        """
+        return self.dtype.names
+
+    @property
+    def packed(self):
+        """``True`` if the data is in a single memory-mapped array.
+
+        :rtype: bool
+        """
+        return len(self._chunks) == 1
+
+    def __len__(self):
+        return int(self._starts[-1])
+
+    def __getitem__(self, key):
+        """Select a field or rows of the data.
+
+        :param key: a field name, row number, or slice of rows
+        :type key: str, int or slice
+
+        :returns: the selected data; a read-only view of the file when the
+                  data is packed
+        :rtype: numpy.array
+        """
+        if len(self._chunks) == 1:
+            return self._chunks[0][key]
+        if isinstance(key, str):
+            return np.concatenate([chunk[key] for chunk in self._chunks])
+        if isinstance(key, slice):
+            numbers = np.arange(*key.indices(len(self)))
+            chunk_numbers = np.searchsorted(self._starts, numbers, side='right') - 1
+            return np.concatenate(
+                [self._chunks[0][:0]] +
+                [self._chunks[chunk][numbers[chunk_numbers == chunk] - self._starts[chunk]]
+                 for chunk in np.unique(chunk_numbers)])
+        number = range(len(self))[key]
+        chunk = int(np.searchsorted(self._starts, number, side='right')) - 1
+        return self._chunks[chunk][number - self._starts[chunk]]
+
+    def __iter__(self):
+        for number in range(len(self)):
+            yield self[number]
+
+    def __repr__(self):
+        return "<PLACE dataset '{}': {} updates of {}>".format(
+            self.directory, len(self), ', '.join(self.fields))
@@ -8,11 +8,14 @@ __version__ = "0.6.0"
 
 import sys
 import json
-from asyncio import get_event_loop
+from asyncio import get_event_loop, ensure_future, Event
 import signal
 from websockets.server import serve
 from websockets.exceptions import ConnectionClosed
 from .basic_experiment import BasicExperiment
+from .jobs import JobQueue, FINISHED
+from .plot_process import PlotProcess
+from . import plots
 
 def experiment_server(port=9130):
     """Starts a websocket server to listen for experiment requests.
@@ -21,34 +24,119 @@ def experiment_server(port=9130):
     than specify the parameters via the command-line, this mode waits
     for PLACE experiment configuration to arrive via a websocket.
 
+    Experiments are run one at a time by a :class:`place.jobs.JobQueue`, so
+    the server keeps answering clients while an experiment runs. Each message
+    starts with a six character tag:
+
+    ============================ ================================================
+    Client message               Meaning
+    ============================ ================================================
+    ``<SUBM>`` + JSON            queue an experiment (the server replies
+                                 ``<QUED>`` with the job status)
+    JSON (with no tag)           queue an experiment, with no reply (this is
+                                 what the web app sends)
+    ``<LIST>``                   list all jobs (the server replies ``<JOBS>``)
+    ``<CNCL>`` + job id          cancel a job (the server replies ``<CNCL>``
+                                 with the job status)
+    ``<WTCH>`` + job id          stream the progress of a job
+    ``<LIVE>``                   stream live plot data from the modules
+    ============================ ================================================
+
+    A watched job sends ``<PROG>`` with its status (see
+    :meth:`place.jobs.Job.status`) after each update is saved, and ``<DONE>``
+    with its status when it finishes. Tagged requests that cannot be
+    understood are answered with ``<ERRR>`` and a description of the problem.
+
+    Live plot data is sent as ``<FRAM>`` messages (see
+    :func:`place.plots.encode_frame`), which the web app draws. While the
+    server runs, modules do not draw their own plots. A client that cannot
+    keep up with the plot data is sent only the latest data of each plot.
+
     Once this server is started, it will need to be killed via ctrl-c or
     similar.
 
     """
+    watchers = {}
+
     def ask_exit():
         """Signal handler to catch ctrl-c (SIGINT) or SIGTERM"""
         loop.stop()
 
+    def job_changed(job):
+        """Listener called on the job thread whenever a job progresses."""
+        tag = '<DONE>' if job.state in FINISHED else '<PROG>'
+        message = tag + json.dumps(job.status())
+        loop.call_soon_threadsafe(send_to_watchers, job.job_id, message, tag == '<DONE>')
+
+    def send_to_watchers(job_id, message, done):
+        """Send a job update to the websockets watching the job."""
+        sockets = watchers.pop(job_id, set()) if done else watchers.get(job_id, set())
+        for websocket in sockets:
+            ensure_future(_send_quietly(websocket, message))
+
+    def watch(websocket, job_id):
+        """Start streaming the progress of a job to a websocket."""
+        job = jobs.job(job_id)
+        if job.state in FINISHED:
+            ensure_future(_send_quietly(websocket, '<DONE>' + json.dumps(job.status())))
+        else:
+            watchers.setdefault(job_id, set()).add(websocket)
+
+    def handle(websocket, message):
+        """Handle one client message, returning the reply (if any)."""
+        tag, body = message[:6], message[6:]
+        if tag == '<SUBM>':
+            return '<QUED>' + json.dumps(jobs.submit(json.loads(body)).status())
+        if tag == '<LIST>':
+            return '<JOBS>' + json.dumps(jobs.jobs())
+        if tag == '<CNCL>':
+            jobs.cancel(int(body))
+            return '<CNCL>' + json.dumps(jobs.job(int(body)).status())
+        if tag == '<WTCH>':
+            watch(websocket, int(body))
+            return None
+        # an untagged message is an experiment from the web app, which does
+        # not understand any of the replies above
+        try:
+            jobs.submit(json.loads(message))
+        except (ValueError, KeyError) as err:
+            print("...could not queue experiment: {}: {}".format(err.__class__.__name__, err))
+        return None
+
     async def experiment_socket(websocket, _):
         """Creates an asyncronous websocket to listen for experiments."""
         print("...sending connection message...")
         await websocket.send('<VERS>' + __version__)
-        # get experiment configuration from the webapp
+        sys.stdout.flush()
+        plotting = None
         try:
-            print("...waiting for experiment configuration data...")
-            sys.stdout.flush()
-            json_string = await websocket.recv()
+            while True:
+                message = await websocket.recv()
+                if message == '<LIVE>':
+                    if plotting is None:
+                        plotting = _PlotStream(websocket, loop)
+                    continue
+                try:
+                    reply = handle(websocket, message)
+                except (ValueError, KeyError) as err:
+                    reply = '<ERRR>{}: {}'.format(err.__class__.__name__, err)
+                if reply is not None:
+                    await websocket.send(reply)
         except ConnectionClosed as err:
             print("...connection closed: " + str(err))
-        else:
-            print("...starting experiment...")
-            web_main(json_string)
-            print("...experiment complete.")
+        finally:
+            for sockets in watchers.values():
+                sockets.discard(websocket)
+            if plotting is not None:
+                plotting.close()
 
     print("PLACE " + __version__ + " | Author: Paul Freeman | 2018")
     print("Originally created by: Jami L Johnson, Henrik tom Wörden, and Kasper van Wijk")
     print("Starting websockets server on port {}".format(port))
     loop = get_event_loop()
+    plots.set_local_plotting(False)
+    jobs = JobQueue()
+    jobs.add_listener(job_changed)
     # set up signal handlers
     for signame in ('SIGINT', 'SIGTERM'):
         loop.add_signal_handler(getattr(signal, signame), ask_exit)
@@ -57,10 +145,48 @@ def experiment_server(port=9130):
     server = loop.run_until_complete(coroutine)
     loop.run_forever()
     # cleanup
+    jobs.close()
     server.close()
     loop.run_until_complete(server.wait_closed())
     loop.close()
 
+class _PlotStream:
+    """Sends the frames published on the plot bus to one websocket."""
+    def __init__(self, websocket, loop):
+        self._websocket = websocket
+        self._ready = Event()
+        self._subscription = plots.BUS.subscribe(
+            wake=lambda: loop.call_soon_threadsafe(self._ready.set))
+        self._task = ensure_future(self._send_frames())
+
+    async def _send_frames(self):
+        """Send the waiting frames whenever new frames are published.
+
+        Frames published while a send is in progress replace older frames of
+        the same plot, so a slow client drops frames rather than falling
+        behind.
+        """
+        try:
+            while True:
+                await self._ready.wait()
+                self._ready.clear()
+                for frame in self._subscription.take():
+                    await self._websocket.send(plots.encode_frame(frame))
+        except ConnectionClosed:
+            pass
+
+    def close(self):
+        """Stop sending frames."""
+        plots.BUS.unsubscribe(self._subscription)
+        self._task.cancel()
+
+async def _send_quietly(websocket, message):
+    """Send a message, ignoring a websocket that has been closed."""
+    try:
+        await websocket.send(message)
+    except ConnectionClosed:
+        pass
+
 def main():
     """Command-line entry point for an experiment."""
     # JSON data can be sent in through stdin
@@ -71,6 +197,9 @@ def main():
     elif len(sys.argv[1:]) == 2 and (sys.argv[1] == '-f' or sys.argv[1] == '--file'):
         with open(sys.argv[2]) as json_file:
             _experiment_main(json.load(json_file))
+    # or an interrupted experiment can be resumed from its directory
+    elif len(sys.argv[1:]) == 2 and sys.argv[1] == '--resume':
+        _resume_main(sys.argv[2])
     # or the JSON can just be the only argument
     elif len(sys.argv[1:]) == 1:
         _experiment_main(json.loads(sys.argv[1]))
@@ -80,6 +209,7 @@ def main():
         print("       place_experiment -f [JSON_FILE]")
         print("       place_experiment --file [JSON_FILE]")
         print("       place_experiment < [JSON_FILE]")
+        print("       place_experiment --resume [EXPERIMENT_DIRECTORY]")
         sys.exit(-1)
 
 def web_main(args):
@@ -87,4 +217,25 @@ def web_main(args):
     _experiment_main(json.loads(args))
 
 def _experiment_main(config):
-    BasicExperiment(config).run()
+    _run_with_plots(BasicExperiment(config), config)
+
+def _resume_main(directory):
+    with open(directory + '/config.json') as json_file:
+        config = json.load(json_file)
+    config['directory'] = directory
+    _run_with_plots(BasicExperiment(config, resume=True), config)
+
+def _run_with_plots(experiment, config):
+    """Run an experiment, drawing its plots in a separate process."""
+    if not any(module.get('config', {}).get('plot') in (True, 'yes')
+               for module in config.get('modules', [])):
+        experiment.run()
+        return
+    plot_process = PlotProcess()
+    plot_process.start()
+    try:
+        experiment.run()
+    except BaseException:
+        plot_process.close(wait=False)
+        raise
+    plot_process.close()
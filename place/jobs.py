@@ -0,0 +1,273 @@
+"""A queue of PLACE experiments run one at a time on a worker thread.
+
+The PLACE server uses a :class:`JobQueue` so that it can keep answering
+clients while an experiment runs. Each experiment submitted to the queue
+becomes a :class:`Job`, identified by a number. Jobs run in the order they were
+submitted, and can be cancelled while they are waiting or running. Listeners
+registered with :meth:`JobQueue.add_listener` are told about the progress of
+each job after every update, and when it finishes.
+
+A job is in one of the following states:
+
+========== ================================================================
+State      Meaning
+========== ================================================================
+queued     waiting for earlier jobs to finish
+running    the experiment is running
+complete   the experiment finished normally
+cancelled  the job was cancelled (a running experiment is aborted after
+           its current update)
+failed     the experiment raised an exception
+========== ================================================================
+"""
+from queue import Queue
+from threading import Event, Lock, Thread
+from time import monotonic
+from traceback import print_exc
+from .basic_experiment import BasicExperiment
+
+QUEUED = 'queued'
+RUNNING = 'running'
+COMPLETE = 'complete'
+CANCELLED = 'cancelled'
+FAILED = 'failed'
+
+FINISHED = (COMPLETE, CANCELLED, FAILED)
+
+class Job:
+    """One experiment submitted to a :class:`JobQueue`."""
+    def __init__(self, job_id, config):
+        """Constructor
+
+        :param job_id: the identifier of the job
+        :type job_id: int
+
+        :param config: the experiment configuration
+        :type config: dict
+        """
+        self.job_id = job_id
+        self.config = config
+        self.state = QUEUED
+        self.error = None
+        self.update = None
+        self.updates = config.get('updates')
+        self.cancelled = Event()
+        self.experiment = None
+        self._done = Event()
+        self._started = None
+        self._finished = None
+        self._first_update = None
+
+    def status(self):
+        """Describe the job.
+
+        ``elapsed`` is the number of seconds the experiment has been running
+        (or ran for). ``eta`` is the estimated number of seconds until it
+        completes, based on the average time of the updates performed so far.
+        Both are ``None`` when they are not known.
+
+        :returns: the ``id``, ``state``, ``comments``, ``directory``,
+                  ``update`` (the number of updates saved), ``updates``,
+                  ``elapsed``, ``eta`` and ``error`` of the job
+        :rtype: dict
+        """
+        elapsed = None
+        eta = None
+        if self._started is not None:
+            elapsed = (self._finished or monotonic()) - self._started
+        if self.state == RUNNING and self.update is not None:
+            done = self.update - self._first_update
+            if done > 0:
+                eta = elapsed / done * (self.updates - self.update)
+        return {
+            'id': self.job_id,
+            'state': self.state,
+            'comments': self.config.get('comments', ''),
+            'directory': self.config.get('directory'),
+            'update': self.update,
+            'updates': self.updates,
+            'elapsed': elapsed,
+            'eta': eta,
+            'error': self.error,
+            }
+
+    def started(self):
+        """Record that the experiment has started."""
+        self.state = RUNNING
+        self._started = monotonic()
+
+    def progressed(self, update_number):
+        """Record that an update has been saved.
+
+        :param update_number: the count of the update (0-indexed)
+        :type update_number: int
+        """
+        if self._first_update is None:
+            self._first_update = update_number
+        self.update = update_number + 1
+
+    def finished(self, state, error=None):
+        """Record that the experiment has finished.
+
+        :param state: the final state of the job
+        :type state: str
+
+        :param error: a description of the exception, if the experiment failed
+        :type error: str
+        """
+        self.state = state
+        self.error = error
+        if self._started is not None:
+            self._finished = monotonic()
+        self._done.set()
+
+    def wait(self, timeout=None):
+        """Wait for the job to finish.
+
+        :param timeout: the maximum number of seconds to wait, or ``None`` to
+                        wait indefinitely
+        :type timeout: float
+
+        :returns: ``True`` if the job has finished
+        :rtype: bool
+        """
+        return self._done.wait(timeout)
+
+class JobQueue:
+    """Runs submitted experiments, one at a time, on a worker thread."""
+    def __init__(self):
+        """Constructor"""
+        self._lock = Lock()
+        self._jobs = {}
+        self._next_id = 1
+        self._queue = Queue()
+        self._listeners = []
+        self._thread = Thread(target=self._work, name='PLACE-jobs', daemon=True)
+        self._thread.start()
+
+    def submit(self, config):
+        """Add an experiment to the end of the queue.
+
+        :param config: the experiment configuration
+        :type config: dict
+
+        :returns: the new job
+        :rtype: Job
+        """
+        with self._lock:
+            job = Job(self._next_id, config)
+            self._jobs[job.job_id] = job
+            self._next_id += 1
+        self._queue.put(job)
+        return job
+
+    def cancel(self, job_id):
+        """Cancel a job.
+
+        A queued job will not be run. A running experiment is stopped after
+        its current update and cleaned up as an aborted experiment.
+
+        :param job_id: the identifier of the job
+        :type job_id: int
+
+        :returns: ``False`` if the job has already finished
+        :rtype: bool
+
+        :raises KeyError: if there is no such job
+        """
+        with self._lock:
+            job = self._jobs[job_id]
+            if job.state in FINISHED:
+                return False
+            job.cancelled.set()
+            if job.experiment is not None:
+                job.experiment.stop()
+        return True
+
+    def job(self, job_id):
+        """Get a job.
+
+        :param job_id: the identifier of the job
+        :type job_id: int
+
+        :returns: the job
+        :rtype: Job
+
+        :raises KeyError: if there is no such job
+        """
+        with self._lock:
+            return self._jobs[job_id]
+
+    def jobs(self):
+        """Describe every job, in the order they were submitted.
+
+        :returns: the status of each job (see :meth:`Job.status`)
+        :rtype: list
+        """
+        with self._lock:
+            return [self._jobs[job_id].status() for job_id in sorted(self._jobs)]
+
+    def add_listener(self, listener):
+        """Register a function to be told about the progress of jobs.
+
+        The listener is called with the job after each update is saved, and
+        when the job finishes. It is called from the worker thread, so it
+        should return quickly.
+
+        :param listener: function accepting a :class:`Job`
+        :type listener: function
+        """
+        self._listeners.append(listener)
+
+    def close(self):
+        """Cancel every unfinished job and stop the worker thread."""
+        with self._lock:
+            job_ids = list(self._jobs)
+        for job_id in job_ids:
+            self.cancel(job_id)
+        self._queue.put(None)
+        self._thread.join()
+
+    def _notify(self, job):
+        for listener in self._listeners:
+            try:
+                listener(job)
+            except Exception: #pylint: disable=broad-except
+                print_exc()
+
+    def _work(self):
+        """Thread target running each job in turn."""
+        while True:
+            job = self._queue.get()
+            if job is None:
+                return
+            if job.cancelled.is_set():
+                job.finished(CANCELLED)
+                self._notify(job)
+                continue
+            self._run(job)
+            self._notify(job)
+
+    def _run(self, job):
+        """Run the experiment of one job."""
+        def progress(update_number, _):
+            job.progressed(update_number)
+            self._notify(job)
+
+        job.started()
+        try:
+            experiment = BasicExperiment(job.config, progress=progress)
+            with self._lock:
+                job.experiment = experiment
+                if job.cancelled.is_set():
+                    experiment.stop()
+            print("...starting experiment {}...".format(job.job_id))
+            experiment.run()
+        except Exception as err: #pylint: disable=broad-except
+            print_exc()
+            job.finished(FAILED, '{}: {}'.format(err.__class__.__name__, err))
+        else:
+            job.finished(CANCELLED if job.cancelled.is_set() else COMPLETE)
+            print("...experiment {} {}.".format(job.job_id, job.state))
+        finally:
+            job.experiment = None
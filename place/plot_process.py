@@ -0,0 +1,319 @@
+"""Live plots drawn by a separate process.
+
+When an experiment is run from the command line with plotting enabled, a
+:class:`PlotProcess` subscribes to the plot bus (see :mod:`place.plots`) and
+passes the published frames to a separate process, which draws them. Modules
+therefore only publish their data, and plotting takes almost no time in
+``update``, however long the experiment runs.
+
+Frames reach the plotting process through a :class:`PlotRing` in shared
+memory. The plotting process draws at most ``frame_rate`` times a second, and
+only the newest frame of each stream is drawn. Each stream has its own figure,
+showing the latest data above an image of the first row of recent updates.
+The figures are redrawn by blitting, so the cost of drawing does not grow with
+the number of updates.
+"""
+import multiprocessing
+from queue import Empty
+from threading import Event, Thread
+from time import monotonic, sleep
+import numpy as np
+from . import plots
+
+SLOTS = 16
+SLOT_POINTS = 16 * plots.MAX_POINTS
+FRAME_RATE = 10
+HISTORY = 256
+
+_HEADER = 5 # sequence, stream, update, rows, points
+
+class PlotRing:
+    """Frames of plot data in shared memory.
+
+    One thread writes frames into a fixed number of slots in turn, and another
+    process reads them. Each slot holds one frame of up to ``slot_points``
+    ``float32`` values; rows beyond this are not kept. A frame overwritten
+    before it is read is lost, which only happens when the reader has fallen
+    behind, and the reader only wants the newest frames.
+    """
+    def __init__(self, slots=SLOTS, slot_points=SLOT_POINTS, context=multiprocessing):
+        """Constructor
+
+        :param slots: the number of frames held at once
+        :type slots: int
+
+        :param slot_points: the number of values each frame can hold
+        :type slot_points: int
+
+        :param context: the :mod:`multiprocessing` context of the reader
+        """
+        self.slots = slots
+        self.slot_points = slot_points
+        self._data = context.RawArray('f', slots * slot_points)
+        self._headers = context.RawArray('q', slots * _HEADER)
+        self._written = context.RawValue('q', 0)
+        self._names = context.Queue()
+        self._streams = {}
+        self._stream_names = {}
+        self._views = None
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state['_views'] = None
+        return state
+
+    def write(self, source, name, update_number, data):
+        """Write a frame.
+
+        :param source: the name of the publishing module
+        :type source: str
+
+        :param name: the name of the stream within the module
+        :type name: str
+
+        :param update_number: the count of the update the data belongs to
+        :type update_number: int
+
+        :param data: the data
+        :type data: numpy.array
+        """
+        stream = self._streams.get((source, name))
+        if stream is None:
+            stream = self._streams[(source, name)] = len(self._streams)
+            self._names.put((stream, source, name))
+        data = np.asarray(data, dtype='float32')
+        rows = data.reshape(-1, data.shape[-1] if data.ndim else 1)
+        rows = rows[:max(1, self.slot_points // rows.shape[1]), :self.slot_points]
+        headers, values = self._arrays()
+        sequence = self._written.value + 1
+        slot = sequence % self.slots
+        headers[slot, 0] = -1
+        values[slot, :rows.size] = rows.ravel()
+        headers[slot, 1:] = stream, update_number, rows.shape[0], rows.shape[1]
+        headers[slot, 0] = sequence
+        self._written.value = sequence
+
+    def read(self, last):
+        """Read the newest frame of each stream.
+
+        :param last: the number of frames written when this was last called
+                     (``0`` the first time)
+        :type last: int
+
+        :returns: the ``(source, name, update_number, data)`` of the newest
+                  frame of each stream written since, and the number of frames
+                  written so far
+        :rtype: (list, int)
+        """
+        headers, values = self._arrays()
+        written = self._written.value
+        newest = {}
+        for sequence in range(max(last + 1, written - self.slots + 1), written + 1):
+            slot = sequence % self.slots
+            if headers[slot, 0] != sequence:
+                continue
+            stream, update_number, rows, points = (int(value) for value in headers[slot, 1:])
+            data = values[slot, :rows * points].reshape(rows, points).copy()
+            if headers[slot, 0] == sequence:
+                newest[stream] = (update_number, data)
+        frames = [self._name(stream) + (update_number, data)
+                  for stream, (update_number, data) in sorted(newest.items())]
+        return frames, written
+
+    def _arrays(self):
+        """Get NumPy views of the shared memory."""
+        if self._views is None:
+            self._views = (
+                np.frombuffer(self._headers, dtype='int64').reshape(self.slots, _HEADER),
+                np.frombuffer(self._data, dtype='float32').reshape(self.slots, -1))
+        return self._views
+
+    def _name(self, stream):
+        """Get the source and name of a stream seen by the reader."""
+        while stream not in self._stream_names:
+            number, source, name = self._names.get(timeout=5)
+            self._stream_names[number] = (source, name)
+        return self._stream_names[stream]
+
+class PlotProcess:
+    """Draws the data published on the plot bus in a separate process."""
+    def __init__(self, frame_rate=FRAME_RATE, history=HISTORY):
+        """Constructor
+
+        :param frame_rate: the maximum number of times a second each figure
+                           is redrawn
+        :type frame_rate: float
+
+        :param history: the number of updates shown in the history image
+        :type history: int
+        """
+        context = multiprocessing.get_context('spawn')
+        self._ring = PlotRing(context=context)
+        self._finished = context.Event()
+        self._process = context.Process(target=_draw,
+                                        args=(self._ring, self._finished, frame_rate, history),
+                                        name='PLACE-plots')
+        self._ready = Event()
+        self._closing = False
+        self._subscription = None
+        self._thread = Thread(target=self._feed, name='PLACE-plot-feed', daemon=True)
+
+    def start(self):
+        """Start the plotting process.
+
+        Modules stop drawing their own plots until :meth:`close` is called.
+        """
+        self._process.start()
+        self._subscription = plots.BUS.subscribe(wake=self._ready.set)
+        plots.set_local_plotting(False)
+        self._thread.start()
+
+    def close(self, wait=True):
+        """Stop sending frames to the plotting process.
+
+        :param wait: ``True`` to leave the plots up until the user closes
+                     them, ``False`` to close them immediately
+        :type wait: bool
+        """
+        plots.BUS.unsubscribe(self._subscription)
+        plots.set_local_plotting(True)
+        self._closing = True
+        self._ready.set()
+        self._thread.join()
+        self._finished.set()
+        if wait:
+            print('...please close the plots to continue...')
+            self._process.join()
+        else:
+            self._process.terminate()
+
+    def _feed(self):
+        """Thread target copying published frames into the ring."""
+        while True:
+            self._ready.wait()
+            self._ready.clear()
+            for frame in self._subscription.take():
+                self._ring.write(frame.source, frame.name, frame.update_number, frame.data)
+            if self._closing:
+                return
+
+class _StreamView:
+    """The figure showing one stream, redrawn by blitting."""
+    def __init__(self, title, history):
+        import matplotlib.pyplot as plt
+        self.figure = plt.figure(title)
+        self.figure.clf()
+        self._trace_axes = self.figure.add_subplot(2, 1, 1)
+        self._history_axes = self.figure.add_subplot(2, 1, 2)
+        self._history_size = history
+        self._animated = getattr(self.figure.canvas, 'supports_blit', False)
+        self._background = None
+        self._history = None
+        self._lines = []
+        self._image = None
+        self._label = None
+        self.figure.canvas.mpl_connect('draw_event', self._grab_background)
+
+    def show(self, update_number, data):
+        """Draw a frame.
+
+        :param update_number: the count of the update the data belongs to
+        :type update_number: int
+
+        :param data: the rows of data
+        :type data: numpy.array
+        """
+        if self._history is None or self._history.shape[1] != data.shape[1] \
+                or len(self._lines) != data.shape[0]:
+            self._layout(data)
+        for line, row in zip(self._lines, data):
+            line.set_ydata(row)
+        self._history[:-1] = self._history[1:]
+        self._history[-1] = data[0]
+        self._image.set_data(self._history)
+        self._image.set_clim(np.nanmin(self._history), np.nanmax(self._history))
+        self._label.set_text('Update {:03}'.format(update_number))
+        low, high = self._trace_axes.get_ylim()
+        if data.min() < low or data.max() > high:
+            self._trace_axes.set_ylim(*_limits(data, low, high))
+            self._background = None
+        self._blit()
+
+    def _layout(self, data):
+        """Create the artists for data of a new shape."""
+        rows, points = data.shape
+        self._trace_axes.cla()
+        self._history_axes.cla()
+        self._lines = [self._trace_axes.plot(np.zeros(points), linewidth=0.8,
+                                             animated=self._animated)[0]
+                       for _ in range(rows)]
+        self._trace_axes.set_xlim(0, max(points - 1, 1))
+        self._trace_axes.set_ylim(*_limits(data))
+        self._label = self._trace_axes.text(0.01, 0.95, '', transform=self._trace_axes.transAxes,
+                                            verticalalignment='top', animated=self._animated)
+        self._history = np.full((self._history_size, points), np.nan, dtype='float32')
+        self._image = self._history_axes.imshow(self._history, aspect='auto',
+                                                interpolation='nearest', animated=self._animated)
+        self._history_axes.set_ylabel('recent updates')
+        self._background = None
+
+    def _grab_background(self, _):
+        """Keep the figure without the changing artists, after a full draw."""
+        if self._animated:
+            self._background = self.figure.canvas.copy_from_bbox(self.figure.bbox)
+            self._draw_artists()
+
+    def _draw_artists(self):
+        for line in self._lines:
+            self._trace_axes.draw_artist(line)
+        self._trace_axes.draw_artist(self._label)
+        self._history_axes.draw_artist(self._image)
+
+    def _blit(self):
+        """Redraw the changing artists over the saved background."""
+        canvas = self.figure.canvas
+        if not self._animated:
+            canvas.draw_idle()
+        elif self._background is None:
+            canvas.draw()
+        else:
+            canvas.restore_region(self._background)
+            self._draw_artists()
+            canvas.blit(self.figure.bbox)
+
+def _limits(data, low=None, high=None):
+    """Get y limits including the data, with a margin."""
+    data_low, data_high = float(data.min()), float(data.max())
+    if low is not None:
+        data_low, data_high = min(low, data_low), max(high, data_high)
+    margin = 0.1 * (data_high - data_low) or 1.0
+    return data_low - margin, data_high + margin
+
+def _draw(ring, finished, frame_rate, history):
+    """Target of the plotting process."""
+    import matplotlib.pyplot as plt
+    plt.ion()
+    views = {}
+    last = 0
+    interval = 1 / frame_rate
+    while True:
+        started = monotonic()
+        done = finished.is_set()
+        try:
+            frames, last = ring.read(last)
+        except Empty:
+            frames = []
+        for source, name, update_number, data in frames:
+            if (source, name) not in views:
+                views[(source, name)] = _StreamView('{} {}'.format(source, name), history)
+            views[(source, name)].show(update_number, data)
+        if done:
+            break
+        remaining = interval - (monotonic() - started)
+        if views:
+            next(iter(views.values())).figure.canvas.start_event_loop(max(remaining, 0.001))
+        elif remaining > 0:
+            sleep(remaining)
+    if views:
+        plt.ioff()
+        plt.show()
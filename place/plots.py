@@ -0,0 +1,231 @@
+"""A bus carrying live plot data from PLACE modules to viewers.
+
+Modules with a ``plot`` option publish the arrays they would plot with
+:func:`publish`. Publishing never waits for a viewer: the data is downsampled
+and stored as the latest *frame* of its stream, replacing any frame a viewer
+has not collected yet. A slow viewer therefore sees fewer frames, but never
+slows down the experiment.
+
+When PLACE runs as a server, the web interface is the viewer and the modules
+should not draw their own plots, so the server calls
+:func:`set_local_plotting` with ``False``. When an experiment is run from the
+command line, a :class:`place.plot_process.PlotProcess` is the viewer instead.
+Modules check :func:`local_plotting` before drawing with matplotlib.
+
+Frames are sent to the web interface as ``<FRAM>`` websocket messages (see
+:func:`encode_frame`), which the web interface draws below the experiment
+settings.
+"""
+import json
+from threading import Lock
+import numpy as np
+
+MAX_POINTS = 2048
+MAX_ROWS = 16
+
+class Frame:
+    """The latest data published on one stream."""
+    def __init__(self, source, name, update_number, data, dropped):
+        """Constructor
+
+        :param source: the name of the publishing module
+        :type source: str
+
+        :param name: the name of the stream within the module
+        :type name: str
+
+        :param update_number: the count of the update the data belongs to
+        :type update_number: int
+
+        :param data: the downsampled data
+        :type data: numpy.array
+
+        :param dropped: the number of frames of this stream that were replaced
+                        before a viewer collected them
+        :type dropped: int
+        """
+        self.source = source
+        self.name = name
+        self.update_number = update_number
+        self.data = data
+        self.dropped = dropped
+
+class Subscription:
+    """A viewer's connection to a :class:`PlotBus`.
+
+    Only the latest frame of each stream is kept for the viewer.
+    """
+    def __init__(self, wake=None):
+        """Constructor
+
+        :param wake: a function called (with no arguments) each time a frame
+                     is published, from the publishing thread; it should
+                     return quickly
+        :type wake: function
+        """
+        self._lock = Lock()
+        self._frames = {}
+        self._wake = wake
+
+    def put(self, source, name, update_number, data):
+        """Store a frame, replacing an uncollected frame of the same stream."""
+        key = (source, name)
+        with self._lock:
+            previous = self._frames.get(key)
+            dropped = 0 if previous is None else previous.dropped + 1
+            self._frames[key] = Frame(source, name, update_number, data, dropped)
+        if self._wake is not None:
+            self._wake()
+
+    def take(self):
+        """Collect the waiting frames.
+
+        :returns: the latest frame of each stream published since the last
+                  call
+        :rtype: list
+        """
+        with self._lock:
+            frames = list(self._frames.values())
+            self._frames.clear()
+        return frames
+
+class PlotBus:
+    """Distributes published plot data to subscribed viewers."""
+    def __init__(self, max_points=MAX_POINTS):
+        """Constructor
+
+        :param max_points: the maximum number of points kept along the last
+                           axis of published data
+        :type max_points: int
+        """
+        self.max_points = max_points
+        self.local = True
+        self._lock = Lock()
+        self._subscriptions = []
+
+    def subscribe(self, wake=None):
+        """Start receiving frames.
+
+        :param wake: see :class:`Subscription`
+        :type wake: function
+
+        :returns: the new subscription
+        :rtype: Subscription
+        """
+        subscription = Subscription(wake)
+        with self._lock:
+            self._subscriptions.append(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        """Stop receiving frames.
+
+        :param subscription: a subscription returned by :meth:`subscribe`
+        :type subscription: Subscription
+        """
+        with self._lock:
+            self._subscriptions.remove(subscription)
+
+    def publish(self, source, name, data, update_number):
+        """Publish data for viewers.
+
+        When there are no viewers, this returns immediately.
+
+        :param source: the name of the publishing module
+        :type source: str
+
+        :param name: the name of the stream within the module
+        :type name: str
+
+        :param data: the data to plot
+        :type data: numpy.array
+
+        :param update_number: the count of the current update
+        :type update_number: int
+        """
+        with self._lock:
+            subscriptions = list(self._subscriptions)
+        if not subscriptions:
+            return
+        data = downsample(np.asarray(data), self.max_points)
+        for subscription in subscriptions:
+            subscription.put(source, name, update_number, data)
+
+BUS = PlotBus()
+
+def publish(source, name, data, update_number):
+    """Publish data on the PLACE plot bus (see :meth:`PlotBus.publish`)."""
+    BUS.publish(source, name, data, update_number)
+
+def local_plotting():
+    """Check whether modules should draw their own plots.
+
+    :returns: ``True`` unless the plots are shown by another viewer
+    :rtype: bool
+    """
+    return BUS.local
+
+def set_local_plotting(local):
+    """Choose whether modules should draw their own plots.
+
+    :param local: ``False`` if the plots are shown by another viewer
+    :type local: bool
+    """
+    BUS.local = local
+
+def downsample(data, max_points):
+    """Reduce the number of points along the last axis of an array.
+
+    The data is split into bins and the minimum and maximum of each bin are
+    kept, in order, so peaks in the data remain visible. The result is
+    converted to ``float32``.
+
+    :param data: the data
+    :type data: numpy.array
+
+    :param max_points: the maximum number of points to keep
+    :type max_points: int
+
+    :returns: the downsampled data
+    :rtype: numpy.array
+    """
+    points = data.shape[-1] if data.ndim else 1
+    if points <= max_points:
+        return data.astype('float32')
+    bins = max_points // 2
+    width = points // bins
+    binned = data[..., :bins * width].reshape(data.shape[:-1] + (bins, width))
+    result = np.empty(data.shape[:-1] + (bins, 2), dtype='float32')
+    result[..., 0] = binned.min(axis=-1)
+    result[..., 1] = binned.max(axis=-1)
+    return result.reshape(data.shape[:-1] + (2 * bins,))
+
+def encode_frame(frame, max_rows=MAX_ROWS):
+    """Encode a frame as a text message for the web interface.
+
+    The message is the tag ``<FRAM>`` followed by a JSON object with the
+    ``source``, ``name``, ``update`` and ``dropped`` values of the frame, and
+    its ``data`` as a list of rows. Data with more than one dimension is
+    split into rows along its last axis, and only the first ``max_rows`` rows
+    are sent. Values are sent with six significant digits, and values that
+    are not finite are sent as finite numbers (see :func:`numpy.nan_to_num`).
+
+    :param frame: the frame
+    :type frame: Frame
+
+    :param max_rows: the maximum number of rows to send
+    :type max_rows: int
+
+    :returns: the message
+    :rtype: str
+    """
+    data = frame.data.reshape(-1, frame.data.shape[-1] if frame.data.ndim else 1)
+    rows = ','.join('[' + ','.join('{:.6g}'.format(value) for value in row.tolist()) + ']'
+                    for row in np.nan_to_num(data[:max_rows]))
+    header = json.dumps({
+        'source': frame.source,
+        'name': frame.name,
+        'update': frame.update_number,
+        'dropped': frame.dropped,
+        })
+    return '<FRAM>' + header[:-1] + ', "data": [' + rows + ']}'
@@ -8,13 +8,14 @@ the basic PLACE philosophy of config/update/cleanup.
 This module can be used as an example for how to program complex instruments
 into the PLACE system.
 """
-from math import ceil
-from time import sleep
-from ctypes import c_void_p
+from concurrent.futures import ThreadPoolExecutor
+from time import monotonic, sleep
+from ctypes import c_float, c_uint16, c_uint32, c_void_p
 import matplotlib.pyplot as plt
 import numpy as np
 
 from place.plugins.instrument import Instrument
+from place import plots
 from . import atsapi as ats
 setattr(ats, 'TRIG_FORCE', -1)
 
@@ -76,8 +77,62 @@ class ATSGeneric(Instrument, ats.Board):
     plot                      string         ``'yes'`` if plotting should occur
     analog_inputs             list           configuration data for the input channels
                                              (see the ``AnalogInput`` class for more info)
+    dma                       string         (optional) ``'NPT'`` or ``'TS'`` to stream the
+                                             records into DMA buffers, using no-pre-trigger
+                                             or triggered streaming mode, instead of reading
+                                             each record from on-board memory; ``'none'``
+                                             (the default) to read each record
+    buffer_records            int            (optional) the number of records in each DMA
+                                             buffer, which must divide ``records``
+                                             (default: ``records``)
+    dma_buffers               int            (optional) the number of DMA buffers posted to
+                                             the card at once (default: ``4``)
+    hardware_average          bool           (optional) ``True`` if the card should sum the
+                                             records itself when ``average`` is ``True``
+                                             (default: ``False``)
+    trigger_rate              float          (optional) the expected rate of trigger events
+                                             (in hertz), used to decide when the card has
+                                             waited too long for its records
+    fft                       bool           (optional) ``True`` to compute the spectrum of
+                                             each record on the card (default: ``False``)
+    fft_length                int            (optional) the length of the FFT, a power of two
+                                             no smaller than the record; the record is padded
+                                             with zeros (default: the smallest such length)
+    fft_window                string         (optional) the window applied to each record
+                                             before the FFT (must name a ``DSP_WINDOW``
+                                             constant from the ATS driver file; default:
+                                             ``'DSP_WINDOW_HANNING'``)
+    fft_output                string         (optional) ``'log'`` for the logarithm of the
+                                             amplitude or ``'power'`` for the squared
+                                             amplitude (default: ``'log'``)
     ========================= ============== ================================================
 
+    In the DMA modes, the card writes the records of every channel straight
+    into buffers in host memory, which are copied into the trace as they fill
+    and posted back to the card, so there is no per-record driver call. Both
+    modes require ``pre_trigger_samples`` to be ``0``. In ``'TS'`` mode, the
+    card records one continuous stream after a single trigger, and each
+    "record" is a consecutive part of that stream.
+
+    With ``hardware_average``, the FPGA of the card adds the records of each
+    channel together, and only one 32-bit sum per sample is transferred to the
+    host. This also requires ``pre_trigger_samples`` to be ``0``. If the card
+    does not support record averaging, the records are averaged on the host
+    as usual. The driver only describes record averaging as co-adding ADC
+    samples into an accumulator record, so the format of the sums is assumed
+    to be that of the transferred samples: each sum adds the 16-bit sample
+    words, aligned to the most significant bit, and is divided by the number
+    of records and shifted like any other samples. This has not been
+    confirmed on a card, which is why averaging on the host remains the
+    default; compare both before relying on ``hardware_average``.
+
+    With ``fft``, the FFT module of the card transforms each record, and only
+    the spectra are transferred, through the same ring of DMA buffers as the
+    ``'NPT'`` mode. The card can only transform one channel, so exactly one
+    analog input must be configured, and ``pre_trigger_samples`` must be
+    ``0``. The spectra replace the trace in the recorded data. Record
+    averaging on the card cannot be combined with ``fft``.
+
     AlazarTech will produce the following experimental metadata:
 
     ========================= ============== ================================================
@@ -88,6 +143,9 @@ class ATSGeneric(Instrument, ats.Board):
                                              PLACE
     sampling_rate             int            the integer calculation of the sampling rate
                                              (in samples/second)
+    fft_length                int            the length of the FFT (only with ``fft``)
+    spectrum_bins             int            the number of values in each spectrum (only with
+                                             ``fft``)
     ========================= ============== ================================================
 
     AlazarTech will produce the following experimental data:
@@ -98,6 +156,11 @@ class ATSGeneric(Instrument, ats.Board):
     | trace         | (channel,record,sample) | the trace data recorded |
     |               | array of uint16         | on the oscilloscope     |
     +---------------+-------------------------+-------------------------+
+    | spectrum      | (channel,record,bin)    | the spectra computed on |
+    |               | array of float32        | the card (only with     |
+    |               |                         | ``fft``, instead of     |
+    |               |                         | ``trace``)              |
+    +---------------+-------------------------+-------------------------+
 
     .. note::
 
@@ -129,19 +192,28 @@ class ATSGeneric(Instrument, ats.Board):
     _bytes_per_sample = 2
     _data_type = np.dtype('<u'+str(_bytes_per_sample)) # (<)little-endian, (u)unsigned
 
-    def __init__(self, config):
+    def __init__(self, config, system_id=1):
         """Constructor
 
         :param config: configuration data (from JSON)
         :type config: dict
+
+        :param system_id: the board system of the card, which is the master
+                          (board 1) of that system
+        :type system_id: int
         """
         Instrument.__init__(self, config)
-        ats.Board.__init__(self)
+        ats.Board.__init__(self, system_id, 1)
         self._updates = None
         self._analog_inputs = None
         self._data = None
         self._samples = None
         self._sample_rate = None
+        self._bits = None
+        self._buffers = []
+        self._hardware_average = False
+        self._spectrum_bins = None
+        self._boards = [self]
 
     def config(self, metadata, total_updates):
         """Configure the AlazarTech oscilliscope card.
@@ -191,11 +263,17 @@ class ATSGeneric(Instrument, ats.Board):
         self._config_trigger_system()
         self._config_record()
         _, c_bits = self.getChannelInfo()
-        metadata['bits_per_sample'] = c_bits.value
+        self._bits = c_bits.value
+        if not 8 < self._bits <= 16:
+            raise NotImplementedError("bits per sample must be between 9 and 16")
+        metadata['bits_per_sample'] = self._bits
         self._samples = (self._config['pre_trigger_samples']
                          + self._config['post_trigger_samples'])
         metadata['samples_per_record'] = self._samples
-        if self._config['plot'] == 'yes':
+        self._config_dma()
+        self._config_record_average()
+        self._config_fft(metadata)
+        if self._config['plot'] == 'yes' and plots.local_plotting():
             plt.figure(self.__class__.__name__)
             plt.clf()
             plt.ion()
@@ -215,23 +293,66 @@ class ATSGeneric(Instrument, ats.Board):
                 *number_samples*)uint16'
         """
         # build data array
-        channels = len(self._config['analog_inputs'])
+        channels = len(self._config['analog_inputs']) * len(self._boards)
         if self._config['average']:
             records = 1
         else:
             records = self._config['records']
+        if self._spectrum_bins is not None:
+            return self._update_spectrum(update_number, channels, records)
         type_str = '({},{},{}){}'.format(channels,
                                          records,
                                          self._samples,
                                          ATSGeneric._data_type)
         field = '{}-trace'.format(self.__class__.__name__)
         self._data = np.zeros((1,), dtype=[(field, type_str)])
-        self.startCapture()
-        self._wait_for_trigger()
-        self._read_from_card()
+        if self._hardware_average:
+            self._average_on_card()
+        elif self._buffers:
+            self._stream_from_card()
+        else:
+            self.startCapture()
+            self._wait_for_trigger()
+            self._read_from_card()
         if self._config['plot'] == 'yes':
-            plt.figure(self.__class__.__name__)
-            self._draw_plot(update_number)
+            # the first record of each channel
+            plots.publish(self.__class__.__name__, 'trace',
+                          self._data[field][0][:, 0], update_number)
+            if plots.local_plotting():
+                plt.figure(self.__class__.__name__)
+                self._draw_plot(update_number)
+        return self._data.copy()
+
+    def _update_spectrum(self, update_number, channels, records):
+        """Record the spectra computed on the card.
+
+        :param update_number: the current update number
+        :type update_number: int
+
+        :param channels: the number of channels
+        :type channels: int
+
+        :param records: the number of spectra to save for each channel
+        :type records: int
+
+        :returns: the spectra
+        :rtype: numpy.array dtype='(*number_channels*, *number_records*,
+                *number_bins*)float32'
+        """
+        type_str = '({},{},{})<f4'.format(channels, records, self._spectrum_bins)
+        field = '{}-spectrum'.format(self.__class__.__name__)
+        self._data = np.zeros((1,), dtype=[(field, type_str)])
+        self._stream_spectra(self._data[field][0])
+        if self._config['plot'] == 'yes':
+            plots.publish(self.__class__.__name__, 'spectrum',
+                          self._data[field][0][:, 0], update_number)
+            if plots.local_plotting():
+                plt.figure(self.__class__.__name__)
+                plt.cla()
+                plt.plot(self._data[field][0][0, 0])
+                plt.xlabel('bin')
+                plt.title('Update {:03}'.format(update_number))
+                plt.pause(0.05)
         return self._data.copy()
 
     def cleanup(self, abort=False):
@@ -241,21 +362,25 @@ class ATSGeneric(Instrument, ats.Board):
                       finished normally
         :type abort: bool
         """
-        if abort is False and self._config['plot'] == 'yes':
+        self._free_buffers()
+        self._disable_record_average()
+        if abort is False and self._config['plot'] == 'yes' and plots.local_plotting():
             plt.figure(self.__class__.__name__)
             plt.ioff()
             print('...please close the {} plot to continue...'.format(self.__class__.__name__))
             plt.show()
 
-    def _config_timebase(self, metadata):
+    def _config_timebase(self, metadata, board=None):
         """Sets the capture clock"""
+        if board is None:
+            board = self
         sample_rate = getattr(ats, self._config['sample_rate'])
         self._sample_rate = _sample_rate_to_hertz(sample_rate)
         metadata["sampling_rate"] = self._sample_rate
-        self.setCaptureClock(getattr(ats, self._config['clock_source']),
-                             sample_rate,
-                             getattr(ats, self._config['clock_edge']),
-                             self._config['decimation'])
+        board.setCaptureClock(getattr(ats, self._config['clock_source']),
+                              sample_rate,
+                              getattr(ats, self._config['clock_edge']),
+                              self._config['decimation'])
 
     def _config_analog_inputs(self):
         """Specify the desired input range, termination, and coupling of an
@@ -271,8 +396,10 @@ class ATSGeneric(Instrument, ats.Board):
             analog_input._initialize_on_board(self)
             self._analog_inputs.append(analog_input)
 
-    def _config_trigger_system(self):
+    def _config_trigger_system(self, board=None):
         """Configure each of the two trigger engines"""
+        if board is None:
+            board = self
         if self._config['trigger_source_1'] == "TRIG_FORCE":
             source_1 = getattr(ats, "TRIG_CHAN_A")
         else:
@@ -281,96 +408,382 @@ class ATSGeneric(Instrument, ats.Board):
             source_2 = getattr(ats, "TRIG_CHAN_A")
         else:
             source_2 = getattr(ats, self._config['trigger_source_2'])
-        self.setTriggerOperation(getattr(ats, self._config['trigger_operation']),
-                                 getattr(ats, self._config['trigger_engine_1']),
-                                 source_1,
-                                 getattr(ats, self._config['trigger_slope_1']),
-                                 self._config['trigger_level_1'],
-                                 getattr(ats, self._config['trigger_engine_2']),
-                                 source_2,
-                                 getattr(ats, self._config['trigger_slope_2']),
-                                 self._config['trigger_level_2'])
-
-    def _config_record(self):
+        board.setTriggerOperation(getattr(ats, self._config['trigger_operation']),
+                                  getattr(ats, self._config['trigger_engine_1']),
+                                  source_1,
+                                  getattr(ats, self._config['trigger_slope_1']),
+                                  self._config['trigger_level_1'],
+                                  getattr(ats, self._config['trigger_engine_2']),
+                                  source_2,
+                                  getattr(ats, self._config['trigger_slope_2']),
+                                  self._config['trigger_level_2'])
+
+    def _config_record(self, board=None):
         """Sets the record size and count on the card"""
-        self.setRecordSize(self._config['pre_trigger_samples'],
-                           self._config['post_trigger_samples'])
-        self.setRecordCount(self._config['records'])
+        if board is None:
+            board = self
+        board.setRecordSize(self._config['pre_trigger_samples'],
+                            self._config['post_trigger_samples'])
+        board.setRecordCount(self._config['records'])
+
+    def _config_dma(self):
+        """Allocate the DMA buffers, if a DMA mode is selected"""
+        self._free_buffers()
+        mode = self._config.get('dma', 'none')
+        if mode == 'none':
+            return
+        if mode not in _DMA_MODES:
+            raise ValueError("unknown DMA mode '{}'".format(mode))
+        if self._config['pre_trigger_samples'] != 0:
+            raise ValueError("DMA modes require pre_trigger_samples to be 0")
+        records = self._config['records']
+        buffer_records = self._config.get('buffer_records', records)
+        if buffer_records < 1 or records % buffer_records != 0:
+            raise ValueError("buffer_records must divide records")
+        buffer_bytes = (ATSGeneric._bytes_per_sample * len(self._analog_inputs)
+                        * buffer_records * self._samples)
+        ring = min(self._config.get('dma_buffers', 4), records // buffer_records)
+        self._buffers = [ats.DMABuffer(c_uint16, buffer_bytes) for _ in range(ring)]
+
+    def _config_record_average(self):
+        """Enable on-board record averaging, if requested and available"""
+        self._disable_record_average()
+        if not (self._config['average'] and self._config.get('hardware_average', False)):
+            return
+        if self._config['pre_trigger_samples'] != 0:
+            raise ValueError("hardware_average requires pre_trigger_samples to be 0")
+        if self._config.get('fft', False):
+            raise ValueError("hardware_average cannot be combined with fft")
+        try:
+            self.configureRecordAverage(ats.CRA_MODE_ENABLE_FPGA_AVE, self._samples,
+                                        self._config['records'], ats.CRA_OPTION_UNSIGNED)
+        except ats.AlazarError as err:
+            print('{} cannot average records on the card ({}); averaging on the host instead'
+                  .format(self.__class__.__name__, err))
+            return
+        self._hardware_average = True
+        self._free_buffers()
+        sum_bytes = 4 * len(self._analog_inputs) * self._samples
+        self._buffers = [ats.DMABuffer(c_uint32, sum_bytes)]
+
+    def _disable_record_average(self):
+        """Return the card to transferring every record, if it was averaging"""
+        if self._hardware_average:
+            self.configureRecordAverage(ats.CRA_MODE_DISABLE, self._samples,
+                                        self._config['records'], ats.CRA_OPTION_UNSIGNED)
+            self._hardware_average = False
+
+    def _config_fft(self, metadata):
+        """Configure the FFT module of the card, if requested"""
+        self._spectrum_bins = None
+        if not self._config.get('fft', False):
+            return
+        if len(self._analog_inputs) != 1:
+            raise ValueError("fft requires exactly one analog input")
+        if self._config['pre_trigger_samples'] != 0:
+            raise ValueError("fft requires pre_trigger_samples to be 0")
+        fft_length = self._config.get('fft_length', 1 << (self._samples - 1).bit_length())
+        if fft_length < self._samples or fft_length & (fft_length - 1):
+            raise ValueError("fft_length must be a power of two no smaller than the record")
+        output = self._config.get('fft_output', 'log')
+        if output not in _FFT_OUTPUTS:
+            raise ValueError("unknown fft_output '{}'".format(output))
+        records = self._config['records']
+        buffer_records = self._config.get('buffer_records', records)
+        if buffer_records < 1 or records % buffer_records != 0:
+            raise ValueError("buffer_records must divide records")
+        modules = [module for module in self.dspGetModules()
+                   if module.dspGetInfo()[0] == ats.DSP_MODULE_FFT]
+        if not modules:
+            raise RuntimeError("{} has no FFT module".format(self.__class__.__name__))
+        fft = modules[0]
+        window = ats.dspGenerateWindowFunction(
+            getattr(ats, self._config.get('fft_window', 'DSP_WINDOW_HANNING')),
+            self._samples, fft_length - self._samples)
+        fft.fftSetWindowFunction(fft_length, window.ctypes.data_as(c_void_p), None)
+        record_bytes = fft.fftSetup(self._channel_mask(), self._samples, fft_length,
+                                    _FFT_OUTPUTS[output], ats.FFT_FOOTER_NONE, 0)
+        self._free_buffers()
+        self._spectrum_bins = record_bytes // 4
+        ring = min(self._config.get('dma_buffers', 4), records // buffer_records)
+        self._buffers = [ats.DMABuffer(c_float, record_bytes * buffer_records)
+                         for _ in range(ring)]
+        metadata['fft_length'] = fft_length
+        metadata['spectrum_bins'] = self._spectrum_bins
+
+    def _free_buffers(self):
+        """Release the DMA buffers"""
+        for buffer in self._buffers:
+            buffer.__exit__()
+        self._buffers = []
+
+    def _stream_from_card(self):
+        """Acquire the records through the ring of DMA buffers.
+
+        Each buffer holds ``buffer_records`` records of every channel, one
+        channel after another. Filled buffers are copied into the data array
+        and posted back to the card until all the records have been received.
+        """
+        channels = len(self._analog_inputs)
+        records = self._config['records']
+        buffer_records = self._config.get('buffer_records', records)
+        buffers_per_update = records // buffer_records
+        channel_mask = self._channel_mask()
+        flags = ats.ADMA_EXTERNAL_STARTCAPTURE
+        if self._config['dma'] == 'TS':
+            self.beforeAsyncRead(channel_mask, 0, buffer_records * self._samples,
+                                 1, 0x7FFFFFFF, flags | ats.ADMA_TRIGGERED_STREAMING)
+        else:
+            self.beforeAsyncRead(channel_mask, 0, self._samples, buffer_records,
+                                 records, flags | ats.ADMA_NPT)
+        trace = self._data['{}-trace'.format(self.__class__.__name__)][0]
+        total = np.zeros((channels, self._samples), dtype=np.uint64)
+        try:
+            for buffer in self._buffers:
+                self.postAsyncBuffer(buffer.addr, buffer.size_bytes)
+            self.startCapture()
+            deadline = monotonic() + self._acquisition_timeout()
+            for number in range(buffers_per_update):
+                buffer = self._buffers[number % len(self._buffers)]
+                self._wait_for_buffer(buffer, deadline)
+                block = buffer.buffer.reshape(channels, buffer_records, self._samples)
+                if self._config['average']:
+                    total += block.sum(axis=1, dtype=np.uint64)
+                else:
+                    start = number * buffer_records
+                    trace[:, start:start + buffer_records] = self._convert_to_values(block)
+                if number + len(self._buffers) < buffers_per_update:
+                    self.postAsyncBuffer(buffer.addr, buffer.size_bytes)
+        finally:
+            self.abortAsyncRead()
+        if self._config['average']:
+            trace[:, 0] = self._convert_to_values(total // records)
+
+    def _stream_spectra(self, spectra):
+        """Acquire spectra from the FFT module through the ring of buffers.
+
+        :param spectra: the array of spectra to fill
+        :type spectra: numpy.array
+        """
+        records = self._config['records']
+        buffer_records = self._config.get('buffer_records', records)
+        buffers_per_update = records // buffer_records
+        self.beforeAsyncRead(self._channel_mask(), 0, self._spectrum_bins * 4,
+                             buffer_records, records,
+                             ats.ADMA_EXTERNAL_STARTCAPTURE | ats.ADMA_NPT | ats.ADMA_DSP)
+        total = np.zeros((1, self._spectrum_bins))
+        try:
+            for buffer in self._buffers:
+                self.postAsyncBuffer(buffer.addr, buffer.size_bytes)
+            self.startCapture()
+            deadline = monotonic() + self._acquisition_timeout()
+            for number in range(buffers_per_update):
+                buffer = self._buffers[number % len(self._buffers)]
+                self._wait_for_buffer(buffer, deadline, self.dspGetBuffer)
+                block = buffer.buffer.reshape(1, buffer_records, self._spectrum_bins)
+                if self._config['average']:
+                    total += block.sum(axis=1)
+                else:
+                    start = number * buffer_records
+                    spectra[:, start:start + buffer_records] = block
+                if number + len(self._buffers) < buffers_per_update:
+                    self.postAsyncBuffer(buffer.addr, buffer.size_bytes)
+        finally:
+            self.dspAbortCapture()
+        if self._config['average']:
+            spectra[:, 0] = total / records
+
+    def _average_on_card(self):
+        """Acquire the records and transfer only their sum from the card.
+
+        The card adds every record of a channel into one record of 32-bit
+        sums, so a single small DMA buffer receives the whole update. The
+        sums are assumed to add the sample words as they would otherwise be
+        transferred (see the class documentation).
+        """
+        records = self._config['records']
+        buffer = self._buffers[0]
+        self.beforeAsyncRead(self._channel_mask(), 0, self._samples, 1, 1,
+                             ats.ADMA_EXTERNAL_STARTCAPTURE | ats.ADMA_NPT)
+        try:
+            self.postAsyncBuffer(buffer.addr, buffer.size_bytes)
+            self.startCapture()
+            self._wait_for_buffer(buffer, monotonic() + self._acquisition_timeout())
+            total = buffer.buffer.reshape(len(self._analog_inputs), self._samples)
+            trace = self._data['{}-trace'.format(self.__class__.__name__)][0]
+            trace[:, 0] = self._convert_to_values(total // records)
+        finally:
+            self.abortAsyncRead()
+
+    def _channel_mask(self):
+        """Combine the configured input channels into one channel mask"""
+        channel_mask = 0
+        for analog_input in self._analog_inputs:
+            #pylint: disable=protected-access
+            channel_mask |= analog_input._get_input_channel()
+        return channel_mask
+
+    def _acquisition_timeout(self):
+        """Estimate the longest time an acquisition should take.
+
+        If ``trigger_rate`` is configured, the estimate allows twice the time
+        needed to trigger and sample every record, plus one second. Otherwise,
+        one second per record (and at least ten seconds) is allowed.
+
+        :returns: the number of seconds
+        :rtype: float
+        """
+        records = self._config['records']
+        trigger_rate = self._config.get('trigger_rate')
+        if not trigger_rate:
+            return max(10, records)
+        return 1 + 2 * records * (1 / trigger_rate + self._samples / self._sample_rate)
+
+    def _force_trigger(self):
+        """Check whether trigger events are forced by software.
+
+        :returns: ``True`` if either trigger source is ``TRIG_FORCE``
+        :rtype: bool
+        """
+        return (self._config['trigger_source_1'] == 'TRIG_FORCE'
+                or self._config['trigger_source_2'] == 'TRIG_FORCE')
+
+    def _wait_for_buffer(self, buffer, deadline, wait=None):
+        """Wait for the card to fill a DMA buffer.
+
+        The driver wakes this thread as soon as the buffer is complete. When
+        triggers are forced, the wait is split into short slices, forcing a
+        trigger before each one.
+
+        :param buffer: the buffer posted to the card
+        :type buffer: atsapi.DMABuffer
+
+        :param deadline: the value of ``time.monotonic()`` at which to give up
+        :type deadline: float
+
+        :param wait: the driver function that waits for the buffer (by
+                     default, ``waitAsyncBufferComplete``)
+        :type wait: function
+
+        :raises RuntimeError: if the deadline passes
+        """
+        if wait is None:
+            wait = self.waitAsyncBufferComplete
+        force = self._force_trigger()
+        while True:
+            remaining_ms = int((deadline - monotonic()) * 1000)
+            if remaining_ms <= 0:
+                raise RuntimeError("timeout occurred before card filled a DMA buffer")
+            if force:
+                self.forceTrigger()
+                remaining_ms = min(remaining_ms, _FORCED_WAIT_MS)
+            try:
+                wait(buffer.addr, remaining_ms)
+            except ats.AlazarError as err:
+                if err.returnCode != ats.ApiWaitTimeout:
+                    raise
+            else:
+                return
 
     def _wait_for_trigger(self, timeout=None):
-        """Wait for a trigger event until the timeout.
+        """Wait for the card to record all the records, until the timeout.
 
-        This method will wait for a trigger event, but will eventually timeout.
-        When this happens, it will either raise an error or force a trigger
-        event, depending on the input.
+        The card is polled with a delay that starts well below a millisecond
+        and doubles while the card stays busy, so short acquisitions are
+        noticed quickly and long ones are not polled needlessly. When triggers
+        are forced, a trigger is forced at every poll, without backing off.
 
-        :param timeout: number of seconds to wait for a trigger event
-        :type timeout: int
+        :param timeout: number of seconds to wait for the records (estimated
+                        from the configuration by default)
+        :type timeout: float
 
-        :raises RuntimeError: if timeout occurs and force is set to False
+        :raises RuntimeError: if the timeout occurs
         """
         if timeout is None:
-            timeout = max(10, self._config['records'])
-        for _ in range(ceil(timeout / 0.1)):
-            if not self.busy():
-                break
-            if (self._config['trigger_source_1'] == 'TRIG_FORCE'
-                    or self._config['trigger_source_2'] == 'TRIG_FORCE'):
+            timeout = self._acquisition_timeout()
+        deadline = monotonic() + timeout
+        force = self._force_trigger()
+        delay = _POLL_DELAY
+        while self.busy():
+            if monotonic() > deadline:
+                raise RuntimeError("timeout occurred before card recorded all records")
+            if force:
                 self.forceTrigger()
-            sleep(0.1)
-        else:
-            raise RuntimeError("timeout occurred before card recorded all records")
+            else:
+                delay = min(2 * delay, _MAX_POLL_DELAY)
+            sleep(delay)
 
     def _read_from_card(self):
-        """Reads the records from the card memory into the data buffer."""
+        """Reads the records from the card memory into the data buffer.
+
+        When there are several boards, each board is read on its own thread.
+        """
+        trace = self._data['{}-trace'.format(self.__class__.__name__)][0]
+        if len(self._boards) == 1:
+            self._read_board(self, trace)
+            return
+        channels = len(self._analog_inputs)
+        with ThreadPoolExecutor(max_workers=len(self._boards)) as pool:
+            reads = [pool.submit(self._read_board, board,
+                                 trace[number * channels:(number + 1) * channels])
+                     for number, board in enumerate(self._boards)]
+            for read in reads:
+                read.result()
+
+    def _read_board(self, board, trace):
+        """Reads the records of one board into its part of the trace.
+
+        Every record of every channel is read into one contiguous array, which
+        is then converted into the trace (or averaged) in a single step.
+
+        :param board: the board to read
+        :type board: atsapi.Board
+
+        :param trace: the channels of the trace belonging to the board
+        :type trace: numpy.array
+        """
         pre_trig = self._config['pre_trigger_samples']
         post_trig = self._config['post_trigger_samples']
         transfer_length = pre_trig + post_trig + 16
         records = self._config['records']
         transfer_offset = -(pre_trig)
-        data = np.zeros((records, transfer_length), ATSGeneric._data_type)
+        channels = len(self._analog_inputs)
+        data = np.empty((channels, records, transfer_length), ATSGeneric._data_type)
+        record_bytes = transfer_length * ATSGeneric._bytes_per_sample
+        address = data.ctypes.data
 
         for channel_number, analog_input in enumerate(self._analog_inputs):
             #pylint: disable=protected-access
             channel = analog_input._get_input_channel()
             for i in range(records):
                 record_num = i + 1 # 1-indexed
-                # read data from card
-                self.read(channel,
-                          data[i].ctypes.data_as(c_void_p),
-                          ATSGeneric._bytes_per_sample,
-                          record_num,
-                          transfer_offset,
-                          transfer_length)
-                # save each record if not being averaged
-                if self._config['average'] is False:
-                    value_data = self._convert_to_values(data[i][:-16])
-                    field = '{}-trace'.format(self.__class__.__name__)
-                    self._data[field][0][channel_number][i] = value_data
-            # save the average record only if average is requested
-            if self._config['average'] is True:
-                averaged_record = data.mean(axis=0)[:-16]
-                value_data = self._convert_to_values(averaged_record)
-                field = '{}-trace'.format(self.__class__.__name__)
-                self._data[field][0][channel_number][0] = value_data
+                board.read(channel,
+                           c_void_p(address + (channel_number * records + i) * record_bytes),
+                           ATSGeneric._bytes_per_sample,
+                           record_num,
+                           transfer_offset,
+                           transfer_length)
+        if self._config['average']:
+            # integer accumulation is exact, and the floor of the mean matches
+            # truncating a floating point mean
+            total = data[:, :, :-16].sum(axis=1, dtype=np.uint64)
+            trace[:, 0] = self._convert_to_values(total // records)
+        else:
+            trace[:] = self._convert_to_values(data[:, :, :-16])
 
     def _convert_to_values(self, data):
         """Convert ATS data into 16-bit integer values for saving.
 
+        The samples are aligned to the most significant bit, so they are
+        shifted right by the number of unused bits (found during ``config``).
+
         :param data: the values read from the ATS card
         :type data: numpy.ndarray
 
         :returns: 16-bit integers
         :rtype: numpy.ndarray
-
-        :raises NotImplementedError: if bits per sample is out of range
         """
-        _, c_bits = self.getChannelInfo()
-        bits = c_bits.value
-        if not 8 < bits <= 16:
-            raise NotImplementedError("bits per sample must be between 9 and 16")
-        bit_shift = 16 - bits
-        return np.array(data / 2**bit_shift, dtype=ATSGeneric._data_type)
+        return (data >> (16 - self._bits)).astype(ATSGeneric._data_type, copy=False)
 
     def _draw_plot(self, update_number):
         pre_trig = self._config['pre_trigger_samples']
@@ -379,15 +792,15 @@ class ATSGeneric(Instrument, ats.Board):
         usec_delta = 1000000.0 / self._sample_rate
         times = np.arange(-(pre_trig), post_trig) * usec_delta
         num_channels = len(self._data['{}-trace'.format(self.__class__.__name__)][0])
-        _, c_bits = self.getChannelInfo()
-        bits = c_bits.value
+        bits = self._bits
 
         for i, channel in enumerate(self._data['{}-trace'.format(self.__class__.__name__)][0]):
             plt.subplot(2, num_channels, i + 1)
             plt.cla()
+            inputs = self._config['analog_inputs']
             plt.plot(times,
                      channel[first_record],
-                     label=self._config['analog_inputs'][i]['input_channel'])
+                     label=inputs[i % len(inputs)]['input_channel'])
             plt.xlabel(r'$\mu$secs')
             plt.ylim((0, 2**bits))
             plt.title('Update {:03}'.format(update_number))
@@ -478,7 +891,83 @@ class ATS9440(ATSGeneric):
     """Subclass for ATS9440"""
     pass
 
+class ATSSystem(ATSGeneric):
+    """A master/slave system of AlazarTech cards acting as one instrument.
+
+    Cards joined by a SyncBoard form a board system, in which the master card
+    (board 1) shares its clock and trigger with the others. Every card in the
+    system is configured with the same settings (and the same
+    ``analog_inputs``), a single capture started on the master records on
+    every card at once, and the cards are then read in parallel.
+
+    ATSSystem accepts the ATSGeneric configuration data, except for the
+    ``dma``, ``hardware_average`` and ``fft`` options, plus:
+
+    ========================= ============== ================================================
+    Key                       Type           Meaning
+    ========================= ============== ================================================
+    system_id                 int            (optional) the board system to use
+                                             (default: ``1``)
+    ========================= ============== ================================================
+
+    ATSSystem also records the number of ``boards`` in the metadata.
+
+    The channels of the trace are ordered by board, then by input, so the
+    trace has shape (*boards* x *channels*, *records*, *samples*).
+    """
+    def __init__(self, config):
+        """Constructor
+
+        :param config: configuration data (from JSON)
+        :type config: dict
+
+        :raises ValueError: if the board system does not exist
+        """
+        system_id = config.get('system_id', 1)
+        if not 1 <= system_id <= ats.numOfSystems():
+            raise ValueError("AlazarTech board system {} not found".format(system_id))
+        ATSGeneric.__init__(self, config, system_id)
+        boards = ats.boardsInSystemBySystemID(system_id)
+        self._boards = [self] + [ats.Board(system_id, board_id)
+                                 for board_id in range(2, boards + 1)]
+
+    def config(self, metadata, total_updates):
+        """Configure every card in the board system.
+
+        :param metadata: metadata for the experiment
+        :type metadata: dict
+
+        :param total_updates: the number of update steps that will be in this
+                              experiment
+        :type total_updates: int
+
+        :raises ValueError: if an unsupported acquisition mode is requested
+        """
+        for key in ('hardware_average', 'fft'):
+            if self._config.get(key, False):
+                raise ValueError("{} is not supported by ATSSystem".format(key))
+        if self._config.get('dma', 'none') != 'none':
+            raise ValueError("dma is not supported by ATSSystem")
+        ATSGeneric.config(self, metadata, total_updates)
+        for board in self._boards[1:]:
+            self._config_timebase(metadata, board)
+            for analog_input in self._analog_inputs:
+                #pylint: disable=protected-access
+                analog_input._initialize_on_board(board)
+            self._config_trigger_system(board)
+            self._config_record(board)
+        metadata['boards'] = len(self._boards)
+
 # Private functions
+_DMA_MODES = ('NPT', 'TS')
+_POLL_DELAY = 0.0001
+_MAX_POLL_DELAY = 0.01
+_FORCED_WAIT_MS = 1
+_FFT_OUTPUTS = {
+    'log': ats.FFT_OUTPUT_FORMAT_FLOAT_LOG,
+    'power': ats.FFT_OUTPUT_FORMAT_FLOAT_AMP2,
+    }
+
 def _sample_rate_to_hertz(constant):
     """Translate sample rate constant to hertz.
 
@@ -480,16 +480,28 @@ U32 = c_uint32
 U8  = c_byte
 DOUBLE = c_double
 
+'''Return codes of the C ATS-SDK functions'''
+ApiSuccess = 512
+ApiWaitTimeout = 579
+
+class AlazarError(Exception):
+    '''Raised when a C ATS-SDK function fails. The return code of the
+    function is kept in the returnCode attribute.'''
+    def __init__(self, message, returnCode):
+        Exception.__init__(self, message)
+        self.returnCode = returnCode
+
 ats.AlazarErrorToText.restype = c_char_p
 ats.AlazarErrorToText.argtypes = [U32]
 def returnCodeCheck(result, func, arguments):
     '''Function used internally to check the return code of the C ATS-SDK
     functions.'''
-    if (result != 512):
-        raise Exception("Error calling function %s with arguments %s : %s" %
-                        (func.__name__,
-                         str(arguments),
-                         str(ats.AlazarErrorToText(result))))
+    if (result != ApiSuccess):
+        raise AlazarError("Error calling function %s with arguments %s : %s" %
+                          (func.__name__,
+                           str(arguments),
+                           str(ats.AlazarErrorToText(result))),
+                          result)
 
 def numOfSystems():
     ats.AlazarNumOfSystems.restype = U32
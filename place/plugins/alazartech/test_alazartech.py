@@ -1,10 +1,13 @@
 """Basic testing for AlazarTech card"""
-from time import sleep
-from unittest import TestCase
+from ctypes import c_float, c_uint8, c_uint16, c_uint32, sizeof
+from time import monotonic, sleep
+from unittest import TestCase, mock
 import unittest
 import json
+import numpy as np
 from place import experiment
 from . import atsapi as ats
+from .alazartech import ATS9440, ATSSystem
 
 
 TEST_STR_660 = """
@@ -100,6 +103,216 @@ TEST_STR_9440 = """
 }
 """
 
+class FakeBoard(ats.Board):
+    """Simulates an AlazarTech card in place of ``atsapi.Board``.
+
+    Every board stores the same kind of signal: sample ``s`` of record ``r``
+    on channel ``c`` holds the ADC code returned by :meth:`codes` for the
+    position ``r * samples + s``. Like the card, samples are transferred
+    aligned to the most significant bit of 16-bit words.
+
+    Cards made by :func:`_card` inherit these methods ahead of the real ones,
+    and every method of the real board that reaches the driver needs a
+    handle, which a fake board does not have.
+    """
+    bits = 14
+    systems = {1: 1}
+    opened = []
+    record_averaging = True
+
+    def __init__(self, systemId=1, boardId=1): #pylint: disable=super-init-not-called
+        if not boardId <= FakeBoard.systems.get(systemId, 0):
+            raise Exception("Board %d.%d not found" % (systemId, boardId))
+        FakeBoard.opened.append((systemId, boardId))
+        self.systemId = systemId
+        self.boardId = boardId
+        self.card_record = None
+        self.card_record_average = ats.CRA_MODE_DISABLE
+        self.card_average_records = None
+        self.card_acquisition = None
+        self.card_posted = []
+        self.card_position = 0
+        self.card_waits = []
+        self.card_timeouts = 0
+        self.card_error = None
+        self.card_forced = 0
+        self.card_aborted = 0
+
+    def codes(self, channel, positions):
+        """Get the ADC codes stored at some positions of a channel.
+
+        :param channel: the index of the channel (0 for channel A)
+        :type channel: int
+
+        :param positions: the positions, counted through every record
+        :type positions: numpy.ndarray
+
+        :returns: the codes (not aligned to the most significant bit)
+        :rtype: numpy.ndarray
+        """
+        seed = 977 * channel + 3571 * self.boardId + 7919 * self.systemId
+        return (positions.astype(np.uint64) * 40503 + seed) % 2**FakeBoard.bits
+
+    def words(self, channel, positions):
+        """Get the 16-bit sample words the card transfers for some positions."""
+        return (self.codes(channel, positions) << (16 - FakeBoard.bits)).astype(np.uint16)
+
+    def setCaptureClock(self, source, rate, edge, decimation):
+        pass
+
+    def inputControl(self, channel, coupling, inputRange, impedance):
+        pass
+
+    def setTriggerOperation(self, operation, #pylint: disable=too-many-arguments
+                            engine1, source1, slope1, level1,
+                            engine2, source2, slope2, level2):
+        pass
+
+    def setRecordSize(self, preTriggerSamples, postTriggerSamples):
+        self.card_record = (preTriggerSamples, postTriggerSamples)
+
+    def setRecordCount(self, count):
+        pass
+
+    def getChannelInfo(self):
+        return (c_uint32(0), c_uint8(FakeBoard.bits))
+
+    def configureRecordAverage(self, mode, samplesPerRecord, recordsPerAverage, options):
+        if not FakeBoard.record_averaging:
+            raise ats.AlazarError('record averaging is not supported', _API_FAILED)
+        self.card_record_average = mode
+        self.card_average_records = recordsPerAverage
+
+    def startCapture(self):
+        pass
+
+    def busy(self):
+        return False
+
+    def forceTrigger(self):
+        self.card_forced += 1
+
+    def read(self, channelId, buffer, elementSize, record, transferOffset, transferLength):
+        pre_trigger, post_trigger = self.card_record
+        samples = pre_trigger + post_trigger
+        assert elementSize == 2 and transferOffset == -pre_trigger
+        words = np.ctypeslib.as_array((c_uint16 * transferLength).from_address(buffer.value))
+        positions = (record - 1) * samples + np.arange(samples)
+        words[:samples] = self.words(channelId.bit_length() - 1, positions)
+        # whatever follows the record must not reach the trace
+        words[samples:] = 0xFFFF
+
+    def beforeAsyncRead(self, channels, transferOffset, samplesPerRecord,
+                        recordsPerBuffer, recordsPerAcquisition, flags):
+        self.card_acquisition = (channels, samplesPerRecord, recordsPerBuffer, flags)
+        self.card_posted = []
+        self.card_position = 0
+
+    def postAsyncBuffer(self, buffer, bufferLength):
+        self.card_posted.append((buffer, bufferLength))
+
+    def waitAsyncBufferComplete(self, buffer, timeout_ms):
+        self.card_waits.append(timeout_ms)
+        if self.card_error is not None:
+            raise ats.AlazarError('the acquisition failed', self.card_error)
+        if self.card_timeouts:
+            self.card_timeouts -= 1
+            sleep(min(timeout_ms, 5) / 1000)
+            raise ats.AlazarError('the buffer was not filled in time', ats.ApiWaitTimeout)
+        address, size = self.card_posted.pop(0)
+        assert address == buffer, 'waiting for a buffer out of order'
+        mask, samples, records, _ = self.card_acquisition
+        channels = [channel for channel in range(4) if mask & (1 << channel)]
+        if self.card_record_average == ats.CRA_MODE_ENABLE_FPGA_AVE:
+            sums = np.ctypeslib.as_array((c_uint32 * (size // 4)).from_address(address))
+            sums = sums.reshape(len(channels), samples)
+            positions = np.arange(self.card_average_records * samples)
+            for row, channel in zip(sums, channels):
+                words = self.words(channel, positions).astype(np.uint32)
+                row[:] = words.reshape(-1, samples).sum(axis=0)
+            return
+        assert size == 2 * len(channels) * records * samples, 'buffer size mismatch'
+        words = np.ctypeslib.as_array((c_uint16 * (size // 2)).from_address(address))
+        words = words.reshape(len(channels), records * samples)
+        positions = self.card_position + np.arange(records * samples)
+        for row, channel in zip(words, channels):
+            row[:] = self.words(channel, positions)
+        self.card_position += records * samples
+
+    def abortAsyncRead(self):
+        self.card_aborted += 1
+
+class FakeDMABuffer:
+    """Stands in for ``atsapi.DMABuffer``, in memory allocated by NumPy."""
+    freed = 0
+
+    def __init__(self, c_sample_type, size_bytes):
+        self.size_bytes = size_bytes
+        dtype = {c_uint16: np.uint16, c_uint32: np.uint32, c_float: np.float32}[c_sample_type]
+        self.buffer = np.zeros(size_bytes // sizeof(c_sample_type), dtype=dtype)
+        self.addr = self.buffer.ctypes.data
+
+    def __exit__(self):
+        FakeDMABuffer.freed += 1
+
+def _card(class_, **options):
+    """Make a card of an AlazarTech class that talks to a FakeBoard.
+
+    :param class_: the AlazarTech instrument class
+    :type class_: type
+
+    :returns: the card, and the metadata recorded by its configuration
+    :rtype: ATSGeneric, dict
+    """
+    config = json.loads(TEST_STR_9440)['modules'][0]['config']
+    config.update({
+        'trigger_source_1': 'TRIG_CHAN_A',
+        'trigger_source_2': 'TRIG_DISABLE',
+        'post_trigger_samples': 16,
+        'records': 8,
+        'average': False,
+        'analog_inputs': [dict(config['analog_inputs'][0], input_channel=channel)
+                          for channel in ('CHANNEL_A', 'CHANNEL_B')],
+        })
+    config.update(options)
+    card = type(class_.__name__, (class_, FakeBoard), {})(config)
+    metadata = {}
+    card.config(metadata, 1)
+    return card, metadata
+
+def _expected(board, records, samples, channels=2):
+    """Get the trace a card should record from a FakeBoard.
+
+    :returns: the codes of every sample, as (channel, record, sample)
+    :rtype: numpy.ndarray
+    """
+    positions = np.arange(records * samples)
+    return np.array([board.codes(channel, positions).reshape(records, samples)
+                     for channel in range(channels)])
+
+def _looped_trace(board, records, samples, average, channels=2):
+    """Convert the records of a FakeBoard the way each record was converted
+    before the readout was vectorized.
+
+    :returns: the trace, as (channel, record, sample)
+    :rtype: numpy.ndarray
+    """
+    bit_shift = 16 - FakeBoard.bits
+    trace = []
+    for channel in range(channels):
+        data = np.full((records, samples + 16), 0xFFFF, dtype=np.uint16)
+        positions = np.arange(records * samples)
+        data[:, :samples] = board.words(channel, positions).reshape(records, samples)
+        if average:
+            averaged_record = data.mean(axis=0)[:-16]
+            trace.append([np.array(averaged_record / 2**bit_shift, dtype=np.uint16)])
+        else:
+            trace.append([np.array(record[:-16] / 2**bit_shift, dtype=np.uint16)
+                          for record in data])
+    return np.array(trace)
+
+_API_FAILED = 513
+
 class TestOsciCardUtilities(TestCase):
     """Test class"""
     def test0002_json_init(self):
@@ -193,5 +406,144 @@ class TestATS(TestCase):
                 print("passed: input range = {}, impedance = {}"
                       .format(input_range, impedance))
 
+class TestFakeDriver(TestCase):
+    """Test the AlazarTech instrument against a simulated card"""
+    def setUp(self):
+        FakeBoard.bits = 14
+        FakeBoard.systems = {1: 1}
+        FakeBoard.opened = []
+        FakeBoard.record_averaging = True
+        FakeDMABuffer.freed = 0
+        for name, fake in (('Board', FakeBoard), ('DMABuffer', FakeDMABuffer)):
+            patcher = mock.patch.object(ats, name, fake)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def test0001_dma_modes(self):
+        """Test that DMA buffers are reshaped into the trace in both streaming modes"""
+        for mode in ('NPT', 'TS'):
+            for average in (False, True):
+                card, _ = _card(ATS9440, dma=mode, buffer_records=2, dma_buffers=3,
+                                average=average)
+                trace = card.update(0)['ATS9440-trace'][0]
+                expected = _expected(card, 8, 16)
+                if average:
+                    expected = expected.sum(axis=1, keepdims=True) // 8
+                self.assertEqual(trace.tolist(), expected.tolist())
+                channels, samples, records, flags = card.card_acquisition
+                self.assertEqual(channels, ats.CHANNEL_A | ats.CHANNEL_B)
+                if mode == 'TS':
+                    self.assertEqual((samples, records), (32, 1))
+                    self.assertTrue(flags & ats.ADMA_TRIGGERED_STREAMING)
+                else:
+                    self.assertEqual((samples, records), (16, 2))
+                    self.assertTrue(flags & ats.ADMA_NPT)
+                # four buffers were filled through a ring of three
+                self.assertEqual(len(card.card_waits), 4)
+                self.assertEqual(card.card_posted, [])
+                self.assertEqual(card.card_aborted, 1)
+                card.cleanup(abort=True)
+        self.assertEqual(FakeDMABuffer.freed, 12)
+
+    def test0002_wait_for_buffer(self):
+        """Test that buffer waits retry after timeouts, until the deadline"""
+        card, _ = _card(ATS9440, dma='NPT')
+        card.card_timeouts = 2
+        trace = card.update(0)['ATS9440-trace'][0]
+        self.assertEqual(trace.tolist(), _expected(card, 8, 16).tolist())
+        self.assertEqual(len(card.card_waits), 3)
+        # a card that never fills its buffer
+        buffer = card._buffers[0] #pylint: disable=protected-access
+        card.card_timeouts = 10**6
+        card.card_waits = []
+        start = monotonic()
+        with self.assertRaisesRegex(RuntimeError, 'timeout'):
+            card._wait_for_buffer(buffer, start + 0.05) #pylint: disable=protected-access
+        self.assertLess(monotonic() - start, 1)
+        self.assertGreater(len(card.card_waits), 1)
+        self.assertTrue(all(timeout <= 50 for timeout in card.card_waits))
+        # only timeouts are retried
+        card.card_error = _API_FAILED
+        card.card_waits = []
+        with self.assertRaises(ats.AlazarError):
+            card._wait_for_buffer(buffer, monotonic() + 10) #pylint: disable=protected-access
+        self.assertEqual(len(card.card_waits), 1)
+        # forced triggers are forced before every short wait
+        card, _ = _card(ATS9440, dma='NPT', trigger_source_1='TRIG_FORCE')
+        card.card_timeouts = 3
+        card.update(0)
+        self.assertEqual(card.card_waits, [1, 1, 1, 1])
+        self.assertEqual(card.card_forced, 4)
+
+    def test0003_convert_to_values(self):
+        """Test that the vectorized readout matches the per-record conversion"""
+        for bits in (12, 14, 16):
+            FakeBoard.bits = bits
+            for average in (False, True):
+                card, metadata = _card(ATS9440, records=24, average=average)
+                trace = card.update(0)['ATS9440-trace'][0]
+                self.assertEqual(metadata['bits_per_sample'], bits)
+                self.assertEqual(trace.dtype, np.uint16)
+                self.assertEqual(trace.tolist(), _looped_trace(card, 24, 16, average).tolist())
+                expected = _expected(card, 24, 16)
+                if average:
+                    expected = expected.sum(axis=1, keepdims=True) // 24
+                self.assertEqual(trace.tolist(), expected.tolist())
+        # 8-bit samples are not transferred as 16-bit words
+        FakeBoard.bits = 8
+        with self.assertRaises(NotImplementedError):
+            _card(ATS9440)
+
+    def test0004_hardware_average(self):
+        """Test that averaging on the card matches averaging on the host"""
+        host, _ = _card(ATS9440, records=24, average=True)
+        expected = host.update(0)['ATS9440-trace'][0]
+        card, _ = _card(ATS9440, records=24, average=True, hardware_average=True)
+        self.assertEqual(card.card_record_average, ats.CRA_MODE_ENABLE_FPGA_AVE)
+        self.assertEqual(card.card_average_records, 24)
+        self.assertEqual(card.update(0)['ATS9440-trace'][0].tolist(), expected.tolist())
+        card.cleanup(abort=True)
+        self.assertEqual(card.card_record_average, ats.CRA_MODE_DISABLE)
+        # a card without record averaging falls back to the host
+        FakeBoard.record_averaging = False
+        card, _ = _card(ATS9440, records=24, average=True, hardware_average=True)
+        self.assertEqual(card.card_record_average, ats.CRA_MODE_DISABLE)
+        self.assertEqual(card.update(0)['ATS9440-trace'][0].tolist(), expected.tolist())
+
+    def test0005_record_average_mode(self):
+        """Test that the card leaves record averaging when it is no longer used"""
+        #pylint: disable=protected-access
+        with self.assertRaises(ValueError):
+            _card(ATS9440, average=True, hardware_average=True, fft=True)
+        card, metadata = _card(ATS9440, average=True, hardware_average=True)
+        self.assertEqual(card.card_record_average, ats.CRA_MODE_ENABLE_FPGA_AVE)
+        card._config['fft'] = True
+        with self.assertRaises(ValueError):
+            card.config(metadata, 1)
+        self.assertEqual(card.card_record_average, ats.CRA_MODE_DISABLE)
+        card._config.update(fft=False, hardware_average=False)
+        card.config(metadata, 1)
+        self.assertEqual(card.card_record_average, ats.CRA_MODE_DISABLE)
+        host, _ = _card(ATS9440, average=True)
+        self.assertEqual(card.update(0)['ATS9440-trace'][0].tolist(),
+                         host.update(0)['ATS9440-trace'][0].tolist())
+
+    def test0006_board_system(self):
+        """Test that only the requested board system is opened and read per board"""
+        #pylint: disable=protected-access
+        FakeBoard.systems = {1: 1, 2: 2}
+        with mock.patch.object(ats, 'numOfSystems', return_value=2), \
+                mock.patch.object(ats, 'boardsInSystemBySystemID', FakeBoard.systems.get):
+            system, metadata = _card(ATSSystem, system_id=2)
+        self.assertEqual(FakeBoard.opened, [(2, 1), (2, 2)])
+        self.assertEqual(metadata['boards'], 2)
+        trace = system.update(0)['ATSSystem-trace'][0]
+        self.assertEqual(trace.shape, (4, 8, 16))
+        for number, board in enumerate(system._boards):
+            self.assertEqual(board.boardId, number + 1)
+            self.assertEqual(trace[2 * number:2 * number + 2].tolist(),
+                             _expected(board, 8, 16).tolist())
+        self.assertNotEqual(trace[0:2].tolist(), trace[2:4].tolist())
+
 if __name__ == '__main__':
     unittest.main(verbosity=2, buffer=True)
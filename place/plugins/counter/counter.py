@@ -5,9 +5,11 @@ plots of "dummy data", similar to the data produced by the AlazarTech module.
 It is great for showing how PLACE operates without setting up any hardware.
 """
 from time import sleep
+from asyncio import sleep as async_sleep
 import matplotlib.pyplot as plt
 import numpy as np
 from place.plugins.instrument import Instrument
+from place import plots
 
 class Counter(Instrument):
     """Demo instrument.
@@ -68,7 +70,7 @@ class Counter(Instrument):
         self._samples = 2**7
         self._updates = total_updates
         metadata['counter_samples'] = self._samples
-        if self._config['plot']:
+        if self._config['plot'] and plots.local_plotting():
             plt.figure(self.__class__.__name__)
             plt.clf()
             plt.ion()
@@ -86,23 +88,27 @@ class Counter(Instrument):
         :returns: the current count (1-indexed) and a dummy trace
         :rtype: dtype=[('count', 'int16'), ('trace', 'float64', self._samples)])
         """
-        self._count += 1
-        self._number = update_number
-        samples = np.array(
-            [np.exp(-i) * np.sin(2*np.pi*i) for i in np.arange(self._samples) * 0.05])
-        noise = np.random.normal(0, 0.15, self._samples)
-        trace = (samples + noise + 1) * 2**13
-        count_field = '{}-count'.format(self.__class__.__name__)
-        trace_field = '{}-trace'.format(self.__class__.__name__)
-        data = np.array(
-            [(self._count, trace)],
-            dtype=[(count_field, 'int16'), (trace_field, 'float64', self._samples)])
-        if self._config['plot']:
-            plt.figure(self.__class__.__name__)
-            self._wiggle_plot(trace)
+        data = self._count_and_trace(update_number)
         sleep(self._config['sleep_time'])
         return data
 
+    async def update_async(self, update_number):
+        """Increment the counter, without blocking the event loop.
+
+        This is the same as :meth:`update`, except that the sleep between
+        updates allows other instruments to run when the experiment uses the
+        asyncio scheduler.
+
+        :param update_number: the count of the current update (0-indexed)
+        :type update_number: int
+
+        :returns: the current count (1-indexed) and a dummy trace
+        :rtype: dtype=[('count', 'int16'), ('trace', 'float64', self._samples)])
+        """
+        data = self._count_and_trace(update_number)
+        await async_sleep(self._config['sleep_time'])
+        return data
+
     def cleanup(self, abort=False):
         """Stop the counter and cleanup.
 
@@ -112,12 +118,47 @@ class Counter(Instrument):
                       case plotting should not occur
         :type abort: bool
         """
-        if abort is False and self._config['plot']:
+        if abort is False and self._config['plot'] and plots.local_plotting():
             plt.figure(self.__class__.__name__)
             plt.ioff()
             print('...please close the {} plot to continue...'.format(self.__class__.__name__))
             plt.show()
 
+    def resume(self, update_number):
+        """Continue counting from an interrupted experiment.
+
+        :param update_number: the count of the first update that will be performed
+        :type update_number: int
+        """
+        self._count = update_number
+
+    def _count_and_trace(self, update_number):
+        """Increment the count, generate a trace, and plot it if requested.
+
+        :param update_number: the count of the current update (0-indexed)
+        :type update_number: int
+
+        :returns: the current count (1-indexed) and a dummy trace
+        :rtype: dtype=[('count', 'int16'), ('trace', 'float64', self._samples)])
+        """
+        self._count += 1
+        self._number = update_number
+        samples = np.array(
+            [np.exp(-i) * np.sin(2*np.pi*i) for i in np.arange(self._samples) * 0.05])
+        noise = np.random.normal(0, 0.15, self._samples)
+        trace = (samples + noise + 1) * 2**13
+        count_field = '{}-count'.format(self.__class__.__name__)
+        trace_field = '{}-trace'.format(self.__class__.__name__)
+        data = np.array(
+            [(self._count, trace)],
+            dtype=[(count_field, 'int16'), (trace_field, 'float64', self._samples)])
+        if self._config['plot']:
+            plots.publish(self.__class__.__name__, 'trace', trace, update_number)
+            if plots.local_plotting():
+                plt.figure(self.__class__.__name__)
+                self._wiggle_plot(trace)
+        return data
+
     def _wiggle_plot(self, trace):
         """Plot the data as a wiggle plot.
 
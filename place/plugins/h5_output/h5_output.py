@@ -1,12 +1,12 @@
 """Module for exporting data to HDF5 format."""
 import json
 from warnings import warn
-import numpy as np
 try:
     from obspy.core import Stream, Trace
     from obspy.core.trace import Stats
 except ImportError:
     warn("Use of the PAL H5 plugin for PLACE requires installing ObsPy")
+import place.data
 from place.plugins.export import Export
 
 class H5Output(Export):
@@ -145,8 +145,7 @@ def _load_config(path):
         return json.load(file_p)
 
 def _load_scandata(path):
-    with open(path + '/scan_data.npy', 'rb') as file_p:
-        return np.load(file_p)
+    return place.data.open(path)
 
 def _write_streams(path, streams):
     for stream_num, stream in enumerate(streams, start=1):
@@ -1,4 +1,6 @@
 """Instrument base class for PLACE"""
+from asyncio import get_event_loop
+
 class Instrument:
     """Generic interface to an instrument.
 
@@ -88,3 +90,64 @@ class Instrument:
         :raises NotImplementedError: if not implemented
         """
         raise NotImplementedError
+
+    def resume(self, update_number):
+        """Prepare to continue an interrupted experiment.
+
+        When an interrupted experiment is resumed, :meth:`config` is called as
+        usual and then this method is called, before the first update is
+        performed. Instruments that track their progress through the
+        experiment (for example, with an iterator of stage positions) should
+        advance to the state they would have been in before ``update_number``.
+        Instruments that work entirely from the update number do not need to
+        do anything, which is the default.
+
+        :param update_number: The count of the first update that will be
+                              performed.
+        :type update_number: int
+        """
+        pass
+
+    async def config_async(self, metadata, total_updates):
+        """Coroutine version of :meth:`config`.
+
+        Used in place of :meth:`config` when the experiment is run with the
+        asyncio scheduler (``"scheduler": "asyncio"``). Instruments that spend
+        their time waiting on sockets, serial ports or timers can override
+        this with a native coroutine, allowing other instruments to run while
+        they wait. By default, :meth:`config` is run in an executor thread.
+
+        :param metadata: metadata for the experiment (see :meth:`config`)
+        :type metadata: dict
+
+        :param total_updates: the number of updates in the experiment
+        :type total_updates: int
+        """
+        await get_event_loop().run_in_executor(None, self.config, metadata, total_updates)
+
+    async def update_async(self, update_number):
+        """Coroutine version of :meth:`update`.
+
+        Used in place of :meth:`update` when the experiment is run with the
+        asyncio scheduler. By default, :meth:`update` is run in an executor
+        thread.
+
+        :param update_number: The count of the current update. This will start at 0.
+        :type update_number: int
+
+        :returns: the data for this update, as returned by :meth:`update`
+        :rtype: numpy.array
+        """
+        return await get_event_loop().run_in_executor(None, self.update, update_number)
+
+    async def cleanup_async(self, abort=False):
+        """Coroutine version of :meth:`cleanup`.
+
+        Used in place of :meth:`cleanup` when the experiment is run with the
+        asyncio scheduler. By default, :meth:`cleanup` is run in an executor
+        thread.
+
+        :param abort: indicates the experiment is being aborted
+        :type abort: bool
+        """
+        await get_event_loop().run_in_executor(None, self.cleanup, abort)
@@ -8,6 +8,7 @@ from numpy.lib import recfunctions as rfn
 import matplotlib.pyplot as plt
 from place.config import PlaceConfig
 from place.plugins.postprocessing import PostProcessing
+from place import plots
 
 # the name of the field that will contain the post-processed data
 FIELD = 'IQ-demodulation-data'
@@ -57,7 +58,7 @@ class IQDemodulation(PostProcessing):
                                                                    'lowpass_cutoff',
                                                                    '10e6'))
         metadata['demodulation'] = 'IQ'
-        if self._config['plot']:
+        if self._config['plot'] and plots.local_plotting():
             plt.figure(self.__class__.__name__)
             plt.clf()
             plt.ion()
@@ -88,29 +89,31 @@ class IQDemodulation(PostProcessing):
                                 self.sampling_rate,
                                 corners=4,
                                 zerophase=True)
-            plt.figure(self.__class__.__name__)
-            # current plot
-            plt.subplot(211)
-            plt.cla()
-            plt.plot(times, plot_data)
-            plt.xlabel(r'Time [microseconds]')
-            plt.ylabel(r'Velocity[m/s]')
-            plt.pause(0.05)
-            # wiggle plot
-            plt.subplot(212)
-            axes = plt.gca()
-            data = plot_data / (2*max(plot_data)) + update_number
-            axes.plot(data, times, color='black', linewidth=0.5)
-            plt.xlim((-1, self.updates))
-            plt.xlabel('Update Number')
-            plt.ylabel(r'Time [microseconds]')
-            plt.pause(0.05)
+            plots.publish(self.__class__.__name__, 'velocity', plot_data, update_number)
+            if plots.local_plotting():
+                plt.figure(self.__class__.__name__)
+                # current plot
+                plt.subplot(211)
+                plt.cla()
+                plt.plot(times, plot_data)
+                plt.xlabel(r'Time [microseconds]')
+                plt.ylabel(r'Velocity[m/s]')
+                plt.pause(0.05)
+                # wiggle plot
+                plt.subplot(212)
+                axes = plt.gca()
+                data = plot_data / (2*max(plot_data)) + update_number
+                axes.plot(data, times, color='black', linewidth=0.5)
+                plt.xlim((-1, self.updates))
+                plt.xlabel('Update Number')
+                plt.ylabel(r'Time [microseconds]')
+                plt.pause(0.05)
 
         # insert and return the new data
         return rfn.merge_arrays([other_data, processed_data], flatten=True, usemask=False)
 
     def cleanup(self, abort=False):
-        if abort is False and self._config['plot']:
+        if abort is False and self._config['plot'] and plots.local_plotting():
             plt.figure(self.__class__.__name__)
             plt.ioff()
             print('...please close the {} plot to continue...'.format(self.__class__.__name__))
@@ -6,6 +6,7 @@ import numpy as np
 import matplotlib.pyplot as plt
 from place.plugins.instrument import Instrument
 from place.config import PlaceConfig
+from place import plots
 from .pmot import PMot
 from . import pmot
 
@@ -35,7 +36,7 @@ class Picomotor(Instrument):
         """
         self._configure_controller()
         self._create_position_iterator(total_updates)
-        if self._config['plot']:
+        if self._config['plot'] and plots.local_plotting():
             plt.figure(self.__class__.__name__)
             plt.clf()
             if self._config['invert_x']:
@@ -61,8 +62,11 @@ class Picomotor(Instrument):
             [(x_position, y_position)],
             dtype=[(x_field, 'int32'), (y_field, 'int32')])
         if self._config['plot']:
-            plt.figure(self.__class__.__name__)
-            self._make_position_plot(data, update_number)
+            plots.publish(self.__class__.__name__, 'position',
+                          [x_position, y_position], update_number)
+            if plots.local_plotting():
+                plt.figure(self.__class__.__name__)
+                self._make_position_plot(data, update_number)
         sleep(self._config['sleep_time'])
         return data
 
@@ -74,12 +78,21 @@ class Picomotor(Instrument):
         :type abort: bool
         """
         self._controller.close()
-        if abort is False and self._config['plot']:
+        if abort is False and self._config['plot'] and plots.local_plotting():
             plt.figure(self.__class__.__name__)
             plt.ioff()
             print('...please close the {} plot to continue...'.format(self.__class__.__name__))
             plt.show()
 
+    def resume(self, update_number):
+        """Skip the positions of updates already performed.
+
+        :param update_number: the count of the first update that will be performed
+        :type update_number: int
+        """
+        for _ in range(update_number):
+            next(self._position)
+
 # PRIVATE METHODS
 
     def _configure_controller(self):
@@ -21,6 +21,7 @@ import numpy as np
 import matplotlib.pyplot as plt
 from place.config import PlaceConfig
 from place.plugins.instrument import Instrument
+from place import plots
 
 _NUMBER = r'[-+]?\d*\.\d+|\d+'
 
@@ -91,6 +92,7 @@ class Vibrometer(Instrument):
         Instrument.__init__(self, config)
         self._serial = None
         self._last_y = None
+        self._first_update = 0
 
     def config(self, metadata, total_updates):
         """Configure the vibrometer.
@@ -122,7 +124,7 @@ class Vibrometer(Instrument):
         if self._config['vd_09']:
             self._setup_decoder(metadata, 'vd_09')
 
-        if self._config['plot']:
+        if self._config['plot'] and plots.local_plotting():
             plt.figure(self.__class__.__name__)
             plt.clf()
             plt.ion()
@@ -137,7 +139,8 @@ class Vibrometer(Instrument):
         :rtype: numpy.array dtype='uint64'
         """
         if self._config['autofocus'] != 'none':
-            if update_number == 0 or self._config['autofocus_everytime'] is True:
+            if (update_number == self._first_update
+                    or self._config['autofocus_everytime'] is True):
                 self._autofocus_vibrometer(
                     span=self._config['autofocus'],
                     timeout=self._config['timeout'])
@@ -145,8 +148,10 @@ class Vibrometer(Instrument):
         field = '{}-signal'.format(self.__class__.__name__)
         data = np.array([(signal_level,)], dtype=[(field, 'uint64')])
         if self._config['plot']:
-            plt.figure(self.__class__.__name__)
-            self._draw_plot(signal_level, update_number)
+            plots.publish(self.__class__.__name__, 'signal', [signal_level], update_number)
+            if plots.local_plotting():
+                plt.figure(self.__class__.__name__)
+                self._draw_plot(signal_level, update_number)
         return data
 
     def cleanup(self, abort=False):
@@ -157,7 +162,7 @@ class Vibrometer(Instrument):
         :param abort: indicates that the scan is being aborted and is unfinished
         :type abort: bool
         """
-        if abort is False and self._config['plot']:
+        if abort is False and self._config['plot'] and plots.local_plotting():
             plt.figure(self.__class__.__name__)
             plt.ioff()
             print('...please close the {} plot to continue...'.format(self.__class__.__name__))
@@ -166,6 +171,14 @@ class Vibrometer(Instrument):
         if abort is False:
             self._serial.close()
 
+    def resume(self, update_number):
+        """Autofocus on the first update performed when resuming.
+
+        :param update_number: the count of the first update that will be performed
+        :type update_number: int
+        """
+        self._first_update = update_number
+
 # PRIVATE METHODS
 
     def _write(self, message):
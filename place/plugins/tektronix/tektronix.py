@@ -6,6 +6,7 @@ import numpy as np
 import matplotlib.pyplot as plt
 from place.plugins.instrument import Instrument
 from place.config import PlaceConfig
+from place import plots
 
 class TektronixCommon(Instrument):
     #pylint: disable=too-many-instance-attributes
@@ -22,6 +23,9 @@ class TektronixCommon(Instrument):
                                              for trigger.
     plot                      bool           ``True`` if plotting should occur, otherwise
                                              ``False``.
+    fast_frame                int            (optional) the number of triggers to capture in
+                                             each update using FastFrame (segmented memory);
+                                             ``0`` (the default) to capture one
     ========================= ============== ================================================
 
     The oscilloscope will produce the following experimental metadata:
@@ -40,8 +44,21 @@ class TektronixCommon(Instrument):
                                                *N*, as reported by the oscilloscope.
     *model*-chN_x_increment     float          The increment between data point for channel
                                                *N*, as reported by the oscilloscope.
+    *model*-fast_frames         int            The number of frames captured in each update,
+                                               as reported by the oscilloscope (only with
+                                               ``fast_frame``).
     =========================== ============== ==============================================
 
+    The connection to the oscilloscope is opened in ``config`` and kept open
+    until ``cleanup``. Queries are pipelined: the configuration of every
+    channel is requested at once, and the curves of all active channels are
+    requested together in each update and then received in order.
+
+    With ``fast_frame``, each update arms the oscilloscope once and captures a
+    frame for each of the requested number of triggers. All the frames of a
+    channel are then transferred as one binary block. This requires an
+    oscilloscope supporting FastFrame.
+
     This module will produce the following experimental data:
 
     +---------------+-------------------------+-------------------------+
@@ -49,6 +66,9 @@ class TektronixCommon(Instrument):
     +===============+=========================+=========================+
     | *model*-trace | [channel X sample]      | the trace data recorded |
     |               | array of uint16         | on the oscilloscope     |
+    |               |                         |                         |
+    |               | [channel X frame X      | (with ``fast_frame``)   |
+    |               | sample] array of uint16 |                         |
     +---------------+-------------------------+-------------------------+
 
     .. note::
@@ -70,6 +90,9 @@ class TektronixCommon(Instrument):
         self._record_length = None
         self._x_zero = None
         self._x_increment = None
+        self._received = b''
+        self._curve = None
+        self._frames = None
 
     def config(self, metadata, total_updates):
         """Configure the oscilloscope.
@@ -87,30 +110,38 @@ class TektronixCommon(Instrument):
         self._ip_address = PlaceConfig().get_config_value(name, "ip_address")
         self._scope = socket(AF_INET, SOCK_STREAM)
         self._scope.settimeout(5.0)
+        self._received = b''
         try:
             self._scope.connect((self._ip_address, 4000))
         except OSError:
             self._scope.close()
-            del self._scope
+            self._scope = None
             raise
         self._channels = [self._is_active(x+1) for x in range(self._get_num_analog_channels())]
-        self._record_length = self._get_record_length()
+        self._record_length, self._samples = self._get_record_length_and_sample_rate()
         metadata[name + '-record_length'] = self._record_length
-        self._x_zero = [None for _ in self._channels]
-        self._x_increment = [None for _ in self._channels]
         metadata[name + '-active_channels'] = self._channels
-        self._samples = self._get_sample_rate()
         metadata[name + '-sample_rate'] = self._samples
-        for channel, active in enumerate(self._channels):
-            if not active:
-                continue
+        self._frames = None
+        if self._config.get('fast_frame', 0):
+            self._frames = self._config_fast_frame(self._config['fast_frame'])
+            metadata[name + '-fast_frames'] = self._frames
+        self._x_zero = [None for _ in self._channels]
+        self._x_increment = [None for _ in self._channels]
+        active_channels = [channel for channel, active in enumerate(self._channels) if active]
+        for channel in active_channels:
             self._send_config_msg(channel+1)
-            self._x_zero[channel] = self._get_x_zero(channel+1)
+        # one compound waveform query per channel, all sent before any reply is read
+        self._scope.sendall(b''.join(
+            ':HEADER OFF;:DATA:SOURCE CH{:d};:WFMOUTPRE:XZERO?;XINCR?\n'.format(channel+1)
+            .encode('ascii') for channel in active_channels))
+        for channel in active_channels:
+            x_zero, x_increment = self._read_line().split(';')
+            self._x_zero[channel] = float(x_zero)
             metadata[name + '-ch{:d}_x_zero'.format(channel+1)] = self._x_zero[channel]
-            self._x_increment[channel] = self._get_x_increment(channel+1)
+            self._x_increment[channel] = float(x_increment)
             metadata[name + '-ch{:d}_x_increment'.format(channel+1)] = self._x_increment[channel]
-        self._scope.close()
-        if self._config['plot']:
+        if self._config['plot'] and plots.local_plotting():
             for channel, active in enumerate(self._channels):
                 if not active:
                     continue
@@ -125,24 +156,31 @@ class TektronixCommon(Instrument):
         :type update_number: int
 
         :returns: the trace data
-        :rtype: numpy.array dtype='(*number_channels*,*number_samples*)int16'
+        :rtype: numpy.array dtype='(*number_channels*,*number_samples*)int16', or
+                dtype='(*number_channels*,*number_frames*,*number_samples*)int16'
+                with FastFrame
         """
-        self._scope = socket(AF_INET, SOCK_STREAM)
-        self._scope.settimeout(5.0)
-        self._scope.connect((self._ip_address, 4000))
         self._activate_acquisition()
         field = '{}-trace'.format(self.__class__.__name__)
-        type_ = '({:d},{:d})int16'.format(len(self._channels), self._record_length)
+        if self._frames is None:
+            type_ = '({:d},{:d})int16'.format(len(self._channels), self._record_length)
+        else:
+            type_ = '({:d},{:d},{:d})int16'.format(
+                len(self._channels), self._frames, self._record_length)
         data = np.zeros((1,), dtype=[(field, type_)])
-        for channel, active in enumerate(self._channels):
-            if not active:
-                continue
-            self._request_curve(channel+1)
+        active_channels = [channel for channel, active in enumerate(self._channels) if active]
+        self._request_curves([channel+1 for channel in active_channels])
+        for channel in active_channels:
             trace = self._receive_curve()
+            if self._frames is not None:
+                trace = trace.reshape(self._frames, self._record_length)
             if self._config['plot']:
-                self._plot(channel+1, trace, update_number)
+                plots.publish(self.__class__.__name__, 'ch{:d}'.format(channel+1),
+                              trace, update_number)
+                if plots.local_plotting():
+                    self._plot(channel+1, trace.reshape(-1, self._record_length)[0],
+                               update_number)
             data[field][0][channel] = trace
-        self._scope.close()
         return data.copy()
 
     def cleanup(self, abort=False):
@@ -152,7 +190,12 @@ class TektronixCommon(Instrument):
                       having finished normally
         :type abort: bool
         """
-        if abort is False and self._config['plot']:
+        if self._scope is not None:
+            if self._frames is not None:
+                self._scope.sendall(b':HORIZONTAL:FASTFRAME:STATE OFF\n')
+            self._scope.close()
+            self._scope = None
+        if abort is False and self._config['plot'] and plots.local_plotting():
             name = self.__class__.__name__
             for channel, active in enumerate(self._channels):
                 if not active:
@@ -162,70 +205,59 @@ class TektronixCommon(Instrument):
                 print('...please close the {} plot to continue...'.format(self.__class__.__name__))
                 plt.show()
 
+    def _read_line(self):
+        """Receive one line of response from the oscilloscope.
+
+        Responses to pipelined queries may arrive together, so any bytes after
+        the line are kept for the next read.
+        """
+        while b'\n' not in self._received:
+            received = self._scope.recv(4096)
+            if not received:
+                raise OSError('connection to oscilloscope closed')
+            self._received += received
+        line, _, self._received = self._received.partition(b'\n')
+        return line.decode('ascii').strip()
+
+    def _query(self, message):
+        """Send a query and receive its response."""
+        self._scope.sendall(bytes(message + '\n', encoding='ascii'))
+        return self._read_line()
+
     def _clear_errors(self):
-        self._scope.sendall(bytes(':*ESR?;:ALLEv?\n', encoding='ascii'))
-        dat = ''
-        while '\n' not in dat:
-            dat += self._scope.recv(4096).decode('ascii')
+        self._query(':*ESR?;:ALLEv?')
 
     def _is_active(self, channel):
         self._scope.settimeout(5.0)
         self._clear_errors()
-        self._scope.sendall(bytes(':DATA:SOURCE CH{:d};:WFMOUTPRE?\n'.format(channel),
-                                  encoding='ascii'))
-        dat = ''
-        while '\n' not in dat:
-            dat += self._scope.recv(4096).decode('ascii')
-        self._scope.sendall(b'*ESR?\n')
-        dat = ''
-        while '\n' not in dat:
-            dat += self._scope.recv(4096).decode('ascii')
+        self._query(':DATA:SOURCE CH{:d};:WFMOUTPRE?'.format(channel))
+        dat = self._query('*ESR?')
         self._clear_errors()
         return int(dat) == 0
 
     def _get_num_analog_channels(self):
         self._scope.settimeout(5.0)
-        self._scope.sendall(b':CONFIGURATION:ANALOG:NUMCHANNELS?\n')
-        dat = ''
-        while '\n' not in dat:
-            dat += self._scope.recv(4096).decode('ascii')
-        return int(dat)
+        return int(self._query(':CONFIGURATION:ANALOG:NUMCHANNELS?'))
 
-    def _get_x_zero(self, channel):
-        self._scope.settimeout(5.0)
-        self._scope.sendall(bytes(
-            ':HEADER OFF;:DATA:SOURCE CH{:d};:WFMOUTPRE:XZERO?\n'.format(channel),
-            encoding='ascii'))
-        dat = ''
-        while '\n' not in dat:
-            dat += self._scope.recv(4096).decode('ascii')
-        return float(dat)
-
-    def _get_x_increment(self, channel):
+    def _get_record_length_and_sample_rate(self):
         self._scope.settimeout(5.0)
-        self._scope.sendall(bytes(
-            ':HEADER OFF;:DATA:SOURCE CH{:d};:WFMOUTPRE:XINCR?\n'.format(channel),
-            encoding='ascii'))
-        dat = ''
-        while '\n' not in dat:
-            dat += self._scope.recv(4096).decode('ascii')
-        return float(dat)
-
-    def _get_sample_rate(self):
-        self._scope.settimeout(5.0)
-        self._scope.sendall(b':HEADER OFF;:HORIZONTAL:SAMPLERATE?\n')
-        dat = ''
-        while '\n' not in dat:
-            dat += self._scope.recv(4096).decode('ascii')
-        return float(dat)
+        record_length, sample_rate = self._query(
+            ':HEADER OFF;:HORIZONTAL:RECORDLENGTH?;SAMPLERATE?').split(';')
+        return int(record_length), float(sample_rate)
+
+    def _config_fast_frame(self, frames):
+        """Turn on FastFrame.
 
-    def _get_record_length(self):
+        :param frames: the number of frames to capture in each acquisition
+        :type frames: int
+
+        :returns: the number of frames the oscilloscope will capture
+        :rtype: int
+        """
         self._scope.settimeout(5.0)
-        self._scope.sendall(b':HEADER OFF;:HORIZONTAL:RECORDLENGTH?\n')
-        dat = ''
-        while '\n' not in dat:
-            dat += self._scope.recv(4096).decode('ascii')
-        return int(dat)
+        self._scope.sendall(bytes(
+            ':HORIZONTAL:FASTFRAME:STATE ON;COUNT {:d}\n'.format(frames), encoding='ascii'))
+        return int(self._query(':HEADER OFF;:HORIZONTAL:FASTFRAME:COUNT?'))
 
     def _send_config_msg(self, channel):
         config_msg = bytes(
@@ -234,6 +266,8 @@ class TektronixCommon(Instrument):
                 'START 1;' +
                 'STOP {};'.format(self._record_length)
             ) +
+            (':DATA:FRAMESTART 1;FRAMESTOP {:d};'.format(self._frames)
+             if self._frames is not None else '') +
             ':WFMOUTPRE:' + (
                 'BYT_NR 2;' +
                 'BIT_NR 16;' +
@@ -247,6 +281,7 @@ class TektronixCommon(Instrument):
         self._scope.sendall(config_msg)
 
     def _activate_acquisition(self):
+        self._scope.settimeout(60)
         self._scope.sendall(b':ACQUIRE:STATE ON\n')
         sleep(0.1)
         if self._config['force_trigger']:
@@ -256,65 +291,81 @@ class TektronixCommon(Instrument):
 
     def _force_trigger(self):
         for _ in range(120):
-            self._scope.settimeout(60)
             self._scope.sendall(b':TRIGGER FORCE\n')
             sleep(0.1)
-            self._scope.settimeout(0.25)
-            try:
-                self._scope.recv(4096)
-            except OSError:
-                pass
-            self._scope.settimeout(60)
-            self._scope.sendall(b':ACQUIRE:STATE?\n')
-            sleep(0.1)
-            byte = b''
-            for _ in range(600):
-                byte = self._scope.recv(1)
-                if byte == b'0' or byte == b'1':
-                    self._scope.settimeout(0.25)
-                    try:
-                        self._scope.recv(4096)
-                    except OSError:
-                        pass
-                    break
-            if byte == b'0':
+            if self._query(':ACQUIRE:STATE?') == '0':
                 break
 
     def _wait_for_trigger(self):
-        self._scope.setblocking(False)
         for _ in range(120):
-            self._scope.sendall(b':ACQUIRE:STATE?\n')
-            byte = b''
-            for _ in range(600):
-                try:
-                    byte = self._scope.recv(1)
-                except BlockingIOError:
-                    sleep(0.1)
-                    continue
-                if byte == b'0' or byte == b'1':
-                    break
-
-            if byte == b'0':
+            if self._query(':ACQUIRE:STATE?') == '0':
                 break
             sleep(0.5)
 
-    def _request_curve(self, channel):
+    def _request_curves(self, channels):
+        """Request the curves of several channels at once.
+
+        :param channels: the channel numbers, in the order the curves will be
+                         received
+        :type channels: list
+        """
         self._scope.settimeout(60.0)
-        self._scope.sendall(
-            bytes(':DATA:SOURCE CH{:d};:CURVE?\n'.format(channel), encoding='ascii'))
+        self._scope.sendall(b''.join(
+            ':DATA:SOURCE CH{:d};:CURVE?\n'.format(channel).encode('ascii')
+            for channel in channels))
 
     def _receive_curve(self):
-        hash_message = b''
-        while hash_message != b'#':
-            hash_message = self._scope.recv(1)
-
-        length_length = int(self._scope.recv(1).decode(), base=16)
-        length = int(self._scope.recv(length_length).decode(), base=10)
-        data = b''
-        while len(data) < length:
-            data += self._scope.recv(4096)
-        data = data[:length]
-        return np.frombuffer(data, dtype='int16')
+        """Receive the next curve, sent as an IEEE 488.2 definite length block.
+
+        The size of the curve is read from the block header, and the curve is
+        received straight into a buffer that is reused while the size stays
+        the same.
+
+        :returns: the curve, which is overwritten by the next curve received
+        :rtype: numpy.array
+        """
+        while True:
+            self._fill(1)
+            start = self._received.find(b'#')
+            if start >= 0:
+                break
+            self._received = b''
+        self._received = self._received[start:]
+        self._fill(2)
+        length_length = int(self._received[1:2].decode(), base=16)
+        self._fill(2 + length_length)
+        length = int(self._received[2:2 + length_length].decode(), base=10)
+        self._received = self._received[2 + length_length:]
+        samples = length // TektronixCommon._bytes_per_sample
+        if self._curve is None or len(self._curve) != samples:
+            self._curve = np.empty(samples, dtype=TektronixCommon._data_type)
+        self._receive_into(memoryview(self._curve.view(np.uint8)))
+        self._read_line() # the newline ending the response
+        return self._curve
+
+    def _fill(self, count):
+        """Receive until at least a number of bytes are waiting to be read."""
+        while len(self._received) < count:
+            received = self._scope.recv(4096)
+            if not received:
+                raise OSError('connection to oscilloscope closed')
+            self._received += received
+
+    def _receive_into(self, view):
+        """Receive bytes until a buffer is full.
+
+        :param view: the buffer to fill
+        :type view: memoryview
+        """
+        waiting = min(len(self._received), len(view))
+        view[:waiting] = self._received[:waiting]
+        self._received = self._received[waiting:]
+        received = waiting
+        while received < len(view):
+            count = self._scope.recv_into(view[received:])
+            if not count:
+                raise OSError('connection to oscilloscope closed')
+            received += count
 
     def _plot(self, channel, trace, update_number):
         times = np.arange(len(trace)) * self._x_increment[channel-1] + self._x_zero[channel-1]
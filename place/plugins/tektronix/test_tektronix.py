@@ -1,8 +1,12 @@
 """Basic testing for Tektronix oscilloscope"""
-from unittest import TestCase
+from unittest import TestCase, mock
 import unittest
 import json
+import socket
+from threading import Thread
+import numpy as np
 from place import experiment
+from place.plugins.tektronix import DPO3014
 
 TEST_CONFIG = """
 {
@@ -23,6 +27,116 @@ TEST_CONFIG = """
 }
 """
 
+class FakeScope:
+    """Answers the SCPI commands used by TektronixCommon over a socket.
+
+    The replies to all the commands received together are sent together, so
+    replies to pipelined queries arrive merged.
+    """
+    def __init__(self, sock, active=(True, False, True, False), record_length=10):
+        self.commands = []
+        self.frames = None
+        self._socket = sock
+        self._active = active
+        self._record_length = record_length
+        self._source = 1
+        self._thread = Thread(target=self._serve, daemon=True)
+        self._thread.start()
+
+    def curve(self, channel):
+        """Get the curve the fake scope sends for a channel."""
+        samples = self._record_length * (self.frames or 1)
+        return ((np.arange(samples) - samples // 2) * 100 * channel).astype('int16')
+
+    def join(self):
+        """Wait for the connection to close."""
+        self._thread.join(5)
+
+    def _serve(self):
+        received = b''
+        while True:
+            data = self._socket.recv(4096)
+            if not data:
+                self._socket.close()
+                return
+            received += data
+            *lines, received = received.split(b'\n')
+            self._socket.sendall(b''.join(self._answer(line.decode('ascii')) for line in lines))
+
+    def _answer(self, line):
+        """Get the reply to one line of commands."""
+        self.commands.append(line)
+        replies = []
+        for command in line.split(';'):
+            command = command.lstrip(':').upper()
+            if command.startswith('DATA:SOURCE CH'):
+                self._source = int(command[len('DATA:SOURCE CH'):])
+            elif command.startswith(('COUNT ', 'HORIZONTAL:FASTFRAME:COUNT ')):
+                self.frames = int(command.split()[-1])
+            elif command == 'CURVE?':
+                curve = self.curve(self._source).astype('<i2').tobytes()
+                length = str(len(curve)).encode('ascii')
+                return b'#' + str(len(length)).encode('ascii') + length + curve + b'\n'
+            elif command.endswith('?'):
+                replies.append(self._query(command))
+        return ';'.join(replies).encode('ascii') + b'\n' if replies else b''
+
+    def _query(self, command):
+        """Get the reply to one query."""
+        return {
+            '*ESR?': '0' if self._active[self._source-1] else '4',
+            'ALLEV?': '0,"No events to report - queue empty"',
+            'WFMOUTPRE?': '2;16;BINARY;RI;LSB',
+            'CONFIGURATION:ANALOG:NUMCHANNELS?': str(len(self._active)),
+            'HORIZONTAL:RECORDLENGTH?': str(self._record_length),
+            'SAMPLERATE?': '2.5000E+9',
+            'HORIZONTAL:FASTFRAME:COUNT?': str(self.frames),
+            'WFMOUTPRE:XZERO?': '{:.4E}'.format(-1e-6 * self._source),
+            'XINCR?': '{:.4E}'.format(4e-10 * self._source),
+            'ACQUIRE:STATE?': '0',
+            }[command]
+
+class ChoppedSocket:
+    """A socket receiving at most a few bytes at a time.
+
+    This splits the replies of the oscilloscope across many receives.
+    """
+    def __init__(self, sock, most):
+        self._socket = sock
+        self._most = most
+
+    def connect(self, address):
+        """Already connected."""
+        pass
+
+    def recv(self, size):
+        """Receive up to the smaller of ``size`` and the limit."""
+        return self._socket.recv(min(size, self._most))
+
+    def recv_into(self, buffer):
+        """Receive into a buffer, up to the limit."""
+        return self._socket.recv_into(buffer, min(len(buffer), self._most))
+
+    def __getattr__(self, name):
+        return getattr(self._socket, name)
+
+def _configure(scope, metadata, most=4096, **options):
+    """Configure a scope connected to a FakeScope.
+
+    :param most: the most bytes the scope receives at a time
+    :type most: int
+
+    :returns: the fake scope
+    :rtype: FakeScope
+    """
+    client, server = socket.socketpair()
+    fake = FakeScope(server, **options)
+    module = 'place.plugins.tektronix.tektronix.'
+    with mock.patch(module + 'socket', return_value=ChoppedSocket(client, most)), \
+            mock.patch(module + 'PlaceConfig'):
+        scope.config(metadata, 2)
+    return fake
+
 class TestOsci(TestCase):
     """Test class"""
     def test0001_json_init(self):
@@ -41,5 +155,96 @@ class TestOsci(TestCase):
         except ValueError:
             self.skipTest('No IP address for oscilloscope.')
 
+    def test0003_pipelined_replies(self):
+        """Test that replies to pipelined queries are read one line at a time"""
+        #pylint: disable=protected-access
+        for most in (4096, 3):
+            client, server = socket.socketpair()
+            client.settimeout(5.0)
+            scope = DPO3014({'plot': False, 'force_trigger': True})
+            scope._scope = ChoppedSocket(client, most)
+            server.sendall(b'1.5E-6;4.0E-10\n-2;3\n\n#')
+            self.assertEqual(scope._read_line(), '1.5E-6;4.0E-10')
+            self.assertEqual(scope._read_line(), '-2;3')
+            self.assertEqual(scope._read_line(), '')
+            server.sendall(b'\n')
+            self.assertEqual(scope._read_line(), '#')
+            client.close()
+            server.close()
+
+    def test0004_config(self):
+        """Test that the channel configuration is read from pipelined replies"""
+        for most in (4096, 3):
+            scope = DPO3014({'plot': False, 'force_trigger': True})
+            metadata = {}
+            fake = _configure(scope, metadata, most)
+            scope.cleanup(abort=True)
+            fake.join()
+            self.assertEqual(metadata['DPO3014-active_channels'], [True, False, True, False])
+            self.assertEqual(metadata['DPO3014-record_length'], 10)
+            self.assertEqual(metadata['DPO3014-sample_rate'], 2.5e9)
+            self.assertEqual(metadata['DPO3014-ch1_x_zero'], -1e-6)
+            self.assertEqual(metadata['DPO3014-ch1_x_increment'], 4e-10)
+            self.assertEqual(metadata['DPO3014-ch3_x_zero'], -3e-6)
+            self.assertEqual(metadata['DPO3014-ch3_x_increment'], 1.2e-9)
+            self.assertNotIn('DPO3014-ch2_x_zero', metadata)
+
+    def test0005_receive_curves(self):
+        """Test that curves are received from blocks split and merged across receives"""
+        #pylint: disable=protected-access
+        first = np.array([-32768, -1, 0, 1, 32767], dtype='<i2')
+        second = np.arange(-600, 600, 3, dtype='<i2')
+        for most in (4096, 3):
+            client, server = socket.socketpair()
+            client.settimeout(5.0)
+            scope = DPO3014({'plot': False, 'force_trigger': True})
+            scope._scope = ChoppedSocket(client, most)
+            server.sendall(b'#210' + first.tobytes() + b'\n' +
+                           b'#3800' + second.tobytes() + b'\n' +
+                           b'#210' + first[::-1].tobytes() + b'\n0\n')
+            self.assertEqual(scope._receive_curve().tolist(), first.tolist())
+            self.assertEqual(scope._receive_curve().tolist(), second.tolist())
+            reused = scope._receive_curve()
+            self.assertEqual(reused.tolist(), first[::-1].tolist())
+            self.assertEqual(scope._read_line(), '0')
+            server.sendall(b'#210' + first.tobytes() + b'\n')
+            self.assertIs(scope._receive_curve(), reused)
+            self.assertEqual(reused.tolist(), first.tolist())
+            client.close()
+            server.close()
+
+    def test0006_update(self):
+        """Test that the curves of several channels are received in each update"""
+        for most in (4096, 3):
+            scope = DPO3014({'plot': False, 'force_trigger': True})
+            fake = _configure(scope, {}, most)
+            for update_number in range(2):
+                trace = scope.update(update_number)['DPO3014-trace']
+                self.assertEqual(trace.shape, (1, 4, 10))
+                self.assertEqual(trace[0][0].tolist(), fake.curve(1).tolist())
+                self.assertEqual(trace[0][2].tolist(), fake.curve(3).tolist())
+                self.assertFalse(trace[0][1].any() or trace[0][3].any())
+            scope.cleanup(abort=True)
+            fake.join()
+            self.assertEqual(sum(command.endswith('CURVE?') for command in fake.commands), 4)
+
+    def test0007_fast_frame(self):
+        """Test that FastFrame curves are split into frames"""
+        for most in (4096, 3):
+            scope = DPO3014({'plot': False, 'force_trigger': True, 'fast_frame': 3})
+            metadata = {}
+            fake = _configure(scope, metadata, most)
+            self.assertEqual(metadata['DPO3014-fast_frames'], 3)
+            trace = scope.update(0)['DPO3014-trace']
+            self.assertEqual(trace.shape, (1, 4, 3, 10))
+            self.assertEqual(trace[0][0].tolist(), fake.curve(1).reshape(3, 10).tolist())
+            self.assertEqual(trace[0][2].tolist(), fake.curve(3).reshape(3, 10).tolist())
+            self.assertFalse(trace[0][1].any() or trace[0][3].any())
+            scope.cleanup(abort=True)
+            fake.join()
+            self.assertEqual(len([command for command in fake.commands
+                                  if ':DATA:FRAMESTART 1;FRAMESTOP 3;' in command]), 2)
+            self.assertEqual(fake.commands[-1], ':HORIZONTAL:FASTFRAME:STATE OFF')
+
 if __name__ == '__main__':
     unittest.main(verbosity=2, buffer=True)
@@ -117,6 +117,18 @@ class Stage(Instrument):
         """
         self._close_controller_connection()
 
+    def resume(self, update_number):
+        """Skip the positions of updates already performed.
+
+        The stage will move to the position for ``update_number`` during the
+        next update.
+
+        :param update_number: the count of the first update that will be performed
+        :type update_number: int
+        """
+        for _ in range(update_number):
+            next(self._position)
+
 # PRIVATE METHODS
 
     def _create_position_iterator(self, updates):
@@ -0,0 +1,657 @@
+"""Writers for saving PLACE experiment data to disk.
+
+Each writer receives one row of data per update and is responsible for
+getting it into the experiment directory. The writer used by an experiment is
+selected with the ``storage`` key in the experiment configuration:
+
+========= ================================================================
+Value     Meaning
+========= ================================================================
+files     (default) each update is saved to its own ``scan_data_NNN.npy``
+          file, and the files are packed into ``scan_data.npy`` when the
+          experiment completes
+memmap    ``scan_data.npy`` is preallocated for all the updates when the
+          first row arrives, and each row is written into place through a
+          memory map, so no packing is needed
+shards    for very long experiments, rows are written through memory maps
+          into shard files of ``shard_size`` rows (default 1000), which are
+          kept in the ``scan_data`` subdirectory and are not packed
+========= ================================================================
+
+Sharded data is laid out as follows, with at most 1000 shards in each
+numbered subdirectory::
+
+    scan_data/index.json
+    scan_data/000/000000.npy    (updates 0 to shard_size - 1)
+    scan_data/000/000001.npy    (the next shard_size updates)
+    ...
+    scan_data/001/001000.npy
+
+``index.json`` records the ``shard_size``, the total number of ``updates``,
+and the number of ``rows`` that have been completely written.
+
+:func:`pack` and :func:`unpack` convert between ``scan_data.npy`` and the
+other layouts.
+"""
+import os
+import re
+import json
+import struct
+from glob import glob
+from os.path import isfile, isdir, basename
+from shutil import rmtree, copyfileobj
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from io import BytesIO
+import numpy as np
+
+PROGRESS_FILE = 'scan_data.progress'
+SHARD_DIRECTORY = 'scan_data'
+INDEX_FILE = 'index.json'
+SHARD_SIZE = 1000
+SHARDS_PER_DIRECTORY = 1000
+
+IO_THREADS = 8
+"""The default number of threads used by :func:`pack` and :func:`unpack`."""
+CHUNK_BYTES = 2**24
+"""The largest amount of data copied at once by :func:`pack` and :func:`unpack`."""
+CHUNK_FILES = 1024
+"""The largest number of row files read or written at once."""
+
+class RowFileWriter:
+    """Save each update into its own ``scan_data_NNN.npy`` file."""
+    def __init__(self, directory, total_updates):
+        """Constructor
+
+        :param directory: the experiment directory
+        :type directory: str
+
+        :param total_updates: the number of updates in the experiment
+        :type total_updates: int
+        """
+        self._directory = directory
+        self._updates = total_updates
+
+    def resume(self, completed):
+        """Prepare to continue writing an interrupted experiment.
+
+        Any file left by the update that was interrupted is removed.
+
+        :param completed: the number of updates that were completely written
+        :type completed: int
+        """
+        filename = row_filename(self._directory, completed)
+        if isfile(filename):
+            os.remove(filename)
+
+    def write(self, update_number, row):
+        """Save one row of data.
+
+        :param update_number: the count of the current update (0-indexed)
+        :type update_number: int
+
+        :param row: the data for this update
+        :type row: numpy.array, structured array of shape (1,)
+        """
+        filename = row_filename(self._directory, update_number)
+        with open(filename, 'xb') as data_file:
+            np.save(data_file, row, allow_pickle=False)
+
+    def close(self, abort=False):
+        """Pack the row files into ``scan_data.npy``, unless aborted.
+
+        :param abort: ``True`` if the experiment is being aborted
+        :type abort: bool
+        """
+        if not abort:
+            pack(self._directory)
+
+class MemmapWriter:
+    """Write each update directly into a preallocated ``scan_data.npy``.
+
+    The file cannot be created until the layout of a row is known, so it is
+    created when the first row is written. It is sized to hold every update
+    of the experiment. Until the experiment completes, the number of rows
+    that have been written is recorded in ``scan_data.progress``. Rows beyond
+    this count contain zeros and should be ignored.
+    """
+    def __init__(self, directory, total_updates):
+        """Constructor
+
+        :param directory: the experiment directory
+        :type directory: str
+
+        :param total_updates: the number of updates in the experiment
+        :type total_updates: int
+        """
+        self._directory = directory
+        self._updates = total_updates
+        self._data = None
+
+    def resume(self, completed):
+        """Prepare to continue writing an interrupted experiment.
+
+        :param completed: the number of updates that were completely written
+        :type completed: int
+        """
+        filename = '{}/scan_data.npy'.format(self._directory)
+        if completed and isfile(filename):
+            self._data = np.load(filename, mmap_mode='r+')
+
+    def write(self, update_number, row):
+        """Write one row of data into place.
+
+        :param update_number: the count of the current update (0-indexed)
+        :type update_number: int
+
+        :param row: the data for this update
+        :type row: numpy.array, structured array of shape (1,)
+        """
+        if self._data is None:
+            self._data = np.lib.format.open_memmap(
+                '{}/scan_data.npy'.format(self._directory),
+                mode='w+', dtype=row.dtype, shape=(self._updates,))
+        self._data[update_number] = row[0]
+        write_progress(self._directory, update_number + 1)
+
+    def close(self, abort=False):
+        """Flush the data to disk.
+
+        When the experiment completes normally, every row is valid and the
+        progress file is removed.
+
+        :param abort: ``True`` if the experiment is being aborted
+        :type abort: bool
+        """
+        if self._data is None:
+            return
+        self._data.flush()
+        del self._data
+        self._data = None
+        if not abort:
+            os.remove('{}/{}'.format(self._directory, PROGRESS_FILE))
+
+class ShardWriter:
+    """Write each update into place in a shard file.
+
+    Each shard file holds ``shard_size`` updates and is memory-mapped while
+    it is being filled. The index is updated after every row, so it always
+    records the number of complete rows.
+    """
+    def __init__(self, directory, total_updates, shard_size=SHARD_SIZE):
+        """Constructor
+
+        :param directory: the experiment directory
+        :type directory: str
+
+        :param total_updates: the number of updates in the experiment
+        :type total_updates: int
+
+        :param shard_size: the number of updates in each shard
+        :type shard_size: int
+        """
+        self._directory = directory
+        self._updates = total_updates
+        self._shard_size = shard_size
+        self._shard = None
+        self._shard_number = None
+
+    def resume(self, completed):
+        """Prepare to continue writing an interrupted experiment.
+
+        :param completed: the number of updates that were completely written
+        :type completed: int
+        """
+        index = read_index(self._directory)
+        if index is not None:
+            self._shard_size = index['shard_size']
+        shard_number, offset = divmod(completed, self._shard_size)
+        if offset:
+            self._shard = np.load(shard_filename(self._directory, shard_number), mmap_mode='r+')
+            self._shard_number = shard_number
+
+    def write(self, update_number, row):
+        """Write one row of data into place.
+
+        :param update_number: the count of the current update (0-indexed)
+        :type update_number: int
+
+        :param row: the data for this update
+        :type row: numpy.array, structured array of shape (1,)
+        """
+        shard_number, offset = divmod(update_number, self._shard_size)
+        if shard_number != self._shard_number:
+            self._close_shard()
+            self._shard = _create_shard(self._directory, shard_number, row.dtype,
+                                        min(self._shard_size,
+                                            self._updates - shard_number * self._shard_size))
+            self._shard_number = shard_number
+        self._shard[offset] = row[0]
+        write_index(self._directory, {
+            'shard_size': self._shard_size,
+            'updates': self._updates,
+            'rows': update_number + 1,
+            })
+
+    def close(self, abort=False):
+        """Flush the data to disk.
+
+        :param abort: ``True`` if the experiment is being aborted
+        :type abort: bool
+        """
+        self._close_shard()
+
+    def _close_shard(self):
+        if self._shard is None:
+            return
+        self._shard.flush()
+        del self._shard
+        self._shard = None
+        self._shard_number = None
+
+def row_filename(directory, update_number):
+    """Get the name of the file holding a single update.
+
+    :param directory: the experiment directory
+    :type directory: str
+
+    :param update_number: the count of the update (0-indexed)
+    :type update_number: int
+
+    :returns: the path of the row file
+    :rtype: str
+    """
+    return '{}/scan_data_{:03d}.npy'.format(directory, update_number)
+
+def completed_updates(directory):
+    """Count the updates that were completely written to an experiment directory.
+
+    :param directory: the experiment directory
+    :type directory: str
+
+    :returns: the number of updates, starting from the first, that were
+              completely written
+    :rtype: int
+    """
+    progress = read_progress(directory)
+    if progress is not None:
+        return progress
+    index = read_index(directory)
+    if index is not None:
+        return index['rows']
+    filename = '{}/scan_data.npy'.format(directory)
+    if isfile(filename):
+        return len(np.load(filename, mmap_mode='r'))
+    count = 0
+    while True:
+        try:
+            np.load(row_filename(directory, count), mmap_mode='r')
+        except (OSError, ValueError, EOFError):
+            return count
+        count += 1
+
+def write_progress(directory, rows):
+    """Record the number of valid rows in a partially written experiment.
+
+    The file is replaced atomically, so it always holds a complete count.
+
+    :param directory: the experiment directory
+    :type directory: str
+
+    :param rows: the number of rows that have been completely written
+    :type rows: int
+    """
+    filename = '{}/{}'.format(directory, PROGRESS_FILE)
+    with open(filename + '.tmp', 'w') as file_p:
+        file_p.write('{:d}\n'.format(rows))
+    os.replace(filename + '.tmp', filename)
+
+def read_progress(directory):
+    """Get the number of valid rows in a partially written experiment.
+
+    :param directory: the experiment directory
+    :type directory: str
+
+    :returns: the number of rows written, or ``None`` if the experiment has
+              no progress file
+    :rtype: int
+    """
+    try:
+        with open('{}/{}'.format(directory, PROGRESS_FILE), 'r') as file_p:
+            return int(file_p.read())
+    except FileNotFoundError:
+        return None
+
+def shard_filename(directory, shard_number):
+    """Get the name of a shard file.
+
+    :param directory: the experiment directory
+    :type directory: str
+
+    :param shard_number: the count of the shard (0-indexed)
+    :type shard_number: int
+
+    :returns: the path of the shard file
+    :rtype: str
+    """
+    return '{}/{}/{:03d}/{:06d}.npy'.format(
+        directory, SHARD_DIRECTORY, shard_number // SHARDS_PER_DIRECTORY, shard_number)
+
+def shard_files(directory):
+    """Get the shard files holding the complete rows of an experiment.
+
+    :param directory: the experiment directory
+    :type directory: str
+
+    :returns: the path of each shard file and the number of complete rows
+              in it, in order; or ``None`` if the data is not sharded
+    :rtype: list
+    """
+    index = read_index(directory)
+    if index is None:
+        return None
+    shards = []
+    for start in range(0, index['rows'], index['shard_size']):
+        shards.append((shard_filename(directory, start // index['shard_size']),
+                       min(index['shard_size'], index['rows'] - start)))
+    return shards
+
+def row_files(directory):
+    """Get the files holding single updates, in update order.
+
+    :param directory: the experiment directory
+    :type directory: str
+
+    :returns: the path of each ``scan_data_NNN.npy`` file
+    :rtype: list
+    """
+    files = glob('{}/scan_data_*.npy'.format(directory))
+    return sorted(files, key=lambda name: int(re.match(r'scan_data_(\d+)\.npy',
+                                                       basename(name)).group(1)))
+
+def write_index(directory, index):
+    """Replace the index of a sharded experiment.
+
+    :param directory: the experiment directory
+    :type directory: str
+
+    :param index: the ``shard_size``, ``updates`` and ``rows`` of the data
+    :type index: dict
+    """
+    filename = '{}/{}/{}'.format(directory, SHARD_DIRECTORY, INDEX_FILE)
+    with open(filename + '.tmp', 'w') as file_p:
+        json.dump(index, file_p)
+    os.replace(filename + '.tmp', filename)
+
+def read_index(directory):
+    """Get the index of a sharded experiment.
+
+    :param directory: the experiment directory
+    :type directory: str
+
+    :returns: the index, or ``None`` if the data is not sharded
+    :rtype: dict
+    """
+    try:
+        with open('{}/{}/{}'.format(directory, SHARD_DIRECTORY, INDEX_FILE), 'r') as file_p:
+            return json.load(file_p)
+    except FileNotFoundError:
+        return None
+
+def pack(directory, threads=IO_THREADS):
+    """Pack the data of an experiment into ``scan_data.npy``.
+
+    Both sharded data and ``scan_data_NNN.npy`` files are packed. The packed
+    file is preallocated and filled through a memory map, reading at most
+    :data:`CHUNK_BYTES` of data (or :data:`CHUNK_FILES` row files) at a time,
+    with the reads spread over a pool of threads. The packed file only takes
+    the place of the original files once it is complete.
+
+    :param directory: the experiment directory
+    :type directory: str
+
+    :param threads: the number of threads reading the original files
+    :type threads: int
+
+    :raises FileExistsError: if the experiment already has a ``scan_data.npy``
+    """
+    filename = '{}/scan_data.npy'.format(directory)
+    if isfile(filename):
+        raise FileExistsError('{} already exists'.format(filename))
+    shards = shard_files(directory)
+    if shards is not None:
+        sources = [np.load(shard, mmap_mode='r')[:rows] for shard, rows in shards]
+        if not sources:
+            print('No PLACE shards found in {}'.format(directory))
+            return
+        data = np.lib.format.open_memmap(filename + '.tmp', mode='w+', dtype=sources[0].dtype,
+                                         shape=(sum(len(source) for source in sources),))
+        starts = np.cumsum([0] + [len(source) for source in sources])
+        with ThreadPoolExecutor(threads) as executor:
+            for _ in executor.map(_copy_rows, sources, [data] * len(sources), starts):
+                pass
+        data.flush()
+        del data, sources
+        os.replace(filename + '.tmp', filename)
+        rmtree('{}/{}'.format(directory, SHARD_DIRECTORY))
+        return
+    files = row_files(directory)
+    num = len(files)
+    if num == 0:
+        print('No PLACE scan_data_*.npy files found in {}'.format(directory))
+        return
+    with open(files[0], 'rb') as file_p:
+        version = np.lib.format.read_magic(file_p)
+        if version == (1, 0):
+            dtype = np.lib.format.read_array_header_1_0(file_p)[2]
+        else:
+            dtype = np.lib.format.read_array_header_2_0(file_p)[2]
+        header_length = file_p.tell()
+        file_p.seek(0)
+        header = file_p.read(header_length)
+    data = np.lib.format.open_memmap(filename + '.tmp', mode='w+', dtype=dtype, shape=(num,))
+    copy_row = partial(_read_row_file, files, data, header)
+    with ThreadPoolExecutor(threads) as executor:
+        for start in range(0, num, CHUNK_FILES):
+            for _ in executor.map(copy_row, range(start, min(start + CHUNK_FILES, num))):
+                pass
+    data.flush()
+    del data, copy_row
+    os.replace(filename + '.tmp', filename)
+    for row_file in files:
+        os.remove(row_file)
+
+def unpack(directory, shard_size=None, threads=IO_THREADS):
+    """Unpack ``scan_data.npy`` into one file per update, or into shards.
+
+    The packed file is memory-mapped, so only the rows being written are read
+    into memory. The files are written by a pool of threads.
+
+    :param directory: the experiment directory
+    :type directory: str
+
+    :param shard_size: the number of updates in each shard, or ``None`` to
+                       write one ``scan_data_NNN.npy`` file per update
+    :type shard_size: int
+
+    :param threads: the number of threads writing the new files
+    :type threads: int
+    """
+    filename = '{}/scan_data.npy'.format(directory)
+    data = np.load(filename, mmap_mode='r')
+    num = len(data)
+    if shard_size is None:
+        work = partial(_write_row_file, directory, data, _row_header(data.dtype))
+        with ThreadPoolExecutor(threads) as executor:
+            for start in range(0, num, CHUNK_FILES):
+                for _ in executor.map(work, range(start, min(start + CHUNK_FILES, num))):
+                    pass
+    else:
+        if isdir('{}/{}'.format(directory, SHARD_DIRECTORY)):
+            raise FileExistsError('{} already contains sharded data'.format(directory))
+        work = partial(_write_shard, directory, data, shard_size)
+        with ThreadPoolExecutor(threads) as executor:
+            for _ in executor.map(work, range(0, num, shard_size)):
+                pass
+        write_index(directory, {'shard_size': shard_size, 'updates': num, 'rows': num})
+    del data, work
+    os.remove(filename)
+
+def _read_row_file(files, data, header, number):
+    """Copy one row file into the packed data.
+
+    Row files normally have the same header as the first one, in which case
+    the row is read straight into the packed data.
+    """
+    with open(files[number], 'rb') as file_p:
+        if file_p.read(len(header)) == header:
+            row = data[number:number+1].view('uint8')
+            if file_p.readinto(row) == row.nbytes:
+                return
+        file_p.seek(0)
+        data[number] = np.load(file_p)[0]
+
+def _write_row_file(directory, data, header, number):
+    """Write one row of the packed data into its own file."""
+    with open(row_filename(directory, number), 'xb') as file_p:
+        file_p.write(header)
+        file_p.write(data[number:number+1].view('uint8'))
+
+def _row_header(dtype):
+    """Build the ``.npy`` header of a file holding one row."""
+    header = {
+        'descr': np.lib.format.dtype_to_descr(dtype),
+        'fortran_order': False,
+        'shape': (1,),
+        }
+    buffer = BytesIO()
+    try:
+        np.lib.format.write_array_header_1_0(buffer, header)
+    except ValueError:
+        buffer = BytesIO()
+        np.lib.format.write_array_header_2_0(buffer, header)
+    return buffer.getvalue()
+
+def _write_shard(directory, data, shard_size, start):
+    """Write the packed data starting at one row into a shard."""
+    source = data[start:start+shard_size]
+    shard = _create_shard(directory, start // shard_size, data.dtype, len(source))
+    _copy_rows(source, shard, 0)
+    shard.flush()
+
+def _copy_rows(source, destination, start):
+    """Copy rows into part of another array, at most CHUNK_BYTES at a time."""
+    step = max(1, CHUNK_BYTES // max(1, source.dtype.itemsize))
+    for offset in range(0, len(source), step):
+        rows = source[offset:offset+step]
+        destination[start+offset:start+offset+len(rows)] = rows
+
+def data_files(directory):
+    """Get every file holding the data of an experiment, in update order.
+
+    :param directory: the experiment directory
+    :type directory: str
+
+    :returns: the path of ``scan_data.npy``, of each shard, or of each
+              ``scan_data_NNN.npy`` file
+    :rtype: list
+    """
+    filename = '{}/scan_data.npy'.format(directory)
+    if isfile(filename):
+        return [filename]
+    index = read_index(directory)
+    if index is not None:
+        shards = -(-index['updates'] // index['shard_size'])
+        return [shard for shard in (shard_filename(directory, number) for number in range(shards))
+                if isfile(shard)]
+    return row_files(directory)
+
+def rename_fields(filename, names):
+    """Rename the fields of the structured array in a ``.npy`` file.
+
+    The field names are stored in the header of the file, which NumPy pads
+    with spaces. If the header with the new names fits in the same space, only
+    the header is rewritten, in place. Otherwise, the file is copied with a
+    larger header, without loading the data into memory.
+
+    :param filename: the ``.npy`` file
+    :type filename: str
+
+    :param names: the new name of each field, in order
+    :type names: list
+
+    :returns: ``True`` if the header was rewritten in place
+    :rtype: bool
+    """
+    with open(filename, 'r+b') as file_p:
+        version = np.lib.format.read_magic(file_p)
+        if version == (1, 0):
+            shape, fortran_order, dtype = np.lib.format.read_array_header_1_0(file_p)
+        else:
+            shape, fortran_order, dtype = np.lib.format.read_array_header_2_0(file_p)
+        data_offset = file_p.tell()
+        dtype.names = names
+        header = {
+            'descr': np.lib.format.dtype_to_descr(dtype),
+            'fortran_order': fortran_order,
+            'shape': shape,
+            }
+        header_string = "{{'descr': {!r}, 'fortran_order': {!r}, 'shape': {!r}, }}".format(
+            header['descr'], header['fortran_order'], header['shape'])
+        encoding = 'utf8' if version == (3, 0) else 'latin1'
+        header_bytes = header_string.encode(encoding)
+        length_format = '<H' if version == (1, 0) else '<I'
+        prefix_length = len(np.lib.format.magic(*version)) + struct.calcsize(length_format)
+        padding = data_offset - prefix_length - len(header_bytes) - 1
+        if padding >= 0:
+            header_bytes += b' ' * padding + b'\n'
+            file_p.seek(0)
+            file_p.write(np.lib.format.magic(*version))
+            file_p.write(struct.pack(length_format, len(header_bytes)))
+            file_p.write(header_bytes)
+            return True
+        with open(filename + '.tmp', 'wb') as new_file_p:
+            try:
+                np.lib.format.write_array_header_1_0(new_file_p, header)
+            except ValueError:
+                new_file_p.seek(0)
+                new_file_p.truncate()
+                np.lib.format.write_array_header_2_0(new_file_p, header)
+            file_p.seek(data_offset)
+            copyfileobj(file_p, new_file_p, 2**24)
+    os.replace(filename + '.tmp', filename)
+    return False
+
+def _create_shard(directory, shard_number, dtype, rows):
+    """Create a memory-mapped shard file."""
+    filename = shard_filename(directory, shard_number)
+    os.makedirs(os.path.dirname(filename), exist_ok=True)
+    return np.lib.format.open_memmap(filename, mode='w+', dtype=dtype, shape=(rows,))
+
+WRITERS = {
+    'files': RowFileWriter,
+    'memmap': MemmapWriter,
+    'shards': ShardWriter,
+    }
+
+def make_writer(config):
+    """Create the writer requested by an experiment configuration.
+
+    :param config: the experiment configuration
+    :type config: dict
+
+    :returns: the writer for the experiment
+    :rtype: RowFileWriter, MemmapWriter or ShardWriter
+
+    :raises ValueError: if the requested storage is not recognized
+    """
+    storage = config.get('storage', 'files')
+    try:
+        writer_class = WRITERS[storage]
+    except KeyError:
+        raise ValueError("unrecognized storage '{}' - must be one of: {}".format(
+            storage, ', '.join(sorted(WRITERS))))
+    if writer_class is ShardWriter:
+        return writer_class(config['directory'], config['updates'],
+                            config.get('shard_size', SHARD_SIZE))
+    return writer_class(config['directory'], config['updates'])
@@ -0,0 +1,332 @@
+"""Basic testing for the experiment runner"""
+from unittest import TestCase
+import unittest
+import threading
+import json
+from asyncio import sleep as async_sleep
+from tempfile import TemporaryDirectory
+from time import monotonic, sleep
+import numpy as np
+from numpy.lib import recfunctions as rfn
+from place.basic_experiment import BasicExperiment, _RowBuffer, _order_modules
+from place.bench.synthetic import SyntheticPostProcessing
+from place.storage import write_progress
+from place.plugins.instrument import Instrument
+
+class FailingInstrument(Instrument):
+    """Instrument raising an error during one update."""
+    cleaned_up = []
+
+    def config(self, metadata, total_updates):
+        pass
+
+    def update(self, update_number):
+        if update_number == self._config['fail_at']:
+            raise ValueError('failed at update {}'.format(update_number))
+        return np.array([(update_number,)], dtype=[('FailingInstrument-number', 'int32')])
+
+    def cleanup(self, abort=False):
+        FailingInstrument.cleaned_up.append(abort)
+
+class CountingInstrument(Instrument):
+    """Instrument returning a count and a trace that change every update."""
+    def config(self, metadata, total_updates):
+        pass
+
+    def update(self, update_number):
+        name = self._config['name']
+        value = update_number + self._config['offset']
+        return np.array([(value, np.full((2, 4), value, dtype='float64'))],
+                        dtype=[(name + '-count', 'int32'), (name + '-trace', 'float64', (2, 4))])
+
+    def cleanup(self, abort=False):
+        pass
+
+class SleepingInstrument(Instrument):
+    """Instrument sleeping during every update, recording when it slept."""
+    intervals = []
+
+    def config(self, metadata, total_updates):
+        pass
+
+    def update(self, update_number):
+        start = monotonic()
+        sleep(self._config['sleep'])
+        return self._record(update_number, start)
+
+    def _record(self, update_number, start):
+        """Record the interval slept, and return it as the data of the update."""
+        interval = (update_number, start, monotonic())
+        SleepingInstrument.intervals.append(interval)
+        name = self.__class__.__name__
+        return np.array([interval[1:]], dtype=[(name + '-start', 'float64'),
+                                               (name + '-end', 'float64')])
+
+    def cleanup(self, abort=False):
+        pass
+
+class AsyncSleepingInstrument(SleepingInstrument):
+    """SleepingInstrument sleeping in a coroutine while updated by the asyncio scheduler."""
+    async def update_async(self, update_number):
+        start = monotonic()
+        await async_sleep(self._config['sleep'])
+        return self._record(update_number, start)
+
+def _config(directory, **options):
+    """Make the configuration of a test experiment (by default, one FailingInstrument)."""
+    config = {
+        'updates': 10,
+        'directory': directory,
+        'comments': 'from test_basic_experiment.py',
+        'modules': [
+            {
+                'module_name': 'place.test_basic_experiment',
+                'class_name': 'FailingInstrument',
+                'priority': 10,
+                'config': {'fail_at': 3}
+            }
+        ]
+    }
+    config.update(options)
+    return config
+
+def _counter(sleep_time=0):
+    """Make the module entry of a Counter."""
+    return {'module_name': 'counter', 'class_name': 'Counter', 'priority': 10,
+            'config': {'sleep_time': sleep_time, 'plot': False}}
+
+def _sleeping(class_name, sleep_time):
+    """Make the module entry of a SleepingInstrument."""
+    return {'module_name': 'place.test_basic_experiment', 'class_name': class_name,
+            'priority': 10, 'config': {'sleep': sleep_time}}
+
+def _counting(name, offset, priority):
+    """Make the module entry of a CountingInstrument."""
+    return {'module_name': 'place.test_basic_experiment', 'class_name': 'CountingInstrument',
+            'priority': priority, 'config': {'name': name, 'offset': offset}}
+
+def _averaging(trace_field, remove_trace_data, priority, name='Average'):
+    """Make the module entry of a SyntheticPostProcessing."""
+    return {'module_name': 'place.bench.synthetic', 'class_name': 'SyntheticPostProcessing',
+            'priority': priority,
+            'config': {'name': name, 'trace_field': trace_field, 'latency': 0,
+                       'remove_trace_data': remove_trace_data}}
+
+def _merged_row(steps, update_number, time):
+    """Assemble a row the way rows were assembled before the row buffer.
+
+    :param steps: the modules in update order, as ``('add', instrument)`` or
+                  ``('replace', post_processing)`` pairs
+    :type steps: list
+
+    :returns: the row
+    :rtype: numpy.array, structured array of shape (1,)
+    """
+    row = np.array([(time,)], dtype=[('time', 'datetime64[us]')])
+    for kind, module in steps:
+        if kind == 'add':
+            row = rfn.merge_arrays([row, module.update(update_number)], flatten=True)
+        else:
+            row = module.update(update_number, row.copy())
+    return row
+
+def _modules(*entries):
+    """Make stand-in modules from ``(class_name, priority)`` pairs.
+
+    Modules with the same class name share a class.
+    """
+    classes = {}
+    modules = []
+    for class_name, priority in entries:
+        class_ = classes.setdefault(class_name, type(class_name, (), {}))
+        module = class_()
+        module.priority = priority
+        modules.append(module)
+    return modules
+
+def _order(modules, declared, fields=None):
+    """Order stand-in modules, giving the order as indices into the input."""
+    ordered, dependencies = _order_modules(modules, declared, fields)
+    order = [modules.index(module) for module in ordered]
+    return order, {order[index]: {order[dependency] for dependency in found}
+                   for index, found in dependencies.items()}
+
+class TestBasicExperiment(TestCase):
+    """Test class"""
+    def test0001_pipeline_error(self):
+        """Test that the pipeline stages stop when an instrument raises any error"""
+        FailingInstrument.cleaned_up = []
+        with TemporaryDirectory() as root:
+            experiment = BasicExperiment(_config(root + '/run', pipeline=True))
+            with self.assertRaises(ValueError):
+                experiment.run()
+        names = [thread.name for thread in threading.enumerate()]
+        self.assertNotIn('PLACE-postprocessing', names)
+        self.assertNotIn('PLACE-writer', names)
+        self.assertEqual(FailingInstrument.cleaned_up, [True])
+
+    def test0002_row_buffer(self):
+        """Test that the row buffer assembles the same rows as merge_arrays"""
+        first = CountingInstrument({'name': 'First', 'offset': 0})
+        second = CountingInstrument({'name': 'Second', 'offset': 100})
+        for remove_trace_data in (False, True):
+            average = SyntheticPostProcessing({'name': 'Average', 'trace_field': 'First-trace',
+                                               'latency': 0,
+                                               'remove_trace_data': remove_trace_data})
+            steps = [('add', first), ('replace', average), ('add', second)]
+            buffer = _RowBuffer()
+            for update_number in range(3):
+                buffer.start()
+                buffer.add(first.update(update_number))
+                buffer.replace(average.update(update_number, buffer.data.copy()))
+                buffer.add(second.update(update_number))
+                row = buffer.finish()
+                expected = _merged_row(steps, update_number, row['time'][0])
+                self.assertEqual(row.dtype, expected.dtype)
+                self.assertEqual(row.tobytes(), expected.tobytes())
+
+    def test0003_saved_rows(self):
+        """Test that saved rows match merge_arrays, with and without the pipeline"""
+        first = CountingInstrument({'name': 'First', 'offset': 0})
+        second = CountingInstrument({'name': 'Second', 'offset': 100})
+        average = SyntheticPostProcessing({'name': 'Average', 'trace_field': 'First-trace',
+                                           'latency': 0, 'remove_trace_data': True})
+        last = SyntheticPostProcessing({'name': 'Last', 'trace_field': 'Second-trace',
+                                        'latency': 0, 'remove_trace_data': False})
+        modules = [_counting('First', 0, 10), _averaging('First-trace', True, 20),
+                   _counting('Second', 100, 30), _averaging('Second-trace', False, 40, 'Last')]
+        # post-processing sees the same data with and without the pipeline
+        steps = [('add', first), ('replace', average), ('add', second), ('replace', last)]
+        for pipeline in (False, True):
+            with TemporaryDirectory() as root:
+                config = _config(root + '/run', updates=4, pipeline=pipeline, modules=modules)
+                BasicExperiment(config).run()
+                with open(config['directory'] + '/scan_data.npy', 'rb') as file_p:
+                    data = np.load(file_p)
+            self.assertEqual(len(data), 4)
+            for update_number, row in enumerate(data):
+                expected = _merged_row(steps, update_number, row['time'])
+                self.assertEqual(data.dtype, expected.dtype)
+                self.assertEqual(row.tobytes(), expected.tobytes())
+
+    def test0004_order_by_priority(self):
+        """Test that modules without dependencies are ordered by priority"""
+        modules = _modules(('Stage', 30), ('Scope', 10), ('Counter', 10))
+        order, dependencies = _order(modules, [None, None, None])
+        self.assertEqual(order, [1, 2, 0])
+        self.assertEqual(dependencies, {1: set(), 2: set(), 0: {1, 2}})
+        # independent modules keep the priority order, ties in config order
+        order, dependencies = _order(modules, [[], [], []])
+        self.assertEqual(order, [1, 2, 0])
+        self.assertEqual(dependencies, {0: set(), 1: set(), 2: set()})
+        # a declared dependency overrides the priority
+        order, dependencies = _order(modules, [[], ['Stage'], None])
+        self.assertEqual(order, [2, 0, 1])
+        self.assertEqual(dependencies, {0: set(), 1: {0}, 2: set()})
+
+    def test0005_order_by_field(self):
+        """Test that dependencies on fields find the module producing them"""
+        modules = _modules(('ATS9440', 10), ('Counter', 20), ('Counter', 30),
+                           ('Synthetic', 40))
+        fields = [None, ['Counter-first-count'], ['Counter-second-count'],
+                  ['fast-scope-trace']]
+        declared = [['Counter-second-count'], ['ATS9440-trace'], ['fast-scope-trace'], []]
+        order, dependencies = _order(modules, declared, fields)
+        self.assertEqual(order, [3, 2, 0, 1])
+        self.assertEqual(dependencies, {0: {2}, 1: {0}, 2: {3}, 3: set()})
+
+    def test0006_order_errors(self):
+        """Test that unknown, ambiguous and cyclic dependencies are rejected"""
+        modules = _modules(('Stage', 10), ('Counter', 20), ('Counter', 30))
+        fields = [None, ['Counter-count'], ['Counter-count', 'Counter-trace']]
+        for declared in ([['Scope'], [], []],
+                         [['Scope-trace'], [], []],
+                         [['Counter'], [], []],
+                         [['Counter-count'], [], []]):
+            with self.assertRaises(ValueError):
+                _order(modules, declared, fields)
+        self.assertEqual(_order(modules, [['Counter-trace'], [], []], fields)[0], [1, 2, 0])
+        with self.assertRaisesRegex(ValueError, 'cycle'):
+            _order(modules, [['Counter-trace'], [], ['Stage']], fields)
+        with self.assertRaisesRegex(ValueError, 'cycle'):
+            _order(modules, [['Stage'], [], []], fields)
+
+    def test0007_pipelined_counter(self):
+        """Test that the pipelined update phase saves every update in order"""
+        with TemporaryDirectory() as root:
+            config = _config(root + '/run', updates=25, pipeline=True, pipeline_depth=3,
+                             modules=[_counter()])
+            BasicExperiment(config).run()
+            with open(config['directory'] + '/scan_data.npy', 'rb') as file_p:
+                data = np.load(file_p)
+            with open(config['directory'] + '/timing.npy', 'rb') as file_p:
+                timing = np.load(file_p)
+            with open(config['directory'] + '/config.json', 'r') as file_p:
+                metadata = json.load(file_p)['metadata']
+        self.assertEqual(len(data), 25)
+        self.assertEqual(len(timing), 25)
+        self.assertEqual(metadata['timing']['Counter']['update']['count'], 25)
+        self.assertEqual(list(data['Counter-count']), list(range(1, 26)))
+
+    def test0008_asyncio_counter(self):
+        """Test that the asyncio scheduler runs an experiment"""
+        with TemporaryDirectory() as root:
+            config = _config(root + '/run', scheduler='asyncio',
+                             modules=[_counter(sleep_time=0.01)])
+            BasicExperiment(config).run()
+            with open(config['directory'] + '/scan_data.npy', 'rb') as file_p:
+                data = np.load(file_p)
+        self.assertEqual(list(data['Counter-count']), list(range(1, 11)))
+
+    def test0009_independent_modules_overlap(self):
+        """Test that the asyncio scheduler updates independent modules at the same time"""
+        modules = [_sleeping('SleepingInstrument', 0.1),
+                   _sleeping('AsyncSleepingInstrument', 0.1)]
+        for scheduler in ('serial', 'asyncio'):
+            SleepingInstrument.intervals = []
+            with TemporaryDirectory() as root:
+                config = _config(root + '/run', updates=3, scheduler=scheduler, modules=modules)
+                BasicExperiment(config).run()
+            for update_number in range(3):
+                intervals = [interval[1:] for interval in SleepingInstrument.intervals
+                             if interval[0] == update_number]
+                self.assertEqual(len(intervals), 2)
+                # the modules overlap if each one started before the other ended
+                overlap = max(start for start, _ in intervals) < min(end for _, end in intervals)
+                self.assertEqual(overlap, scheduler == 'asyncio')
+
+    def test0010_resume_counter(self):
+        """Test that an interrupted experiment resumes after its last update"""
+        with TemporaryDirectory() as root:
+            config = _config(root + '/run', updates=25, storage='memmap', modules=[_counter()])
+            BasicExperiment(config).run()
+            # pretend the experiment was interrupted after 10 updates
+            write_progress(config['directory'], 10)
+            with open(config['directory'] + '/config.json', 'r') as file_p:
+                config = json.load(file_p)
+            BasicExperiment(config, resume=True).run()
+            with open(config['directory'] + '/scan_data.npy', 'rb') as file_p:
+                data = np.load(file_p)
+            self.assertEqual(list(data['Counter-count']), list(range(1, 26)))
+            with open(config['directory'] + '/config.json', 'r') as file_p:
+                metadata = json.load(file_p)['metadata']
+            self.assertEqual(metadata['resumed_from'], [10])
+            self.assertEqual(metadata['timing']['Counter']['update']['count'], 15)
+            with self.assertRaises(ValueError):
+                BasicExperiment(config, resume=True)
+        # pretend the experiment was interrupted before its first update
+        with TemporaryDirectory() as root:
+            config = _config(root + '/run', updates=25, storage='memmap', modules=[_counter()])
+            BasicExperiment(config).config_phase()
+            with open(config['directory'] + '/config.json', 'r') as file_p:
+                config = json.load(file_p)
+            BasicExperiment(config, resume=True).run()
+            with open(config['directory'] + '/scan_data.npy', 'rb') as file_p:
+                data = np.load(file_p)
+            self.assertEqual(list(data['Counter-count']), list(range(1, 26)))
+            with open(config['directory'] + '/config.json', 'r') as file_p:
+                metadata = json.load(file_p)['metadata']
+            self.assertEqual(metadata['resumed_from'], [0])
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2, buffer=True)
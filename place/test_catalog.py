@@ -0,0 +1,56 @@
+"""Basic testing for the experiment catalog"""
+from unittest import TestCase
+import unittest
+import json
+import os
+from tempfile import TemporaryDirectory
+from place.basic_experiment import BasicExperiment
+from place.catalog import Catalog
+
+TEST_COUNTER = """
+{
+    "updates": 25,
+    "directory": "",
+    "comments": "from test_catalog.py",
+    "modules": [
+        {
+            "module_name": "counter",
+            "class_name": "Counter",
+            "priority": 10,
+            "config": {
+                "sleep_time": 0,
+                "plot": false
+            }
+        }
+    ]
+}
+"""
+
+class TestCatalog(TestCase):
+    """Test class"""
+    def test0001_catalog(self):
+        """Test that the catalog indexes experiments incrementally"""
+        with TemporaryDirectory() as root:
+            for number, updates in enumerate((5, 20)):
+                config = json.loads(TEST_COUNTER)
+                config['updates'] = updates
+                config['directory'] = '{}/run_{}'.format(root, number)
+                BasicExperiment(config).run()
+            catalog = Catalog(root + '/catalog.sqlite')
+            try:
+                self.assertEqual(catalog.index(root), (2, 0, 0))
+                self.assertEqual(catalog.index(root), (0, 2, 0))
+                found = catalog.find(['module=Counter', 'updates>10', 'counter_samples=128'])
+                self.assertEqual([result['directory'] for result in found],
+                                 [root + '/run_1'])
+                self.assertEqual(found[0]['completed'], 20)
+                self.assertEqual(len(catalog.find(['Counter.plot=false',
+                                                   'field=Counter-trace'])), 2)
+                self.assertEqual(catalog.find(['Counter.plot=true']), [])
+                os.remove(root + '/run_0/config.json')
+                self.assertEqual(catalog.index(root), (0, 1, 1))
+            finally:
+                catalog.close()
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2, buffer=True)
@@ -0,0 +1,57 @@
+"""Basic testing for the dataset reader"""
+from unittest import TestCase
+import unittest
+import json
+from tempfile import TemporaryDirectory
+import place.data
+from place.basic_experiment import BasicExperiment
+from place.storage import write_progress
+
+TEST_COUNTER = """
+{
+    "updates": 25,
+    "directory": "",
+    "comments": "from test_data.py",
+    "modules": [
+        {
+            "module_name": "counter",
+            "class_name": "Counter",
+            "priority": 10,
+            "config": {
+                "sleep_time": 0,
+                "plot": false
+            }
+        }
+    ]
+}
+"""
+
+def _run(directory, **options):
+    """Run a counter experiment, returning its directory."""
+    config = json.loads(TEST_COUNTER)
+    config['directory'] = directory
+    config.update(options)
+    BasicExperiment(config).run()
+    return config['directory']
+
+class TestData(TestCase):
+    """Test class"""
+    def test0001_open_dataset(self):
+        """Test that a dataset gives views of packed and unpacked data"""
+        with TemporaryDirectory() as root:
+            directory = _run(root + '/packed', pipeline=True)
+            scan = place.data.open(directory)
+            self.assertTrue(scan.packed)
+            self.assertEqual(len(scan), 25)
+            self.assertEqual(list(scan['Counter-count']), list(range(1, 26)))
+            self.assertIsNotNone(scan['Counter-trace'].base)
+            self.assertEqual(scan.metadata['counter_samples'], 128)
+            # pretend the experiment was interrupted after 5 updates
+            directory = _run(root + '/memmap', storage='memmap')
+            write_progress(directory, 5)
+            scan = place.data.open(directory)
+            self.assertEqual(list(scan['Counter-count']), list(range(1, 6)))
+            self.assertEqual(scan[2:4]['Counter-count'].tolist(), [3, 4])
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2, buffer=True)
@@ -0,0 +1,51 @@
+"""Basic testing for the job queue"""
+from unittest import TestCase
+import unittest
+import json
+from tempfile import TemporaryDirectory
+from place.jobs import JobQueue
+
+TEST_COUNTER = """
+{
+    "updates": 10,
+    "directory": "",
+    "comments": "from test_jobs.py",
+    "scheduler": "asyncio",
+    "modules": [
+        {
+            "module_name": "counter",
+            "class_name": "Counter",
+            "priority": 10,
+            "config": {
+                "sleep_time": 0.01,
+                "plot": false
+            }
+        }
+    ]
+}
+"""
+
+class TestJobs(TestCase):
+    """Test class"""
+    def test0001_job_queue(self):
+        """Test that queued experiments run in order and report progress"""
+        progress = []
+        with TemporaryDirectory() as root:
+            jobs = JobQueue()
+            jobs.add_listener(lambda job: progress.append((job.job_id, job.state, job.update)))
+            configs = [json.loads(TEST_COUNTER) for _ in range(2)]
+            for number, config in enumerate(configs):
+                config['directory'] = '{}/run_{}'.format(root, number)
+            first = jobs.submit(configs[0])
+            second = jobs.submit(configs[1])
+            self.assertTrue(jobs.cancel(second.job_id))
+            self.assertTrue(second.wait(10))
+            self.assertTrue(first.wait(10))
+            jobs.close()
+        self.assertEqual([status['state'] for status in jobs.jobs()], ['complete', 'cancelled'])
+        self.assertEqual(progress[-2], (first.job_id, 'complete', 10))
+        self.assertEqual([update for job_id, _, update in progress[:10]], list(range(1, 11)))
+        self.assertFalse(jobs.cancel(first.job_id))
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2, buffer=True)
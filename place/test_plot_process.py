@@ -0,0 +1,25 @@
+"""Basic testing for the plotting process"""
+from unittest import TestCase
+import unittest
+import numpy as np
+from place.plot_process import PlotRing
+
+class TestPlotProcess(TestCase):
+    """Test class"""
+    def test0001_plot_ring(self):
+        """Test that the plot ring gives the newest frame of each stream"""
+        ring = PlotRing(slots=4, slot_points=64)
+        for update_number in range(10):
+            ring.write('Counter', 'trace', update_number, np.arange(8) + update_number)
+        ring.write('ATS9440', 'trace', 3, np.ones((3, 40)))
+        frames, written = ring.read(0)
+        self.assertEqual(written, 11)
+        self.assertEqual([frame[:3] for frame in frames],
+                         [('Counter', 'trace', 9), ('ATS9440', 'trace', 3)])
+        self.assertEqual(frames[0][3].tolist(), [list(range(9, 17))])
+        # rows that do not fit in a slot are dropped
+        self.assertEqual(frames[1][3].shape, (1, 40))
+        self.assertEqual(ring.read(written), ([], 11))
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2, buffer=True)
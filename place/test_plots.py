@@ -0,0 +1,65 @@
+"""Basic testing for the plot bus"""
+from unittest import TestCase
+import unittest
+import json
+from tempfile import TemporaryDirectory
+import numpy as np
+from place import plots
+from place.basic_experiment import BasicExperiment
+
+TEST_COUNTER = """
+{
+    "updates": 10,
+    "directory": "",
+    "comments": "from test_plots.py",
+    "scheduler": "asyncio",
+    "modules": [
+        {
+            "module_name": "counter",
+            "class_name": "Counter",
+            "priority": 10,
+            "config": {
+                "sleep_time": 0.01,
+                "plot": true
+            }
+        }
+    ]
+}
+"""
+
+class TestPlots(TestCase):
+    """Test class"""
+    def test0001_plot_bus(self):
+        """Test that plot data is published and stale frames are dropped"""
+        config = json.loads(TEST_COUNTER)
+        plots.set_local_plotting(False)
+        subscription = plots.BUS.subscribe()
+        try:
+            with TemporaryDirectory() as root:
+                config['directory'] = root + '/run'
+                BasicExperiment(config).run()
+        finally:
+            plots.BUS.unsubscribe(subscription)
+            plots.set_local_plotting(True)
+        frames = subscription.take()
+        self.assertEqual(len(frames), 1)
+        self.assertEqual((frames[0].source, frames[0].name), ('Counter', 'trace'))
+        self.assertEqual(frames[0].update_number, 9)
+        self.assertEqual(frames[0].dropped, 9)
+        self.assertEqual(subscription.take(), [])
+
+    def test0002_encode_frame(self):
+        """Test that frames are encoded as rows of JSON for the web app"""
+        data = plots.downsample(np.arange(3 * 2 * 10, dtype='float64').reshape(3, 2, 10), 4)
+        frame = plots.Frame('ATS9440', 'trace', 7, data, 2)
+        message = plots.encode_frame(frame, max_rows=4)
+        self.assertEqual(message[:6], '<FRAM>')
+        decoded = json.loads(message[6:])
+        self.assertEqual((decoded['source'], decoded['name'], decoded['update'],
+                          decoded['dropped']), ('ATS9440', 'trace', 7, 2))
+        self.assertEqual(decoded['data'], data.reshape(6, 4)[:4].tolist())
+        frame = plots.Frame('Counter', 'count', 0, np.array(np.nan, dtype='float32'), 0)
+        self.assertEqual(json.loads(plots.encode_frame(frame)[6:])['data'], [[0]])
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2, buffer=True)
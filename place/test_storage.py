@@ -0,0 +1,94 @@
+"""Basic testing for experiment data storage"""
+from unittest import TestCase
+import unittest
+import json
+from glob import glob
+from tempfile import TemporaryDirectory
+import numpy as np
+import place.data
+from place.basic_experiment import BasicExperiment
+from place.storage import pack, unpack, data_files, rename_fields
+
+TEST_COUNTER = """
+{
+    "updates": 25,
+    "directory": "",
+    "comments": "from test_storage.py",
+    "storage": "shards",
+    "shard_size": 10,
+    "modules": [
+        {
+            "module_name": "counter",
+            "class_name": "Counter",
+            "priority": 10,
+            "config": {
+                "sleep_time": 0,
+                "plot": false
+            }
+        }
+    ]
+}
+"""
+
+def _run(directory, **options):
+    """Run a counter experiment (sharded by default), returning its directory."""
+    config = json.loads(TEST_COUNTER)
+    config['directory'] = directory
+    config.update(options)
+    BasicExperiment(config).run()
+    return config['directory']
+
+class TestStorage(TestCase):
+    """Test class"""
+    def test0001_sharded_counter(self):
+        """Test that sharded data is read in order"""
+        with TemporaryDirectory() as root:
+            directory = _run(root + '/run')
+            self.assertEqual(len(glob(directory + '/scan_data/000/*.npy')), 3)
+            scan = place.data.open(directory)
+            self.assertEqual(list(scan['Counter-count']), list(range(1, 26)))
+            self.assertEqual(scan[8:13]['Counter-count'].tolist(), [9, 10, 11, 12, 13])
+            self.assertEqual(scan[24]['Counter-count'], 25)
+
+    def test0002_rename_fields(self):
+        """Test that fields are renamed in the header of every data file"""
+        with TemporaryDirectory() as root:
+            directory = _run(root + '/run')
+            names = [name.replace('Counter-', '') for name in place.data.open(directory).fields]
+            for filename in data_files(directory):
+                self.assertTrue(rename_fields(filename, names))
+            scan = place.data.open(directory)
+            self.assertEqual(list(scan.fields), names)
+            self.assertEqual(list(scan['count']), list(range(1, 26)))
+
+    def test0003_pack_unpack(self):
+        """Test that packing and unpacking keep every row"""
+        with TemporaryDirectory() as root:
+            directory = _run(root + '/run')
+            original = place.data.open(directory)[:]
+            pack(directory)
+            self.assertEqual(glob(directory + '/scan_data/*'), [])
+            self.assertEqual(place.data.open(directory)[:].tobytes(), original.tobytes())
+            with self.assertRaises(FileExistsError):
+                pack(directory)
+            unpack(directory)
+            self.assertEqual(len(glob(directory + '/scan_data_*.npy')), 25)
+            self.assertEqual(glob(directory + '/scan_data.npy'), [])
+            pack(directory, threads=3)
+            self.assertEqual(glob(directory + '/scan_data_*.npy'), [])
+            unpack(directory, shard_size=7)
+            scan = place.data.open(directory)
+            self.assertFalse(scan.packed)
+            self.assertEqual(scan[:].tobytes(), original.tobytes())
+
+    def test0004_memmap_counter(self):
+        """Test that the memory-mapped writer saves every update in place"""
+        with TemporaryDirectory() as root:
+            directory = _run(root + '/run', storage='memmap')
+            self.assertEqual(glob(directory + '/scan_data_*'), [])
+            with open(directory + '/scan_data.npy', 'rb') as file_p:
+                data = np.load(file_p)
+        self.assertEqual(list(data['Counter-count']), list(range(1, 26)))
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2, buffer=True)
@@ -0,0 +1,117 @@
+"""Timing of the phases of a PLACE experiment.
+
+PLACE records how long each module spends in each phase of an experiment
+(``config``, ``update``, ``postprocess``, ``save``, ``cleanup``, etc.). When
+the experiment ends, summary statistics are added to the metadata in
+``config.json`` under the ``timing`` key, and the duration of every update is
+saved into ``timing.npy``. This file contains one row per update, with a
+``<module>-<phase>`` column (in seconds) for each module and phase timed
+during the updates.
+"""
+from contextlib import contextmanager
+from threading import Lock
+from time import perf_counter
+import numpy as np
+
+class PhaseTimer:
+    """Collects the duration of each phase of each module.
+
+    Durations are measured with :func:`time.perf_counter`, a monotonic clock.
+    The timer may be shared by several threads.
+    """
+    def __init__(self, total_updates):
+        """Constructor
+
+        :param total_updates: the number of updates in the experiment
+        :type total_updates: int
+        """
+        self._updates = total_updates
+        self._lock = Lock()
+        self._once = {}
+        self._per_update = {}
+
+    @contextmanager
+    def measure(self, module_name, phase, update_number=None):
+        """Context manager timing the code it contains.
+
+        :param module_name: the name of the module being timed
+        :type module_name: str
+
+        :param phase: the phase being timed
+        :type phase: str
+
+        :param update_number: the count of the current update, or ``None``
+                              for phases outside the updates
+        :type update_number: int
+        """
+        start = perf_counter()
+        try:
+            yield
+        finally:
+            self.record(module_name, phase, perf_counter() - start, update_number)
+
+    def record(self, module_name, phase, duration, update_number=None):
+        """Record the duration of one phase of a module.
+
+        :param module_name: the name of the module being timed
+        :type module_name: str
+
+        :param phase: the phase being timed
+        :type phase: str
+
+        :param duration: the duration, in seconds
+        :type duration: float
+
+        :param update_number: the count of the current update, or ``None``
+                              for phases outside the updates
+        :type update_number: int
+        """
+        key = (module_name, phase)
+        with self._lock:
+            if update_number is None:
+                self._once.setdefault(key, []).append(duration)
+                return
+            if key not in self._per_update:
+                self._per_update[key] = np.full(self._updates, np.nan)
+            self._per_update[key][update_number] = duration
+
+    def summary(self):
+        """Summarize the recorded durations.
+
+        :returns: the ``count``, ``mean``, ``p50``, ``p95`` and ``max``
+                  duration (in seconds), keyed by module name and then phase
+        :rtype: dict
+        """
+        summary = {}
+        with self._lock:
+            durations = {key: np.array(values) for key, values in self._once.items()}
+            durations.update({key: values[~np.isnan(values)]
+                              for key, values in self._per_update.items()})
+        for (module_name, phase), values in sorted(durations.items()):
+            if not values.size:
+                continue
+            summary.setdefault(module_name, {})[phase] = {
+                'count': int(values.size),
+                'mean': float(values.mean()),
+                'p50': float(np.percentile(values, 50)),
+                'p95': float(np.percentile(values, 95)),
+                'max': float(values.max()),
+                }
+        return summary
+
+    def save(self, directory):
+        """Save the duration of every update into ``timing.npy``.
+
+        Updates that were not performed are recorded as ``NaN``.
+
+        :param directory: the experiment directory
+        :type directory: str
+        """
+        with self._lock:
+            keys = sorted(self._per_update)
+            data = np.zeros((self._updates,),
+                            dtype=[('{}-{}'.format(*key), 'float64') for key in keys])
+            for key in keys:
+                data['{}-{}'.format(*key)] = self._per_update[key]
+        with open('{}/timing.npy'.format(directory), 'wb') as file_p:
+            np.save(file_p, data, allow_pickle=False)
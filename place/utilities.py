@@ -1,31 +1,42 @@
 """Helper utilities for PLACE data"""
 
 from sys import argv
-from os import remove
 from os.path import basename, isdir, isfile
 from itertools import count
-from glob import glob
 import numpy as np
+from .storage import pack, unpack, data_files, rename_fields
 
 def column_renamer():
-    """Tool for renaming the columns in a NumPy structured array file"""
-    if not (len(argv) > 1 and argv[1].endswith('.npy') and isfile(argv[1])):
+    """Tool for renaming the columns in a NumPy structured array file
+
+    A PLACE experiment directory can be given instead of a file, in which case
+    the columns are renamed in every data file of the experiment (packed,
+    unpacked or sharded). Only the file headers are rewritten, unless the new
+    names no longer fit in the space reserved for the header.
+    """
+    if not (len(argv) > 1 and (argv[1].endswith('.npy') and isfile(argv[1])
+                               or isdir(argv[1]))):
         print('Usage:')
         print('  To display column headings:')
-        print('    {} [FILE]'.format(basename(argv[0])))
+        print('    {} [FILE|DIRECTORY]'.format(basename(argv[0])))
         print('  To rename a column heading (or multiple headings):')
-        print('    {} [FILE] [COLUMN_NUM] [NEW_COLUMN_NAME]...'.format(basename(argv[0])))
+        print('    {} [FILE|DIRECTORY] [COLUMN_NUM] [NEW_COLUMN_NAME]...'.format(
+            basename(argv[0])))
         print('')
         print('Example:')
         print('    {} scan_data_001.npy 1 trace 2 data'.format(basename(argv[0])))
         return
-    with open(argv[1], 'rb') as file_p:
-        data = np.load(file_p)
+    files = data_files(argv[1]) if isdir(argv[1]) else [argv[1]]
+    if not files:
+        print('No PLACE data found in {}'.format(argv[1]))
+        return
+    data = np.load(files[0], mmap_mode='r')
     if len(argv) == 2:
         for i, name in enumerate(data.dtype.names):
             print('{:2} {}'.format(i, name))
         return
     names = list(data.dtype.names)
+    del data
     for i in count(start=4, step=2):
         if len(argv) > i:
             names[int(argv[i-2])] = argv[i-1]
@@ -35,10 +46,9 @@ def column_renamer():
         else:
             print('Invalid number of arguments - no changes made')
             return
-    data.dtype.names = names
     print('Applying changes...', end='')
-    with open(argv[1], 'wb') as file_p:
-        np.save(file_p, data)
+    for filename in files:
+        rename_fields(filename, names)
     print('done!')
 
 def single_file():
@@ -50,34 +60,15 @@ def single_file():
     build_single_file(argv[1])
 
 def build_single_file(directory):
-    """Pack the individual row files into one NumPy structured array"""
-    files = sorted(glob('{}/scan_data_*.npy'.format(directory)))
-    num = len(files)
-    if num == 0:
-        print('No PLACE scan_data_*.npy files found in {}'.format(directory))
-        return
-    with open(files[0], 'rb') as file_p:
-        row = np.load(file_p)
-    data = np.resize(row, (num,))
-    for i, filename in enumerate(files):
-        with open(filename, 'rb') as file_p:
-            row = np.load(file_p)
-        data[i] = row[0]
-    with open('{}/scan_data.npy'.format(directory), 'xb') as file_p:
-        np.save(file_p, data)
-    for filename in files:
-        remove(filename)
+    """Pack the individual row files (or shards) into one NumPy structured array"""
+    pack(directory)
 
 def multiple_files():
-    """Unpack one NumPy structured array into individual row files"""
-    if not (len(argv) == 2 and isdir(argv[1])):
-        print('Usage: {} [DIRECTORY]')
+    """Unpack one NumPy structured array into individual row files (or shards)"""
+    if not (len(argv) in (2, 3) and isdir(argv[1]) and argv[2:3] != ['0']
+            and all(arg.isdigit() for arg in argv[2:])):
+        print('Usage: {} [DIRECTORY] [ROWS_PER_SHARD]')
         print('Unpack PLACE scan_data.npy file into multiple files.')
+        print('If ROWS_PER_SHARD is given, the rows are unpacked into shard files.')
         return
-    directory = argv[1]
-    with open('{}/scan_data.npy'.format(directory), 'rb') as file_p:
-        data = np.load(file_p)
-    for i, row in enumerate(data):
-        with open('{}/scan_data_{:03d}.npy'.format(directory, i), 'xb') as file_p:
-            np.save(file_p, [row])
-    remove('{}/scan_data.npy'.format(directory))
+    unpack(argv[1], int(argv[2]) if len(argv) == 3 else None)
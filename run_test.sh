@@ -1,3 +1,3 @@
 #! /bin/bash
 pylint -E ${RECIPE_DIR}/place --rcfile=${RECIPE_DIR}/place/pylintrc
-python -m unittest discover ${RECIPE_DIR}/place/plugins
+python -m unittest discover -s ${RECIPE_DIR}/place -t ${RECIPE_DIR}
@@ -33,5 +33,7 @@ setup(
         'place_server = place.experiment:experiment_server',
         'place_renamer = place.utilities:column_renamer',
         'place_unpack = place.utilities:multiple_files',
-        'place_pack = place.utilities:single_file'],},
+        'place_pack = place.utilities:single_file',
+        'place_bench = place.bench:main',
+        'place_catalog = place.catalog:main'],},
     )